@@ -0,0 +1,68 @@
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from src import engine_service
+from src.engine import MeasurementEngine
+from src.settings_window import load_config
+
+
+# Настройка логгирования службы (отдельный файл, чтобы не смешивать с логом окна программы)
+def setup_logging():
+    log_dir = Path('Log')
+    log_dir.mkdir(exist_ok=True)
+    log_file = log_dir / f'daemon_{datetime.now().strftime("%Y%m%d")}.log'
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', '%Y-%m-%d %H:%M:%S')
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    root_logger.addHandler(file_handler)
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    root_logger.addHandler(console_handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Служба измерений анализатора без графического интерфейса")
+    parser.add_argument("--host", default=engine_service.DEFAULT_HOST,
+                        help="адрес для подключения окон программы")
+    parser.add_argument("--port", type=int, default=engine_service.DEFAULT_PORT)
+    parser.add_argument("--start", action="store_true", help="сразу запустить цикл измерений")
+    parser.add_argument("--no-modbus", action="store_true", help="не подключать мультиплексор из config.json")
+    args = parser.parse_args()
+
+    setup_logging()
+    logging.info("Запуск службы измерений")
+    load_config()
+    if not args.no_modbus:
+        engine_service.connect_modbus_from_config()
+
+    engine = MeasurementEngine()
+    server = engine_service.EngineServer(engine, args.host, args.port)
+    server.start()
+    if args.start:
+        res = engine.start()
+        if res != 0:
+            logging.error(f"Цикл измерений не запущен: код {res}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logging.info("Остановка службы измерений")
+    finally:
+        engine.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
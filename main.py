@@ -1,14 +1,22 @@
+import time
+
+# Момент запуска процесса - точка отсчета для замеров времени старта
+STARTUP_T0 = time.perf_counter()
+
 from pathlib import Path
 import logging
 from datetime import datetime
 from PyQt5.QtWidgets import QApplication, QMainWindow
-from PyQt5 import QtGui
+from PyQt5 import QtGui, QtCore
 import platform
 import os
 import sys
 import traceback
 
+IMPORT_T0 = time.perf_counter()
 from src.gui import Ui_MainWindow, set_application_font  # Import the generated module
+from src.settings_window import apply_theme
+IMPORT_TIME = time.perf_counter() - IMPORT_T0
 
 # Глобальный обработчик исключений
 def global_exception_handler(exctype, value, tb):
@@ -86,6 +94,33 @@ class MyMainWindow(QMainWindow):
         logging.info(f"Текущий путь к DLL: {os.path.abspath(dll_path)}")
         logging.info(f"DLL существует: {os.path.exists(dll_path)}")
 
+def run_startup_benchmark():
+    """Замер времени старта: импорт, создание окна и первая отрисовка. Результат - в stdout"""
+    app = QApplication([])
+    set_application_font(app)
+    apply_theme('light')
+    timings = {"Импорт модулей": IMPORT_TIME}
+
+    window_t0 = time.perf_counter()
+    window = MyMainWindow()
+    timings["Создание главного окна"] = time.perf_counter() - window_t0
+
+    def on_first_paint():
+        timings["Первая отрисовка (от запуска процесса)"] = time.perf_counter() - STARTUP_T0
+        for name, value in timings.items():
+            print(f"{name}: {value * 1000:.1f} мс")
+        app.quit()
+
+    window.showMaximized()
+    # Срабатывает после того, как цикл событий обработает первую отрисовку окна
+    QtCore.QTimer.singleShot(0, on_first_paint)
+    app.exec_()
+
+
+if __name__ == "__main__" and "--startup-bench" in sys.argv:
+    run_startup_benchmark()
+    sys.exit(0)
+
 if __name__ == "__main__":
     # Инициализируем логгирование
     setup_logging()
@@ -100,7 +135,7 @@ if __name__ == "__main__":
         
         # Применяем стиль из QSS-файла
         try:
-            app.setStyleSheet(Path('resources/themes/light.qss').read_text())
+            apply_theme('light')
             logging.info('Стиль QSS успешно применен')
         except Exception as e:
             logging.error(f'Ошибка при применении стиля QSS: {e}')
@@ -1,11 +1,26 @@
-# Импорты для удобства использования
-from . import utility_functions
-from . import transmissionPlot
-from . import intensityPlot
-from . import param_plot
-from . import fetch_data
-from .settings_window import SettingsWindow
-from .modbus_window import ModbusWindow
-from .params_window import RenameParamsWindow
-from .channel_params_window import ChannelParamsWindow
-from .gui import Ui_MainWindow
+import importlib
+
+# Импорты для удобства использования; модули загружаются при первом обращении,
+# чтобы импорт пакета не тянул за собой pyqtgraph, ModBus и диалоги
+_LAZY_ATTRIBUTES = {
+    "utility_functions": (".utility_functions", None),
+    "transmissionPlot": (".transmissionPlot", None),
+    "intensityPlot": (".intensityPlot", None),
+    "param_plot": (".param_plot", None),
+    "fetch_data": (".fetch_data", None),
+    "SettingsWindow": (".settings_window", "SettingsWindow"),
+    "ModbusWindow": (".modbus_window", "ModbusWindow"),
+    "RenameParamsWindow": (".params_window", "RenameParamsWindow"),
+    "ChannelParamsWindow": (".channel_params_window", "ChannelParamsWindow"),
+    "Ui_MainWindow": (".gui", "Ui_MainWindow"),
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    module = importlib.import_module(module_name, __name__)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
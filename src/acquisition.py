@@ -0,0 +1,77 @@
+import logging
+import os
+import threading
+
+from . import fetch_data
+from . import spe_reader
+from . import spectral_math
+from . import spectrum_cache
+from . import utility_functions
+
+# Файл, в который GAS.dll записывает результат Init
+SAMPLE_FILE = "./Spectra/fon.spe"
+# Сохраненный фоновый спектр (нужен после перезапуска программы)
+BACKGROUND_FILE = "./Spectra/empty_fon.spe"
+
+# Фоновый спектр хранится в памяти и не перечитывается в каждом цикле
+_background = None
+_background_lock = threading.Lock()
+
+
+def read_measured_spectrum():
+    """Возвращает спектр, измеренный последним вызовом Init, в виде Spectrum"""
+    buffer_result = utility_functions.get_spectrum_buffer()
+    if buffer_result is not None:
+        header, y_values = buffer_result
+        return spectrum_cache.Spectrum(None, header, y_values)
+
+    if not os.path.exists(SAMPLE_FILE):
+        utility_functions.send_error_to_gui("Файл fon.spe не найден")
+        return None
+
+    # Одно чтение файла; дальше спектр живет только в памяти
+    header, y_values = spe_reader.read_spe(SAMPLE_FILE)
+    return spectrum_cache.Spectrum(SAMPLE_FILE, header, y_values)
+
+
+def measure_spectrum():
+    """Запускает измерение (Init) и возвращает (res, warn, spectrum)"""
+    res, warn = utility_functions.init_func()
+    if res != 0:
+        return res, warn, None
+    return res, warn, read_measured_spectrum()
+
+
+def get_background():
+    """Текущий фоновый спектр; при первом обращении загружается из empty_fon.spe"""
+    global _background
+    with _background_lock:
+        if _background is None and os.path.exists(BACKGROUND_FILE):
+            _background = spectrum_cache.load_spectrum(BACKGROUND_FILE)
+        return _background
+
+
+def set_background(spectrum, persist=True):
+    """Делает спектр фоновым; при persist=True атомарно сохраняет его в empty_fon.spe"""
+    global _background
+    with _background_lock:
+        _background = spectrum
+        if persist:
+            save_spectrum(spectrum, BACKGROUND_FILE)
+            spectrum_cache.spectrum_cache.invalidate(BACKGROUND_FILE)
+    logging.info("Фоновый спектр обновлен в памяти")
+
+
+def save_spectrum(spectrum, spe_file):
+    """Записывает спектр в файл через временное имя и os.replace"""
+    os.makedirs(os.path.dirname(spe_file) or ".", exist_ok=True)
+    spe_reader.write_spe(spe_file, spectrum.header, spectrum.y)
+    logging.info(f"Спектр сохранен: {spe_file}")
+
+
+def absorbance_spectrum(sample, background):
+    """Спектр поглощения образца относительно фона: (ось X фона, D)"""
+    y_values = spectral_math.absorbance(sample.y, background.y, fetch_data.cuv_length,
+                                        utility_functions.get_cuv_correction(),
+                                        log_reference=background.log_abs)
+    return background.x, y_values
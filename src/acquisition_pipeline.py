@@ -0,0 +1,88 @@
+import logging
+import queue
+import threading
+import time
+
+# Сколько измеренных спектров может ждать обработки; при заполнении измерение ждет
+DEFAULT_DEPTH = 2
+
+_STOP = object()
+
+
+class ProcessingPipeline:
+    """
+    Конвейер обработки измерений: поток измерения передает спектры через ограниченную
+    очередь, а отдельный поток считает поглощение, запускает exequant, пишет архив и графики.
+    Пока идет обработка, поток измерения уже переключает следующий канал.
+    """
+
+    def __init__(self, process, depth=DEFAULT_DEPTH, name="processing"):
+        # process(item) сам сообщает об ошибках обработки (error_out останавливает цикл)
+        self.process = process
+        self.name = name
+        self._queue = queue.Queue(maxsize=depth)
+        self._thread = None
+        self._discard = threading.Event()
+
+        self.submitted = 0
+        self.processed = 0
+        self.max_depth = 0
+        self.busy_time = 0.0
+        self.blocked_time = 0.0
+
+    def start(self):
+        self._discard.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item, should_stop=None):
+        """Ставит измерение в очередь; ждет места, пока should_stop() не вернет True"""
+        started = time.monotonic()
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                if should_stop is not None and should_stop():
+                    return False
+        self.blocked_time += time.monotonic() - started
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._discard.is_set():
+                continue
+
+            started = time.monotonic()
+            try:
+                self.process(item)
+            except Exception as e:
+                logging.error(f"Ошибка в потоке обработки измерений: {e}", exc_info=True)
+            self.busy_time += time.monotonic() - started
+            self.processed += 1
+
+    def stop(self, discard=False, timeout=None):
+        """Завершает поток после обработки очереди; discard=True отбрасывает ожидающие измерения"""
+        if self._thread is None:
+            return
+        if discard:
+            self._discard.set()
+        self._queue.put(_STOP)
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+        self.log_stats()
+
+    def log_stats(self):
+        logging.info(f"Конвейер обработки: измерений {self.submitted}, обработано {self.processed}, "
+                     f"макс. очередь {self.max_depth}, обработка {self.busy_time:.1f} с, "
+                     f"ожидание места в очереди {self.blocked_time:.1f} с")
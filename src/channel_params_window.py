@@ -1,8 +1,7 @@
-import json
-import os
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QVBoxLayout, QGridLayout, QHBoxLayout, QDialog, QFileDialog, QGroupBox, QLabel, QLineEdit, QComboBox, QCheckBox, QPushButton, QSpinBox, QDoubleSpinBox, QRadioButton, QButtonGroup
 
+from . import config_store
 from . import utility_functions
 
 
@@ -138,6 +137,38 @@ class ChannelParamsWindow(QDialog):
         self.measurements.setValue(self.config.get("params", {}).get("measurements", 5))
         params_layout.addWidget(self.measurements, 4, 1)
         
+        # Интервал между измерениями канала
+        acquisition_interval_label = QLabel("Интервал между измерениями канала, сек (0 - без паузы):")
+        params_layout.addWidget(acquisition_interval_label, 5, 0)
+        
+        self.acquisition_interval = QSpinBox()
+        self.acquisition_interval.setRange(0, 3600)
+        self.acquisition_interval.setValue(self.config.get("params", {}).get("acquisition_interval", 0))
+        params_layout.addWidget(self.acquisition_interval, 5, 1)
+        
+        # Порядок обхода каналов
+        scheduler_label = QLabel("Порядок обхода каналов:")
+        params_layout.addWidget(scheduler_label, 6, 0)
+        
+        self.scheduler = QComboBox()
+        self.scheduler.addItem("Последовательно 1→12", "sequential")
+        self.scheduler.addItem("Змейкой (меньше переездов)", "serpentine")
+        scheduler_index = self.scheduler.findData(self.config.get("params", {}).get("scheduler", "sequential"))
+        self.scheduler.setCurrentIndex(max(scheduler_index, 0))
+        params_layout.addWidget(self.scheduler, 6, 1)
+        
+        # Сколько спектров рассчитывать одним запуском exequant
+        quant_batch_label = QLabel("Расчет параметров exequant:")
+        params_layout.addWidget(quant_batch_label, 7, 0)
+        
+        self.quant_batch = QComboBox()
+        self.quant_batch.addItem("По одному спектру", "spectrum")
+        self.quant_batch.addItem("Все измерения канала", "channel")
+        self.quant_batch.addItem("Весь цикл каналов", "cycle")
+        quant_batch_index = self.quant_batch.findData(self.config.get("params", {}).get("quant_batch", "spectrum"))
+        self.quant_batch.setCurrentIndex(max(quant_batch_index, 0))
+        params_layout.addWidget(self.quant_batch, 7, 1)
+        
         params_group.setLayout(params_layout)
         main_layout.addWidget(params_group)
         
@@ -162,7 +193,10 @@ class ChannelParamsWindow(QDialog):
                 "alarm_fix": False,     # Фиксация аварии системы (АСПК)
                 "attempts": 3,         # Количество попыток переключения (k)
                 "background_period": 60, # Период измерения фонового спектра (tф)
-                "measurements": 5       # Количество измерений канала (n)
+                "measurements": 5,      # Количество измерений канала (n)
+                "acquisition_interval": 0,  # Интервал между измерениями канала, сек (0 - без паузы)
+                "scheduler": "sequential",  # Порядок обхода каналов
+                "quant_batch": "spectrum"  # Пакет расчета exequant
             }
         }
         
@@ -174,18 +208,12 @@ class ChannelParamsWindow(QDialog):
             }
         
         # Пытаемся загрузить существующие настройки
-        try:
-            if os.path.exists('config/channel_config.json'):
-                with open('config/channel_config.json', 'r', encoding="utf-8") as file:
-                    saved_config = json.load(file)
-                    # Обновляем конфигурацию загруженными значениями
-                    for key, value in saved_config.items():
-                        if key in config:
-                            config[key].update(value)
-                        else:
-                            config[key] = value
-        except Exception as e:
-            print(f"Ошибка при загрузке настроек каналов: {e}")
+        # Обновляем конфигурацию сохраненными значениями
+        for key, value in config_store.channel_config.snapshot().items():
+            if key in config:
+                config[key].update(value)
+            else:
+                config[key] = value
         
         return config
     
@@ -197,6 +225,9 @@ class ChannelParamsWindow(QDialog):
         self.config["params"]["attempts"] = self.attempts.value()
         self.config["params"]["background_period"] = self.background_period.value()
         self.config["params"]["measurements"] = self.measurements.value()
+        self.config["params"]["acquisition_interval"] = self.acquisition_interval.value()
+        self.config["params"]["scheduler"] = self.scheduler.currentData()
+        self.config["params"]["quant_batch"] = self.quant_batch.currentData()
         
         # Обновляем настройки каналов
         for i, widgets in enumerate(self.channel_widgets):
@@ -204,15 +235,9 @@ class ChannelParamsWindow(QDialog):
             self.config[f"channel_{channel_num}"]["active"] = widgets[3].isChecked()  # Проверяем состояние радиокнопки "Вкл"
             self.config[f"channel_{channel_num}"]["name"] = widgets[1].text()  # Обновляем имя канала
         
-        # Сохраняем в файл
+        # Сохраняем: окно измерений видит новые настройки сразу, файл записывается атомарно
         try:
-            # Создаем директорию config, если она не существует
-            if not os.path.exists('config'):
-                os.makedirs('config')
-                
-            with open('config/channel_config.json', 'w', encoding="utf-8") as file:
-                json.dump(self.config, file, indent=4)
-
+            config_store.channel_config.update(self.config)
             self.close()
         except Exception as e:
             QtWidgets.QMessageBox.critical(
@@ -0,0 +1,146 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import threading
+
+CONFIG_PATH = 'config/config.json'
+CHANNEL_CONFIG_PATH = 'config/channel_config.json'
+
+# Изменения, сделанные в течение этого времени, записываются на диск одной записью, сек
+WRITE_DELAY = 0.5
+# Пауза перед повторной записью, если сохранить файл не удалось, сек
+RETRY_DELAY = 5.0
+
+
+def write_json_atomic(path, data):
+    """Записывает JSON через временный файл и os.replace: при сбое на диске остается прежняя версия"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, 'w', encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+    except Exception:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+class ConfigStore:
+    """
+    JSON-файл настроек в памяти. Чтение не обращается к диску (файл перечитывается,
+    только если его изменили извне), изменения сразу видны всем потокам и подписчикам,
+    а на диск записываются атомарно и не чаще одного раза за WRITE_DELAY.
+    """
+
+    def __init__(self, path, write_delay=WRITE_DELAY):
+        self.path = path
+        self.write_delay = write_delay
+        self._data = None
+        self._signature = None
+        self._lock = threading.RLock()
+        self._timer = None
+        self._dirty = False
+        self._listeners = []
+        self.writes = 0
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _ensure_loaded(self):
+        signature = self._file_signature()
+        if self._data is not None and (self._dirty or signature == self._signature):
+            return
+        data = {}
+        if signature is not None:
+            try:
+                with open(self.path, 'r', encoding="utf-8") as file:
+                    data = json.load(file)
+            except Exception as e:
+                logging.error(f"Ошибка при чтении {self.path}: {e}")
+                if self._data is not None:
+                    return
+        self._data = data
+        self._signature = signature
+
+    # --- Чтение ---
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._ensure_loaded()
+            return copy.deepcopy(self._data.get(key, default))
+
+    def snapshot(self):
+        """Копия всех настроек"""
+        with self._lock:
+            self._ensure_loaded()
+            return copy.deepcopy(self._data)
+
+    # --- Изменение ---
+
+    def add_listener(self, listener):
+        """listener(измененные ключи) вызывается после каждого изменения"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def update(self, values):
+        """Обновляет ключи верхнего уровня; запись на диск откладывается на write_delay"""
+        with self._lock:
+            self._ensure_loaded()
+            for key, value in values.items():
+                self._data[key] = copy.deepcopy(value)
+            self._schedule_write()
+        for listener in list(self._listeners):
+            try:
+                listener(list(values))
+            except Exception as e:
+                logging.error(f"Ошибка обработчика изменения настроек {self.path}: {e}")
+
+    def _schedule_write(self, delay=None):
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.write_delay if delay is None else delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Записывает накопленные изменения немедленно"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            try:
+                write_json_atomic(self.path, self._data)
+            except Exception as e:
+                logging.error(f"Ошибка при сохранении {self.path}: {e}, повтор через {RETRY_DELAY} с")
+                # Изменения остаются в памяти и записываются повторно, даже если новых не будет
+                self._schedule_write(RETRY_DELAY)
+                return
+            self._dirty = False
+            self._signature = self._file_signature()
+            self.writes += 1
+
+
+# Общие настройки программы и настройки каналов
+config = ConfigStore(CONFIG_PATH)
+channel_config = ConfigStore(CHANNEL_CONFIG_PATH)
+
+# Отложенные изменения не теряются при закрытии программы
+atexit.register(config.flush)
+atexit.register(channel_config.flush)
@@ -0,0 +1,102 @@
+import logging
+
+from . import switch_monitor
+
+# Канал пустой ячейки, на котором измеряется фоновый спектр
+BACKGROUND_CHANNEL = 0
+
+# Оценка времени переключения, пока история не накоплена, сек
+DEFAULT_SWITCH_OVERHEAD = 1.0
+DEFAULT_HOP_TIME = 1.0
+
+
+def travel_time(from_channel, to_channel, history=None):
+    """Ожидаемое время переезда между каналами по измеренной истории переключений"""
+    if from_channel is None or from_channel == to_channel:
+        return 0.0
+    history = switch_monitor.hop_history if history is None else history
+    expected = history.expected(from_channel, to_channel)
+    if expected is None:
+        expected = DEFAULT_SWITCH_OVERHEAD + DEFAULT_HOP_TIME * abs(to_channel - from_channel)
+    return expected
+
+
+def route_travel_time(head, route, history=None):
+    """Суммарное время переездов по маршруту, начиная с текущего положения головки"""
+    total = 0.0
+    position = head
+    for channel in route:
+        total += travel_time(position, channel, history)
+        position = channel
+    return total
+
+
+class CycleScheduler:
+    """Базовый планировщик: возвращает порядок обхода каналов на один цикл (0 - фон)"""
+
+    name = "base"
+
+    def __init__(self, history=None):
+        self.history = history
+
+    def plan(self, head, channels, since_background, background_period, cycle_time=0.0):
+        raise NotImplementedError
+
+
+class SequentialScheduler(CycleScheduler):
+    """Исходный порядок: фон (если пора), затем каналы 1→12"""
+
+    name = "sequential"
+
+    def plan(self, head, channels, since_background, background_period, cycle_time=0.0):
+        route = sorted(channels)
+        if since_background >= background_period:
+            route.insert(0, BACKGROUND_CHANNEL)
+        return route
+
+
+class SerpentineScheduler(CycleScheduler):
+    """
+    Обход «змейкой»: направление выбирается по меньшему времени переездов от текущего
+    положения, поэтому циклы чередуются вверх/вниз без холостого возврата к началу.
+    Фон измеряется, когда головка проходит нижний конец, если к следующему такому
+    проходу он уже будет просрочен. Без фона маршрут вниз возвращает головку к пустой
+    ячейке в начале следующего цикла, а маршрут вверх - только в конце следующего,
+    то есть примерно через два цикла.
+    """
+
+    name = "serpentine"
+
+    def plan(self, head, channels, since_background, background_period, cycle_time=0.0):
+        ascending = sorted(channels)
+        descending = ascending[::-1]
+
+        best_route = None
+        best_time = None
+        for route, background_first in ((ascending, True), (descending, False)):
+            # Время до следующего прохода нижнего конца, если фон в этом цикле пропустить
+            next_pass = 2 * cycle_time if background_first else cycle_time
+            if since_background + next_pass >= background_period:
+                # Пустая ячейка - нижний конец хода головки
+                route = [BACKGROUND_CHANNEL] + route if background_first else route + [BACKGROUND_CHANNEL]
+            route_time = route_travel_time(head, route, self.history)
+            if best_time is None or route_time < best_time:
+                best_route, best_time = route, route_time
+
+        logging.info(f"Маршрут цикла: {best_route}, ожидаемое время переездов {best_time:.1f} с")
+        return best_route
+
+
+SCHEDULERS = {
+    SequentialScheduler.name: SequentialScheduler,
+    SerpentineScheduler.name: SerpentineScheduler,
+}
+
+
+def get_scheduler(name, history=None):
+    """Планировщик по имени из channel_config; неизвестное имя - последовательный обход"""
+    scheduler_class = SCHEDULERS.get(name)
+    if scheduler_class is None:
+        logging.warning(f"Неизвестный планировщик цикла '{name}', используется {SequentialScheduler.name}")
+        scheduler_class = SequentialScheduler
+    return scheduler_class(history)
@@ -0,0 +1,106 @@
+import heapq
+import itertools
+import logging
+import time
+
+
+class ScheduledTask:
+    """Задача планировщика: срок (time.monotonic), имя и действие"""
+    __slots__ = ("deadline", "name", "action", "args", "cancelled")
+
+    def __init__(self, deadline, name, action, args):
+        self.deadline = deadline
+        self.name = name
+        self.action = action
+        self.args = args
+        self.cancelled = False
+
+
+class DeadlineScheduler:
+    """
+    Очередь задач по сроку выполнения (heapq). Поток спит ровно до ближайшего срока
+    или до события остановки; задачи выполняются в том же потоке и могут ставить новые.
+    """
+
+    def __init__(self, stop_event, should_stop=None):
+        self.stop_event = stop_event
+        self.should_stop = should_stop
+        self._heap = []
+        self._sequence = itertools.count()
+        self.executed = 0
+        self.max_lateness = 0.0
+        # Срок выполняемой задачи - от него отсчитываются повторяющиеся события
+        self.current_deadline = None
+
+    def schedule(self, deadline, name, action, *args):
+        task = ScheduledTask(deadline, name, action, args)
+        heapq.heappush(self._heap, (deadline, next(self._sequence), task))
+        return task
+
+    def schedule_after(self, delay, name, action, *args):
+        return self.schedule(time.monotonic() + delay, name, action, *args)
+
+    def schedule_now(self, name, action, *args):
+        return self.schedule(time.monotonic(), name, action, *args)
+
+    @staticmethod
+    def cancel(task):
+        task.cancelled = True
+
+    def clear(self):
+        self._heap.clear()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def stopped(self):
+        return self.stop_event.is_set() or (self.should_stop is not None and self.should_stop())
+
+    def run(self):
+        """Выполняет задачи, пока очередь не опустеет или не придет сигнал остановки"""
+        while self._heap and not self.stopped():
+            deadline, _, task = self._heap[0]
+            delay = deadline - time.monotonic()
+            if delay > 0 and self.stop_event.wait(delay):
+                break
+            heapq.heappop(self._heap)
+            if task.cancelled:
+                continue
+
+            lateness = time.monotonic() - deadline
+            self.max_lateness = max(self.max_lateness, lateness)
+            logging.debug(f"Задача '{task.name}' (опоздание {lateness * 1000:.0f} мс)")
+            self.executed += 1
+            self.current_deadline = deadline
+            task.action(*task.args)
+
+
+class Cadence:
+    """
+    Темп повторяющегося события: следующий срок отсчитывается от срока предыдущего,
+    поэтому задержки не накапливаются. Период 0 - без паузы.
+    """
+
+    def __init__(self, interval=0.0):
+        self.interval = interval
+        self._last = None
+
+    def reset(self):
+        self._last = None
+
+    def next_deadline(self):
+        now = time.monotonic()
+        if self._last is None or self.interval <= 0:
+            return now
+        return max(self._last + self.interval, now)
+
+    def mark(self, deadline=None):
+        self._last = time.monotonic() if deadline is None else deadline
+
+    def ready(self):
+        """True и отметка, если срок наступил (для ограничения частоты обновлений)"""
+        now = time.monotonic()
+        if self._last is not None and self.interval > 0 and now < self._last + self.interval:
+            return False
+        self.mark(now)
+        return True
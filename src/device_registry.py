@@ -0,0 +1,203 @@
+import logging
+import threading
+
+import modbus_tk.defines as cst
+
+from . import modbus_bus
+from . import modbus_connection
+from .register_snapshot import REGISTER_BLOCK_START, REGISTER_BLOCK_SIZE, RegisterSnapshotService
+
+# Имя прибора, настраиваемого в окне ModBus (с ним работает основной цикл измерений)
+DEFAULT_DEVICE = "main"
+
+
+class ModbusLink:
+    """
+    Линия связи (COM-порт или адрес tcp://host:port): соединение и поток шины.
+    Приборы с разными адресами на одной линии RS-485 делят ее, разные линии работают независимо.
+    """
+
+    def __init__(self, port, baudrate=9600, timeout=1):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.devices = set()
+        self._listeners = []
+        self.connection = modbus_connection.ConnectionManager(self._on_change)
+        self.bus = modbus_bus.BusManager(lambda: self.connection.master, on_result=self.connection.record_transaction)
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _on_change(self, master, connected):
+        for listener in list(self._listeners):
+            listener(master, connected)
+
+    def open(self, probe_device_num):
+        # Проверка связи после переподключения - чтение блока регистров мультиплексора
+        self.connection.probe = lambda: self.bus.execute(probe_device_num, cst.READ_HOLDING_REGISTERS,
+                                                         REGISTER_BLOCK_START, REGISTER_BLOCK_SIZE,
+                                                         priority=modbus_bus.PRIORITY_CONTROL)
+        self.connection.open(probe_device_num, self.port, self.baudrate, self.timeout)
+
+    def close(self):
+        self.connection.close()
+
+
+class Device:
+    """Прибор (мультиплексор) на линии связи: снимок регистров и переключатель каналов"""
+
+    def __init__(self, name, device_num=0):
+        self.name = name
+        self.device_num = device_num
+        self.link = None
+        self.switcher = None
+        self.registers = RegisterSnapshotService(self.read_register_block)
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """listener(master, connected) вызывается при изменении состояния связи"""
+        self._listeners.append(listener)
+
+    def _on_link_change(self, master, connected):
+        self.registers.invalidate()
+        for listener in list(self._listeners):
+            listener(master, connected)
+
+    def attach(self, link):
+        self.link = link
+        link.devices.add(self.name)
+        link.add_listener(self._on_link_change)
+        self._on_link_change(link.connection.master, link.connection.connected)
+
+    def detach(self):
+        link = self.link
+        if link is None:
+            return None
+        link.remove_listener(self._on_link_change)
+        link.devices.discard(self.name)
+        self.link = None
+        self._on_link_change(None, False)
+        return link
+
+    @property
+    def connected(self):
+        return self.link is not None and self.link.connection.connected
+
+    @property
+    def master(self):
+        return self.link.connection.master if self.link is not None else None
+
+    @property
+    def reconnecting(self):
+        return self.link is not None and self.link.connection.reconnecting
+
+    def wait_connected(self, timeout=None):
+        return self.link is not None and self.link.connection.wait_connected(timeout)
+
+    def mark_lost(self, error):
+        if self.link is not None:
+            self.link.connection.mark_lost(error)
+
+    def read_register_block(self, start, count, priority=modbus_bus.PRIORITY_STATUS):
+        """Чтение блока holding-регистров через очередь шины своей линии"""
+        if not self.connected:
+            raise ConnectionError(f"Нет соединения с ModBus (прибор {self.name})")
+        return self.link.bus.execute(self.device_num, cst.READ_HOLDING_REGISTERS, start, count, priority=priority)
+
+    def write_register(self, address, value, priority=modbus_bus.PRIORITY_CONTROL):
+        """Запись одного регистра; снимок регистров после нее сбрасывается"""
+        if not self.connected:
+            raise ConnectionError(f"Нет соединения с ModBus (прибор {self.name})")
+        self.link.bus.execute(self.device_num, cst.WRITE_SINGLE_REGISTER, address, output_value=value,
+                              priority=priority)
+        self.registers.invalidate()
+
+    def log_stats(self):
+        if self.link is None:
+            return
+        logging.info(f"Прибор {self.name} (адрес {self.device_num}, {self.link.port}):")
+        self.link.bus.log_stats()
+        self.link.connection.log_health()
+
+
+class DeviceRegistry:
+    """Реестр приборов по имени; линии связи создаются по порту и закрываются, когда не нужны"""
+
+    def __init__(self, switcher_factory=None):
+        self.switcher_factory = switcher_factory
+        self._devices = {}
+        self._links = {}
+        self._lock = threading.RLock()
+
+    def device(self, name):
+        """Прибор по имени; создается без подключения при первом обращении"""
+        with self._lock:
+            device = self._devices.get(name)
+            if device is None:
+                device = Device(name)
+                if self.switcher_factory is not None:
+                    device.switcher = self.switcher_factory(device)
+                self._devices[name] = device
+            return device
+
+    def get(self, name):
+        with self._lock:
+            return self._devices.get(name)
+
+    def names(self):
+        with self._lock:
+            return list(self._devices)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._devices.values()))
+
+    def connect(self, name, device_num, port, baudrate=9600, timeout=1):
+        """Подключает прибор; ошибка открытия порта пробрасывается"""
+        with self._lock:
+            device = self.device(name)
+            self.disconnect(name)
+            device.device_num = device_num
+
+            link = self._links.get(port)
+            if link is None:
+                link = ModbusLink(port, baudrate, timeout)
+                link.open(device_num)
+                self._links[port] = link
+            elif link.baudrate != baudrate:
+                logging.warning(f"Линия {port} уже открыта на скорости {link.baudrate}, "
+                                f"скорость {baudrate} для прибора {name} не применяется")
+            device.attach(link)
+            logging.info(f"Прибор {name} подключен: адрес {device_num}, линия {port}")
+            return device
+
+    def disconnect(self, name):
+        with self._lock:
+            device = self._devices.get(name)
+            if device is None:
+                return
+            link = device.detach()
+            if link is not None and not link.devices:
+                link.close()
+                self._links.pop(link.port, None)
+
+    def close_all(self):
+        with self._lock:
+            for name in list(self._devices):
+                self.disconnect(name)
+
+    def connect_from_config(self, devices_config):
+        """Подключает приборы из списка словарей name/device_num/port/baudrate/timeout"""
+        connected = []
+        for entry in devices_config:
+            try:
+                connected.append(self.connect(entry["name"], int(entry["device_num"]), entry["port"],
+                                              entry.get("baudrate", 9600), int(entry.get("timeout", 1))))
+            except Exception as e:
+                logging.error(f"Не удалось подключить прибор {entry.get('name', '?')}: {e}")
+        return connected
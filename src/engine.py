@@ -0,0 +1,622 @@
+import csv
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from . import acquisition
+from . import acquisition_pipeline
+from . import config_store
+from . import cycle_scheduler
+from . import deadline_scheduler
+from . import fetch_data
+from . import modbus_bus
+from . import quantification
+from . import result_bus
+from . import utility_functions
+
+# Режимы цикла измерений
+MODE_SIMULATION = "simulation"
+MODE_CHANNELS = "channels"
+
+
+class MeasurementEngine:
+    """
+    Цикл измерений без GUI: фон, измерение по каналам с переключением через ModBus,
+    обработка спектров и архив. Результаты публикуются в шину result_bus; окно
+    программы или клиенты службы (daemon.py) только отображают их.
+    """
+
+    def __init__(self):
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.mode = None
+        # Графики спектров обновляются не чаще интервала обновления графиков
+        self.spectrum_plot_cadence = deadline_scheduler.Cadence(utility_functions.plots_interval)
+        # Расчет параметров exequant идет в своих потоках, результаты пишутся в архив по готовности
+        self.quantification = quantification.QuantificationExecutor(self.finish_quantification)
+        # Пакет расчета exequant: spectrum - каждый спектр отдельно, channel - измерения канала,
+        # cycle - весь цикл каналов; номер цикла отличает пакеты соседних циклов
+        self.quant_batch = "spectrum"
+        self.cycle_number = 0
+        self._archive_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Запускает цикл измерений; 0 или код ошибки, если запуск невозможен"""
+        if self.running:
+            logging.warning("Попытка запустить поток, когда он уже запущен. Игнорируем.")
+            return 0
+
+        utility_functions.stop_threads = False
+        self.stop_event.clear()  # Сбрасываем событие остановки
+        self.quant_batch = utility_functions.load_channel_config()["params"].get("quant_batch", "spectrum")
+        # Пул exequant останавливается в конце каждого запуска и создается заново
+        if self.quantification.closed:
+            self.quantification = quantification.QuantificationExecutor(self.finish_quantification)
+
+        # Проверяем соединение ModBus
+        utility_functions.check_modbus_connection(priority=modbus_bus.PRIORITY_UI)
+
+        # Проверяем режим симуляции
+        if utility_functions.simulation == 1:
+            logging.info("Запускаем поток измерения в режиме симуляции")
+            self.mode = MODE_SIMULATION
+            target = self.measurement_thread
+        elif utility_functions.modbus_connected and utility_functions.master is not None:
+            logging.info(f"Используем существующее соединение ModBus:")
+            logging.info(f"Порт={utility_functions.port}, Адрес={utility_functions.device_num}, Таймаут={utility_functions.timeout}")
+            logging.info("Запускаем поток измерения по каналам")
+            self.mode = MODE_CHANNELS
+            target = self.channel_measurement_thread
+        else:
+            logging.error("Нет соединения ModBus. Необходимо настроить соединение в окне настроек ModBus.")
+            utility_functions.stop_threads = True
+            return -106
+
+        self.thread = threading.Thread(target=self._run, args=(target,), name="measurement", daemon=True)
+        self.thread.start()
+        return 0
+
+    def _run(self, target):
+        result_bus.result_bus.publish(result_bus.VIEW_STATE, True)
+        try:
+            target()
+        finally:
+            # Неполный пакет спектров рассчитывается сразу после остановки; начатые расчеты
+            # доводятся до архива в фоне, после чего пул и его временная папка удаляются
+            self.quantification.shutdown(wait=False)
+            result_bus.result_bus.publish(result_bus.VIEW_STATE, False)
+
+    def stop(self, timeout=2):
+        utility_functions.stop_threads = True
+        self.stop_event.set()  # Устанавливаем событие остановки
+        thread = self.thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=timeout)  # Ожидаем завершения с таймаутом
+            if thread.is_alive():
+                logging.warning("Поток измерения не завершился вовремя (daemon)")
+
+    def measure_background(self):
+        """Измерение фона в отдельном потоке (кнопка в окне настроек)"""
+        thread = threading.Thread(target=self.set_fixed_fon, name="background", daemon=True)
+        thread.start()
+        return thread
+
+    def error_out(self, res):
+        """Останавливает цикл измерений и сообщает код ошибки клиентам"""
+        if res > 0:
+            res = -500
+        logging.error(f"Цикл измерений остановлен с ошибкой {res}")
+        utility_functions.stop_threads = True
+        result_bus.result_bus.publish(result_bus.VIEW_ERROR, res)
+
+    def save_to_archive(self, conc, y, timestamp=None):
+        # Строка архива помечается моментом измерения спектра, а не моментом расчета
+        if timestamp is None:
+            timestamp = datetime.today()
+        with self._archive_lock:
+            self._save_to_archive(conc, y, timestamp)
+
+    def _save_to_archive(self, conc, y, timestamp):
+        date_now = timestamp.strftime('%y_%m_%d')
+        archive_name = f'Archive/{date_now}.csv'
+        logging.info(f"Сохранение данных в архив: {archive_name}")
+
+        try:
+            if os.path.exists(archive_name):
+                mode = 'a'
+            else:
+                mode = 'w'
+            with open(archive_name, mode=mode) as employee_file:
+                employee_writer = csv.writer(employee_file, delimiter=';', quotechar='"',
+                                             quoting=csv.QUOTE_MINIMAL)
+                # Параметр без значения - пустая колонка: колонки слотов не сдвигаются
+                values = ["" if np.isnan(value) else value for value in conc]
+                result_to_write = [timestamp.strftime('%y_%m_%d_%H_%M_%S')] + values + np.asarray(y).tolist()
+                employee_writer.writerow(result_to_write)
+            logging.info("Данные успешно сохранены в архив")
+        except Exception as e:
+            logging.error(f"Ошибка при сохранении в архив: {e}")
+
+        # Очистка старых файлов
+        current_time = datetime.now()
+        directories = ["Archive/", "Reports/", "Spectra/"]
+        extensions = [".csv", ".txt", ".spe"]
+        logging.info(f"Начало очистки старых файлов (старше {utility_functions.days_threshold} дней)")
+
+        for i in range(len(directories)):
+            for filename in os.listdir(directories[i]):
+                file_path = os.path.join(directories[i], filename)
+                if filename.endswith(extensions[i]):
+                    try:
+                        date_str = filename[0:8]
+                        file_date = datetime.strptime(date_str, '%y_%m_%d')
+                        days_difference = (current_time - file_date).days
+                        if days_difference > utility_functions.days_threshold:
+                            os.remove(file_path)
+                            logging.info(f"Удален старый файл: {file_path}")
+                    except ValueError:
+                        logging.warning(f"Невозможно определить дату файла: {filename}")
+
+    def measurement_thread(self):
+        """Поток для непрерывного измерения"""
+        logging.info("Запуск потока измерения")
+
+        # Если первый запуск, измеряем фоновый спектр
+        if utility_functions.first_start:
+            logging.info("Первый запуск - измерение фонового спектра")
+            self.set_fixed_fon()
+
+        # В режиме симуляции обновляем информацию о текущем канале
+        if utility_functions.simulation == 1:
+            result_bus.result_bus.publish(result_bus.VIEW_CHANNEL, "Симуляция")
+
+        # Без переключения каналов измерения идут с интервалом обновления графиков
+        cadence = deadline_scheduler.Cadence(utility_functions.plots_interval)
+        while not utility_functions.stop_threads:
+            # Выполняем измерение, если прошло достаточно времени
+            if cadence.ready():
+                # Выполняем одно измерение
+                if not self.update_trans_plot_single():
+                    break
+                    
+            # Проверяем сигнал остановки
+            if self.stop_event.wait(timeout=1):
+                logging.info("Получен сигнал остановки")
+                break
+
+    def set_fixed_fon(self):
+        """Метод для измерения и сохранения фонового спектра"""
+        logging.info("Начало установки фиксированного фона")
+        bus = result_bus.result_bus
+        bus.publish(result_bus.VIEW_BACKGROUND, (True, None))
+        date = None
+        try:
+            res = 0
+            if utility_functions.first_start:
+                # При первом запуске перед измерением фона выполняется start_func
+                res, warn = utility_functions.start_func()
+                logging.info(f"Результат start_func: res={res}, warn={warn}")
+                if res != 0:
+                    logging.error(f"Ошибка запуска при измерении фона: {res}")
+                    self.error_out(res)
+                    utility_functions.send_error_to_gui(f"Ошибка при измерении фона (start_func): {res}")
+                    return
+
+            res, warn = utility_functions.init_func(background=True)
+            logging.info(f"Результат init_func: res={res}, warn={warn}")
+            if res != 0:
+                logging.error(f"Ошибка инициализации при измерении фона: {res}")
+                self.error_out(res)
+                utility_functions.send_error_to_gui(f"Ошибка при измерении фона (init_func): {res}")
+                return
+
+            spectrum = acquisition.read_measured_spectrum()
+            if spectrum is not None:
+                acquisition.set_background(spectrum)
+                logging.info("Текущий спектр сохранен как фоновый")
+
+            # Обновляем дату в конфигурации
+            date = datetime.today().strftime('%d.%m.%y %H:%M:%S')
+            config_store.config.set("fon_updated", date)
+            logging.info("Дата обновления фона сохранена в конфигурации")
+        except Exception as e:
+            utility_functions.send_error_to_gui(f"Ошибка при установке фиксированного фона: {e}")
+        finally:
+            bus.publish(result_bus.VIEW_BACKGROUND, (False, date))
+            logging.info("Установка фиксированного фона завершена")
+
+    def channel_measurement_thread(self):
+        """Поток для измерения по каналам с переключением через ModBus"""
+        logging.info("\n" + "="*50)
+        logging.info("ЗАПУСК ПОТОКА ИЗМЕРЕНИЯ ПО КАНАЛАМ")
+        logging.info("="*50)
+        
+        # Загружаем настройки каналов
+        channel_config = utility_functions.load_channel_config()
+        
+        # Получаем параметры
+        wait_time = channel_config["params"]["wait_time"]
+        alarm_fix = channel_config["params"]["alarm_fix"]
+        max_attempts = channel_config["params"]["attempts"]
+        background_period = channel_config["params"]["background_period"] * 60  # Переводим в секунды
+        measurements_per_channel = channel_config["params"]["measurements"]
+        # Интервал между измерениями канала; 0 - подряд со скоростью прибора
+        acquisition_interval = channel_config["params"].get("acquisition_interval", 0)
+        plots_interval = utility_functions.plots_interval  # Интервал обновления графиков в секундах
+        
+        logging.info(f"Параметры измерения:")
+        logging.info(f"- Время ожидания переключения (tп): {wait_time} сек")
+        logging.info(f"- Фиксация аварии системы (АСПК): {'Да' if alarm_fix else 'Нет'}")
+        logging.info(f"- Количество попыток переключения (k): {max_attempts}")
+        logging.info(f"- Период измерения фона (tф): {background_period/60} мин")
+        logging.info(f"- Количество измерений на канал (n): {measurements_per_channel}")
+        logging.info(f"- Интервал между измерениями канала: {acquisition_interval or 'без паузы'} сек")
+        logging.info(f"- Интервал обновления графиков: {plots_interval} сек")
+        
+        # Время начала для отслеживания периода фонового спектра
+        start_time = time.monotonic()
+        # Темп измерений канала не зависит от интервала обновления графиков
+        cadence = deadline_scheduler.Cadence(acquisition_interval)
+        
+        # Проверяем соединение с ModBus
+        if not utility_functions.check_modbus_connection():
+            logging.error("Нет соединения с ModBus для измерения по каналам")
+            self.error_out(-106)  # Код ошибки для отсутствия соединения
+            return
+            
+        # Создаем объект для работы с каналами
+        switcher = utility_functions.ChannelSwitcher()
+        
+        # Проверяем, инициализировано ли устройство
+        status = switcher.read_status()
+        if not status:
+            logging.error("Не удалось получить статус устройства")
+            self.error_out(-106)
+            return
+            
+        is_initialized = status.initialization
+        logging.info(f"Статус инициализации устройства: {'инициализировано' if is_initialized else 'не инициализировано'}")
+        
+        if not is_initialized:
+            logging.info("\n=== ЗАПУСК ИНИЦИАЛИЗАЦИИ УСТРОЙСТВА ===")
+            
+            # Запрос на инициализацию
+            if not switcher.request_channel_switch(1):
+                logging.error("Не удалось отправить запрос на инициализацию")
+                self.error_out(-104)  # Код ошибки для неудачной инициализации
+                return
+                
+            # Мониторим процесс инициализации
+            if not switcher.monitor_initialization():
+                logging.error("Ошибка инициализации устройства")
+                self.error_out(-105)  # Код ошибки для неудачной инициализации
+                return
+                
+            logging.info("✓ Инициализация устройства успешно завершена")
+        else:
+            logging.info("✓ Устройство уже инициализировано")
+        
+        # Проверяем готовность устройства
+        if not switcher.wait_for_ready_state(timeout=10):
+            logging.error("Устройство не готово к измерениям")
+            self.error_out(-107)  # Код ошибки для неготовности устройства
+            return
+            
+        # Переключаемся на канал 0 (пустая ячейка) в начале для измерения фона
+        if utility_functions.first_start:
+            logging.info("\n=== ПЕРЕКЛЮЧЕНИЕ НА КАНАЛ 0 (ПУСТАЯ ЯЧЕЙКА) ДЛЯ НАЧАЛЬНОГО ИЗМЕРЕНИЯ ФОНА ===")
+            if not switcher.switch_to_channel(0, wait_time):
+                logging.error("Не удалось переключиться на канал 0")
+                self.error_out(-101)  # Используем код ошибки -101 для таймаута переключения
+                return
+                
+            # Измеряем фоновый спектр перед началом цикла по каналам
+            logging.info("Измерение начального фонового спектра")
+            self.set_fixed_fon()
+        else:
+            logging.info("Пропускаем начальное измерение фона (не первый запуск)")
+        
+        # Планировщик порядка обхода каналов
+        scheduler = cycle_scheduler.get_scheduler(channel_config["params"].get("scheduler", "sequential"))
+        active_channels = [channel_num for channel_num in range(1, 13)
+                           if channel_config.get(f"channel_{channel_num}", {}).get("active", False)]
+        logging.info(f"Планировщик цикла: {scheduler.name}, активные каналы: {active_channels}")
+        
+        # Очередь задач по срокам: переключение, фон, измерение; поток спит до ближайшего срока
+        deadlines = deadline_scheduler.DeadlineScheduler(self.stop_event,
+                                                         should_stop=lambda: utility_functions.stop_threads)
+        # Обработка спектров (exequant, архив, графики) идет параллельно с переключением каналов
+        pipeline = acquisition_pipeline.ProcessingPipeline(self.process_single)
+        cycle = {
+            "route": [],
+            "start": time.monotonic(),
+            # Длительность предыдущего цикла - для планирования фона
+            "time": 0.0,
+            "failed_attempts": 0,
+        }
+        
+        def register_switch_failure():
+            """Учитывает неудачное переключение; False, если превышено число попыток"""
+            if alarm_fix:
+                cycle["failed_attempts"] += 1
+                if cycle["failed_attempts"] >= max_attempts:
+                    logging.error(f"Превышено количество попыток переключения ({max_attempts})")
+                    self.error_out(-102)
+                    return False
+            return True
+        
+        def next_stop():
+            """Задача переключения: следующая точка маршрута, при необходимости новый маршрут"""
+            # После обрыва связи ждем переподключения и продолжаем цикл с того же места
+            if not utility_functions.modbus_connected:
+                if not self.wait_modbus_reconnect():
+                    if not utility_functions.stop_threads and not self.stop_event.is_set():
+                        logging.error("Нет соединения с ModBus, цикл измерений остановлен")
+                        self.error_out(-106)
+                    return
+            
+            if not cycle["route"]:
+                now = time.monotonic()
+                cycle["time"] = now - cycle["start"]
+                cycle["start"] = now
+                self.cycle_number += 1
+                utility_functions.main_device.log_stats()
+                
+                # Порядок обхода на этот цикл; фон (канал 0) планировщик вставляет сам
+                head = utility_functions.get_active_channel()
+                cycle["route"] = scheduler.plan(head if head >= 0 else None, active_channels,
+                                                now - start_time, background_period, cycle["time"])
+                if not cycle["route"]:
+                    # Нет активных каналов - следующий шаг в момент, когда понадобится фон
+                    deadlines.schedule(start_time + background_period, "switch", next_stop)
+                    return
+            
+            channel_num = cycle["route"].pop(0)
+            if channel_num == cycle_scheduler.BACKGROUND_CHANNEL:
+                switch_to_background()
+            else:
+                switch_to_measurement_channel(channel_num)
+        
+        def switch_to_background():
+            logging.info(f"\n=== ПЕРИОДИЧЕСКОЕ ИЗМЕРЕНИЕ ФОНА (ПРОШЛО {(time.monotonic() - start_time)/60:.1f} МИН) ===")
+            
+            # Переключаемся на канал 0
+            logging.info("Переключение на канал 0 для измерения фона")
+            if not switcher.switch_to_channel(0, wait_time):
+                logging.error("Не удалось переключиться на канал 0")
+                # Обрыв связи - не авария переключения
+                if utility_functions.modbus_connected and not register_switch_failure():
+                    return
+                deadlines.schedule_now("switch", next_stop)
+                return
+            
+            deadlines.schedule_now("background", measure_background)
+        
+        def measure_background():
+            nonlocal start_time
+            logging.info("Измерение фонового спектра")
+            self.set_fixed_fon()
+            
+            # Сбрасываем счетчик времени для фонового спектра
+            start_time = time.monotonic()
+            deadlines.schedule_now("switch", next_stop)
+        
+        def switch_to_measurement_channel(channel_num):
+            # Получаем имя канала
+            channel_name = channel_config.get(f"channel_{channel_num}", {}).get("name", f"АТ-{channel_num}")
+            
+            # Переключаемся на канал
+            logging.info(f"\n=== ПЕРЕКЛЮЧЕНИЕ НА КАНАЛ {channel_num} ({channel_name}) ===")
+            if not switcher.switch_to_channel(channel_num, wait_time):
+                logging.error(f"Не удалось переключиться на канал {channel_num} ({channel_name})")
+                if not utility_functions.modbus_connected:
+                    # Обрыв связи - не авария переключения
+                    deadlines.schedule_now("switch", next_stop)
+                    return
+                if alarm_fix:
+                    if register_switch_failure():
+                        deadlines.schedule_now("switch", next_stop)
+                    return
+                
+                # Если АСПК=нет, продолжаем измерение текущего канала
+                logging.info("АСПК=нет, продолжаем измерение текущего канала")
+                # Получаем текущий канал
+                current_channel = utility_functions.get_active_channel()
+                if current_channel < 0:
+                    logging.error("Не удалось определить текущий канал")
+                    deadlines.schedule_now("switch", next_stop)
+                    return
+                channel_num = current_channel  # Используем текущий канал
+                channel_name = channel_config.get(f"channel_{channel_num}", {}).get("name", f"АТ-{channel_num}")
+                logging.info(f"Используем текущий канал: {channel_num} ({channel_name})")
+            
+            # Выполняем измерения для текущего канала
+            logging.info(f"Начало измерений для канала {channel_num} ({channel_name})")
+            if measurements_per_channel <= 0:
+                cycle["failed_attempts"] = 0
+                deadlines.schedule_now("switch", next_stop)
+                return
+            # Первое измерение - сразу после переключения
+            cadence.reset()
+            deadlines.schedule(cadence.next_deadline(), "acquire", acquire, channel_num, channel_name, 0)
+        
+        def acquire(channel_num, channel_name, measurement):
+            logging.info(f"Измерение {measurement+1}/{measurements_per_channel} для канала {channel_num} ({channel_name})")
+            cadence.mark(deadlines.current_deadline)
+            
+            # Спектр уходит в поток обработки, а переключение на следующий канал начинается сразу
+            spectrum = self.acquire_single()
+            if spectrum is None or not pipeline.submit(spectrum, should_stop=deadlines.stopped):
+                logging.error("Ошибка при измерении спектра")
+            elif measurement + 1 < measurements_per_channel:
+                deadlines.schedule(cadence.next_deadline(), "acquire", acquire, channel_num, channel_name,
+                                   measurement + 1)
+                return
+            
+            # Сбрасываем счетчик неудачных попыток после измерения канала
+            cycle["failed_attempts"] = 0
+            deadlines.schedule_now("switch", next_stop)
+        
+        # Основной цикл измерения
+        logging.info("\n=== НАЧАЛО ЦИКЛА ИЗМЕРЕНИЙ ПО КАНАЛАМ ===")
+        deadlines.schedule_now("switch", next_stop)
+        pipeline.start()
+        try:
+            deadlines.run()
+        except Exception as e:
+            logging.error(f"Ошибка в потоке измерения каналов: {e}", exc_info=True)
+            self.error_out(-103)  # Используем код ошибки -103 для общей ошибки
+        finally:
+            # При остановке пользователем необработанные спектры отбрасываются
+            pipeline.stop(discard=deadlines.stopped())
+        
+        if self.stop_event.is_set():
+            logging.info("Получен сигнал остановки")
+        logging.info(f"Выполнено задач: {deadlines.executed}, максимальное опоздание {deadlines.max_lateness:.2f} с")
+        
+        logging.info("\n=== ЗАВЕРШЕНИЕ ПОТОКА ИЗМЕРЕНИЯ ПО КАНАЛАМ ===")
+
+    def wait_modbus_reconnect(self):
+        """Ожидает автоматического переподключения ModBus; False, если его нет или измерение остановлено"""
+        device = utility_functions.main_device
+        if not device.reconnecting:
+            return False
+        logging.info("Ожидание восстановления связи с ModBus...")
+        while not utility_functions.stop_threads and not self.stop_event.is_set():
+            if device.wait_connected(timeout=1):
+                logging.info("Связь с ModBus восстановлена, цикл измерений продолжается")
+                return True
+        return False
+
+    def update_trans_plot_single(self):
+        """Выполняет одно измерение"""
+        logging.info("=== НАЧАЛО update_trans_plot_single() ===")
+        measurement = self.acquire_single()
+        if measurement is None or not self.process_single(measurement):
+            return False
+        logging.info("=== ЗАВЕРШЕНИЕ update_trans_plot_single() ===")
+        return True
+
+    def acquire_single(self):
+        """Стадия измерения: спектр и фон на момент измерения; None при ошибке"""
+        # Интерфейс обновляется через шину результатов в главном потоке
+        bus = result_bus.result_bus
+        bus.publish(result_bus.VIEW_SETTINGS, (fetch_data.res, fetch_data.scans, fetch_data.cuv_length))
+            
+        # Получаем текущий активный канал и его имя
+        current_channel = utility_functions.get_active_channel(priority=modbus_bus.PRIORITY_UI)
+        if current_channel >= 0:
+            channel_name = utility_functions.get_channel_name(current_channel)
+            # Обновляем label с информацией о текущем канале
+            bus.publish(result_bus.VIEW_CHANNEL, f"{channel_name}")
+            logging.info(f"Текущий канал: {current_channel} ({channel_name})")
+        else:
+            bus.publish(result_bus.VIEW_CHANNEL, "Не выбран")
+            logging.info("Текущий канал не определен")
+
+        try:
+            if utility_functions.first_start:
+                logging.info("Первый запуск - настройка графиков")
+                bus.publish(result_bus.VIEW_AUTORANGE, True)
+                utility_functions.zoom = False
+                utility_functions.first_start = False
+                logging.info("Первый запуск завершен успешно")
+
+            # LoadParam - только если ini-файлы изменились с прошлого измерения
+            utility_functions.load_param_if_changed()
+
+            # Измерение спектра и обновление графика 1
+            res, warn, spectrum = acquisition.measure_spectrum()
+            logging.info(f"Результат init_func: res={res}, warn={warn}")
+
+            if res != 0:
+                self.error_out(res)
+                return None
+
+            background = acquisition.get_background()
+            if spectrum is None or background is None:
+                logging.error("Нет измеренного или фонового спектра")
+                self.error_out(-103)
+                return None
+        except Exception as e:
+            logging.error(f"Неожиданная ошибка при измерении спектра: {str(e)}", exc_info=True)
+            self.error_out(-103)  # Используем код ошибки -103 для общей ошибки
+            return None
+
+        # Фон, канал и время запоминаются вместе со спектром: к моменту обработки
+        # фон может быть переизмерен, а прибор - переключен на другой канал
+        return spectrum, background, current_channel, datetime.today(), self.cycle_number
+
+    def process_single(self, measurement):
+        """Стадия обработки: поглощение, графики и постановка спектра на расчет exequant"""
+        spectrum, background, channel, timestamp, cycle_number = measurement
+        # Измерения идут в темпе прибора, графики спектров - в темпе настройки интерфейса
+        self.spectrum_plot_cadence.interval = utility_functions.plots_interval
+        update_plots = self.spectrum_plot_cadence.ready()
+        try:
+            if update_plots:
+                result_bus.result_bus.publish(result_bus.VIEW_INTENSITY, (spectrum.x, spectrum.y, background.y))
+                logging.info("График 1 отправлен на обновление")
+
+            logging.info("Получение спектра поглощения по формуле")
+            x_values, y_values = acquisition.absorbance_spectrum(spectrum, background)
+
+            if len(x_values) > 0 and len(y_values) > 0:
+                if update_plots:
+                    result_bus.result_bus.publish(result_bus.VIEW_ABSORBANCE, (x_values, y_values))
+                    logging.info("График 2 отправлен на обновление")
+
+                job = None
+                # Проверяем, указан ли путь к exequant.exe
+                if not utility_functions.exequant_path:
+                    logging.warning("Путь к exequant.exe не указан, пропускаем получение цетанового числа")
+                else:
+                    # Расчет не задерживает измерение: архив и параметры запишутся по готовности
+                    logging.info("Спектр поставлен на расчет цетанового числа exequant")
+                    job = self.quantification.submit(channel, timestamp, x_values, y_values,
+                                                     self.quant_batch_key(channel, cycle_number))
+                if job is None:
+                    self.finish_quantification(quantification.QuantificationJob(channel, timestamp,
+                                                                                x_values, y_values))
+            else:
+                self.error_out(-103)
+                return False
+                
+        except Exception as e:
+            logging.error(f"Неожиданная ошибка при обработке спектра: {str(e)}", exc_info=True)
+            self.error_out(-103)  # Используем код ошибки -103 для общей ошибки
+            return False
+            
+        return True
+
+    def quant_batch_key(self, channel, cycle_number):
+        """Ключ пакета расчета exequant для спектра; None - расчет без пакета"""
+        if self.quant_batch == "channel":
+            return cycle_number, channel
+        if self.quant_batch == "cycle":
+            return cycle_number
+        return None
+
+    def finish_quantification(self, job):
+        """Сохраняет спектр с рассчитанными параметрами в архив и отправляет их на графики"""
+        # Все свойства одного расчета exequant раскладываются по слотам параметров
+        conc = quantification.map_parameters(job.properties)
+        if job.properties is not None:
+            logging.info(f"Расчет exequant для канала {job.channel}: {len(job.properties)} свойств, "
+                         f"{job.duration:.1f} с")
+
+        logging.info("Спектр получен, сохранение в архив...")
+        self.save_to_archive(conc, job.y, job.timestamp)
+
+        # Каждое значение параметра попадает на график тренда
+        result_bus.result_bus.publish_params(conc)
+        logging.info("Значения параметров отправлены на графики")
+
@@ -0,0 +1,277 @@
+import json
+import logging
+import queue
+import socket
+import socketserver
+import threading
+
+import numpy as np
+
+from . import config_store
+from . import result_bus
+from . import utility_functions
+from .device_registry import DEFAULT_DEVICE
+from .engine import MeasurementEngine
+
+# Адрес службы измерений по умолчанию (python daemon.py)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5030
+
+# Сколько сообщений может ждать отправки медленному клиенту; лишние отбрасываются
+CLIENT_QUEUE_SIZE = 256
+# Пауза между попытками подключения клиента к службе, сек
+CLIENT_RECONNECT_DELAY = 2.0
+# Как часто поток отправки проверяет, не отключен ли клиент, сек
+CLIENT_SEND_POLL = 0.5
+
+# Служба недоступна (код ошибки для окна программы)
+ERROR_ENGINE_UNAVAILABLE = -108
+
+# Представления со спектрами: массивы передаются списками и восстанавливаются в numpy
+_ARRAY_VIEWS = (result_bus.VIEW_INTENSITY, result_bus.VIEW_ABSORBANCE)
+
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def encode_message(message):
+    return (json.dumps(_to_json(message), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def connect_modbus_from_config():
+    """Подключает мультиплексор по секции "modbus" в config.json (как окно настроек ModBus)"""
+    modbus_config = config_store.config.get("modbus", {})
+    port = modbus_config.get("port", "")
+    if not port:
+        logging.info("Порт ModBus в config.json не задан, подключение пропущено")
+        return False
+    try:
+        utility_functions.port = port
+        utility_functions.device_num = int(modbus_config.get("device_num", 1))
+        utility_functions.timeout = int(modbus_config.get("timeout", 1))
+        utility_functions.devices.connect(DEFAULT_DEVICE, utility_functions.device_num, port,
+                                          int(modbus_config.get("baudrate", 9600)), utility_functions.timeout)
+        utility_functions.connect_configured_devices()
+        return True
+    except Exception as e:
+        utility_functions.send_error_to_gui(f"Ошибка подключения к ModBus ({port}): {e}")
+        return False
+
+
+class _ClientHandler(socketserver.StreamRequestHandler):
+    """Клиент службы: получает результаты шины и присылает команды (по строке JSON)"""
+
+    def setup(self):
+        super().setup()
+        self._outbox = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self._closed = threading.Event()
+        self._sender = threading.Thread(target=self._send_loop, name="engine-client-send", daemon=True)
+        self._sender.start()
+
+    def _send(self, message):
+        try:
+            self._outbox.put_nowait(message)
+        except queue.Full:
+            logging.warning(f"Клиент службы {self.client_address} не успевает получать результаты, сообщение отброшено")
+
+    def _send_loop(self):
+        try:
+            while not self._closed.is_set():
+                try:
+                    message = self._outbox.get(timeout=CLIENT_SEND_POLL)
+                except queue.Empty:
+                    continue
+                if message is None:
+                    return
+                try:
+                    data = encode_message(message)
+                except (TypeError, ValueError) as e:
+                    logging.error(f"Не удалось передать клиенту службы сообщение {message.get('view')}: {e}")
+                    continue
+                try:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+                except OSError:
+                    return
+        finally:
+            # Соединение закрывается и при ошибке отправки: handle перестает ждать команд
+            self._closed.set()
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _on_result(self, view, data):
+        self._send({"event": "result", "view": view, "data": data})
+
+    def handle(self):
+        engine = self.server.engine
+        logging.info(f"Клиент службы подключен: {self.client_address}")
+        result_bus.result_bus.add_listener(self._on_result)
+        self._send({"event": "result", "view": result_bus.VIEW_STATE, "data": engine.running})
+        try:
+            for line in self.rfile:
+                try:
+                    command = json.loads(line.decode("utf-8")).get("command")
+                except ValueError:
+                    logging.warning(f"Некорректная команда от клиента службы: {line!r}")
+                    continue
+                logging.info(f"Команда клиента службы: {command}")
+                if command == "start":
+                    self._send({"event": "started", "code": engine.start()})
+                elif command == "stop":
+                    engine.stop()
+                elif command == "background":
+                    engine.measure_background()
+                elif command == "status":
+                    self._send({"event": "result", "view": result_bus.VIEW_STATE, "data": engine.running})
+        except OSError:
+            pass
+        finally:
+            result_bus.result_bus.remove_listener(self._on_result)
+            # Очередь может быть заполнена, если поток отправки уже завершился:
+            # он проверяет _closed, а None только будит его, если место есть
+            self._closed.set()
+            try:
+                self._outbox.put_nowait(None)
+            except queue.Full:
+                pass
+            logging.info(f"Клиент службы отключен: {self.client_address}")
+
+
+class EngineServer(socketserver.ThreadingTCPServer):
+    """TCP-сервер службы измерений: окна программы подключаются к нему как клиенты"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, engine, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        super().__init__((host, port), _ClientHandler)
+        self.engine = engine
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="engine-server", daemon=True)
+        self._thread.start()
+        logging.info(f"Служба измерений ожидает клиентов: {self.server_address[0]}:{self.server_address[1]}")
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class EngineClient:
+    """
+    Подключение окна программы к службе измерений. Интерфейс совпадает с MeasurementEngine,
+    результаты службы публикуются в локальную шину result_bus и отрисовываются как обычно.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.running = False
+        self._socket = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._receive_loop, name="engine-client", daemon=True)
+        self._thread.start()
+
+    @property
+    def connected(self):
+        return self._socket is not None
+
+    def _command(self, command):
+        with self._lock:
+            sock = self._socket
+            if sock is None:
+                logging.error(f"Нет связи со службой измерений {self.host}:{self.port}")
+                return False
+            try:
+                sock.sendall(encode_message({"command": command}))
+                return True
+            except OSError as e:
+                logging.error(f"Ошибка отправки команды службе измерений: {e}")
+                return False
+
+    def start(self):
+        return 0 if self._command("start") else ERROR_ENGINE_UNAVAILABLE
+
+    def stop(self, timeout=2):
+        self._command("stop")
+
+    def measure_background(self):
+        self._command("background")
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if self._socket is not None:
+                self._socket.close()
+
+    def _receive_loop(self):
+        while not self._stop.is_set():
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=5)
+            except OSError:
+                self._stop.wait(CLIENT_RECONNECT_DELAY)
+                continue
+            sock.settimeout(None)
+            with self._lock:
+                self._socket = sock
+            logging.info(f"Подключено к службе измерений {self.host}:{self.port}")
+            try:
+                for line in sock.makefile("rb"):
+                    self._dispatch(json.loads(line.decode("utf-8")))
+            except (OSError, ValueError) as e:
+                logging.warning(f"Связь со службой измерений прервана: {e}")
+            with self._lock:
+                self._socket = None
+            sock.close()
+            if not self._stop.is_set():
+                utility_functions.send_error_to_gui("Нет связи со службой измерений, переподключение...")
+                self._stop.wait(CLIENT_RECONNECT_DELAY)
+
+    def _dispatch(self, message):
+        bus = result_bus.result_bus
+        event = message.get("event")
+        if event == "started":
+            if message["code"] != 0:
+                bus.publish(result_bus.VIEW_ERROR, message["code"])
+            return
+        if event != "result":
+            return
+
+        view, data = message["view"], message["data"]
+        if view == result_bus.VIEW_PARAMS:
+            bus.publish_params(data)
+            return
+        if view == result_bus.VIEW_STATE:
+            self.running = bool(data)
+        elif view in _ARRAY_VIEWS:
+            data = tuple(np.asarray(values) for values in data)
+        elif isinstance(data, list):
+            data = tuple(data)
+        bus.publish(view, data)
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or DEFAULT_HOST, int(port)
+
+
+def create_engine():
+    """Локальный движок или клиент службы, если в config.json задан адрес "engine_address" (host:port)"""
+    address = config_store.config.get("engine_address", "")
+    if not address:
+        return MeasurementEngine()
+    host, port = parse_address(address)
+    logging.info(f"Окно программы работает как клиент службы измерений {host}:{port}")
+    return EngineClient(host, port)
@@ -1,8 +1,28 @@
-import json
-
-# чтение конфиг файла GAS.ini
-with open(r'./GAS.ini', 'r') as f:
-    data = f.read()
-    cuv_length = float(data[data.find("Cuvette length=") + 15:data.find("Scans")].strip())
-    scans = int(data[data.find("Scans=") + 6:data.find("Resolution")].strip())
-    res = float(data[data.find("Resolution=") + 11:data.find("Spectra days")].strip())
+from . import ini_config
+
+# Путь к конфиг файлу GAS.ini
+GAS_INI_PATH = ini_config.GAS_INI_PATH
+
+# Параметры GAS.ini, доступные как атрибуты модуля: имя -> (ключ в секции [GAS], тип)
+GAS_FIELDS = {
+    "cuv_length": ("Cuvette length", float),
+    "scans": ("Scans", int),
+    "res": ("Resolution", float),
+}
+
+
+def load(path=GAS_INI_PATH):
+    """Обновление cuv_length/scans/res из разобранного GAS.ini (файл перечитывается только после изменения)"""
+    ini_config.ini_model.refresh()
+    ini = ini_config.ini_model.file(path)
+    values = {name: ini.get("GAS", key, cast) for name, (key, cast) in GAS_FIELDS.items()}
+    globals().update(values)
+    return values
+
+
+def __getattr__(name):
+    # GAS.ini читается при первом обращении к параметру, а не при импорте
+    if name in GAS_FIELDS:
+        load()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
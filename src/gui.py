@@ -1,29 +1,22 @@
 import logging
-import csv
 import os
 import subprocess
 import threading
-import time
-from datetime import datetime
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QVBoxLayout, QGridLayout, QHBoxLayout, QDialog, QFileDialog
-from PyQt5.QtCore import QCoreApplication, QTimer
 from PyQt5.QtGui import QDesktopServices
-import json
 import pyqtgraph as pg
-import serial
-import modbus_tk
-import modbus_tk.defines as cst
-from modbus_tk import modbus_rtu
 
-from . import fetch_data
+from . import config_store
+from . import engine_service
 from . import transmissionPlot
 from . import intensityPlot
 from . import param_plot
+from . import quantification
+from . import result_bus
 from . import utility_functions
-from .settings_window import SettingsWindow
-from .modbus_window import ModbusWindow
+from .settings_window import SettingsWindow, load_config, apply_theme
 
 first_start = True
 int_max = 100000
@@ -66,133 +59,40 @@ class ElidedLabel(QtWidgets.QLabel):
 
 class Ui_MainWindow(object):
     def __init__(self):
-        self.stop_event = threading.Event()
         self._in_error_out = False
-        # Создаем таймер для принудительного обновления графиков
-        self.refresh_timer = QTimer()
-        self.refresh_timer.timeout.connect(self.refresh_plots)
-        self.refresh_timer.start(500)  # Обновляем каждые 500 мс
+        # Цикл измерений: в этом процессе или в службе daemon.py (engine_address в config.json)
+        self.engine = engine_service.create_engine()
 
     def change_color(self):
         self.parent.setStyleSheet('background-color: red;')
 
-    def save_to_archive(self, conc, y):
-        date_now = datetime.today().strftime('%y_%m_%d')
-        archive_name = f'Archive/{date_now}.csv'
-        logging.info(f"Сохранение данных в архив: {archive_name}")
-
-        try:
-            if os.path.exists(archive_name):
-                mode = 'a'
-            else:
-                mode = 'w'
-            with open(archive_name, mode=mode) as employee_file:
-                employee_writer = csv.writer(employee_file, delimiter=';', quotechar='"',
-                                             quoting=csv.QUOTE_MINIMAL)
-                result_to_write = [datetime.today().strftime('%y_%m_%d_%H_%M_%S')] + conc + y
-                employee_writer.writerow(result_to_write)
-            logging.info("Данные успешно сохранены в архив")
-        except Exception as e:
-            logging.error(f"Ошибка при сохранении в архив: {e}")
-
-        # Очистка старых файлов
-        current_time = datetime.now()
-        directories = ["Archive/", "Reports/", "Spectra/"]
-        extensions = [".csv", ".txt", ".spe"]
-        logging.info(f"Начало очистки старых файлов (старше {utility_functions.days_threshold} дней)")
-
-        for i in range(len(directories)):
-            for filename in os.listdir(directories[i]):
-                file_path = os.path.join(directories[i], filename)
-                if filename.endswith(extensions[i]):
-                    try:
-                        date_str = filename[0:8]
-                        file_date = datetime.strptime(date_str, '%y_%m_%d')
-                        days_difference = (current_time - file_date).days
-                        if days_difference > utility_functions.days_threshold:
-                            os.remove(file_path)
-                            logging.info(f"Удален старый файл: {file_path}")
-                    except ValueError:
-                        logging.warning(f"Невозможно определить дату файла: {filename}")
-
     def run_thread(self):
-        # Проверяем, не запущен ли уже поток измерения
-        if hasattr(self, 'thread') and self.thread is not None and self.thread.is_alive():
-            logging.warning("Попытка запустить поток, когда он уже запущен. Игнорируем.")
+        res = self.engine.start()
+        if res == -106:
+            # Если нет соединения с ModBus и не режим симуляции, показываем ошибку и не запускаем измерение
+            QtWidgets.QMessageBox.warning(
+                self.parent, 
+                "Предупреждение", 
+                "Нет соединения ModBus. Необходимо настроить соединение в окне настроек ModBus.",
+                QtWidgets.QMessageBox.Ok
+            )
+            return  # Выходим из метода без запуска потока
+        if res != 0:
+            self.error_out(res)
             return
-            
-        utility_functions.stop_threads = False
-        self.stop_event.clear()  # Сбрасываем событие остановки
-        
-        # Проверяем соединение ModBus
-        utility_functions.check_modbus_connection()
-        
-        # Проверяем режим симуляции
-        if utility_functions.simulation == 1:
-            logging.info("Запуск в режиме симуляции")
-            # Если первый запуск, выполняем set_fixed_fon
-            if utility_functions.first_start:
-                logging.info("Первый запуск - измерение фонового спектра")
-                self.set_fixed_fon()
-            
-            # Запускаем поток измерения в режиме симуляции
-            self.thread = threading.Thread(target=self.measurement_thread, daemon=True)
-            logging.info("Запускаем поток измерения в режиме симуляции")
-        else:
-            # Если не режим симуляции, проверяем соединение ModBus
-            if utility_functions.modbus_connected and utility_functions.master is not None:
-                logging.info(f"Используем существующее соединение ModBus:")
-                logging.info(f"Порт={utility_functions.port}, Адрес={utility_functions.device_num}, Таймаут={utility_functions.timeout}")
-                
-                # Запускаем поток измерения по каналам
-                self.thread = threading.Thread(target=self.channel_measurement_thread, daemon=True)
-                logging.info("Запускаем поток измерения по каналам")
-            else:
-                # Если нет соединения с ModBus и не режим симуляции, показываем ошибку и не запускаем измерение
-                logging.error("Нет соединения ModBus. Необходимо настроить соединение в окне настроек ModBus.")
-                QtWidgets.QMessageBox.warning(
-                    self.parent, 
-                    "Предупреждение", 
-                    "Нет соединения ModBus. Необходимо настроить соединение в окне настроек ModBus.",
-                    QtWidgets.QMessageBox.Ok
-                )
-                return  # Выходим из метода без запуска потока
-        
-        # Запускаем поток, если он был создан
-        if hasattr(self, 'thread') and self.thread is not None:
-            self.thread.start()
-            self.start_button.setText("Остановить\nизмерение")
-            # Отключаем старый обработчик перед подключением нового
-            try:
-                self.start_button.clicked.disconnect()
-            except TypeError:
-                pass
-            self.start_button.clicked.connect(self.stop_thread)
-            self.plot1.clear()
-            self.plot2.clear()
+
+        self.set_running_ui(True)
+        self.plot1.clear()
+        self.plot2.clear()
 
     def stop_thread(self):
-        utility_functions.stop_threads = True
-        self.stop_event.set()  # Устанавливаем событие остановки
-        if self.thread is not None and self.thread.is_alive():
-            # Проверяем, не пытаемся ли мы присоединиться к текущему потоку
-            if self.thread != threading.current_thread():
-                self.thread.join(timeout=2)  # Ожидаем завершения с таймаутом
-                if self.thread.is_alive():
-                    print("Поток не завершился вовремя, принудительное завершение невозможно (daemon)")
-            else:
-                logging.warning("Попытка присоединиться к текущему потоку. Пропускаем join().")
-        self.start_button.setText("Начать\nизмерение")
-        # Отключаем старый обработчик перед подключением нового
-        try:
-            self.start_button.clicked.disconnect()
-        except TypeError:
-            # Игнорируем ошибку, если нет подключенных обработчиков
-            pass
-        self.start_button.clicked.connect(self.run_thread)
+        self.engine.stop()
+        self.set_running_ui(False)
         # Обновляем доступность кнопки взятия спектра пустой кюветы в окне настроек, если оно открыто
         if hasattr(self, 'modal_popup') and self.settings_window.isVisible():
             self.settings_window.fon_update_settings.setEnabled(True)
+        # Неотрисованные результаты остановленного измерения больше не нужны
+        result_bus.result_bus.clear()
         # Сбрасываем информацию о текущем канале
         self.current_channel_label.setText("Не выбран")
         self.plot1.clear()
@@ -201,482 +101,29 @@ class Ui_MainWindow(object):
         # Принудительно обновляем графики
         self.refresh_plots()
 
-    def measurement_thread(self):
-        """Поток для непрерывного измерения"""
-        self.fspec_error.setText("")
-        logging.info("Запуск потока измерения")
-
-        # В режиме симуляции обновляем информацию о текущем канале
-        if utility_functions.simulation == 1:
-            self.current_channel_label.setText("Симуляция")
-
-        while not utility_functions.stop_threads:
-            # Выполняем измерение, если прошло достаточно времени
-            if self.timer1.hasExpired(utility_functions.plots_interval * 1000):
-                # Выполняем одно измерение
-                if not self.update_trans_plot_single():
-                    break
-                    
-            # Проверяем сигнал остановки
-            if self.stop_event.wait(timeout=1):
-                logging.info("Получен сигнал остановки")
-                break
-
-    def set_fixed_fon(self):
-        """Метод для измерения и сохранения фонового спектра"""
-        logging.info("Начало установки фиксированного фона")
-        self.start_button.setEnabled(False)
-        if utility_functions.first_start:
-            try:
-                # Выполняем start_func и init_func для измерения фонового спектра
-                res, warn = utility_functions.start_func()
-                logging.info(f"Результат start_func: res={res}, warn={warn}")
-
-                if res == 0:
-                    res, warn = utility_functions.init_func()
-                    logging.info(f"Результат init_func: res={res}, warn={warn}")
-
-                    if res == 0:
-                        if os.path.exists("./Spectra/fon.spe"):
-                            if os.path.exists("./Spectra/empty_fon.spe"):
-                                os.remove("./Spectra/empty_fon.spe")
-                                logging.info("Удален старый файл empty_fon.spe")
-
-                            os.rename("./Spectra/fon.spe", "./Spectra/empty_fon.spe")
-                            logging.info("Текущий фоновый спектр сохранен как previous_fon.spe")
-
-                        # Обновляем дату в конфигурации
-                        date = datetime.today().strftime('%d.%m.%y %H:%M:%S')
-                        # Обновляем дату в окне настроек, если оно открыто
-                        if hasattr(self, 'modal_popup') and self.settings_window.isVisible():
-                            self.settings_window.last_updated.setText("Дата обновления фона:\n" + date)
-
-                        with open('config/config.json', 'r', encoding="utf-8") as file:
-                            json_data = json.load(file)
-                        json_data["fon_updated"] = date
-                        with open('config/config.json', 'w', encoding="utf-8") as f:
-                            json.dump(json_data, f, ensure_ascii=False, indent=4)
-                        logging.info("Дата обновления фона сохранена в конфигурации")
-                    else:
-                        logging.error(f"Ошибка инициализации при измерении фона: {res}")
-                        self.error_out(res)
-                        self.fspec_error.setText(f"Ошибка при измерении фона (init_func): {res}")
-                else:
-                    logging.error(f"Ошибка запуска при измерении фона: {res}")
-                    self.error_out(res)
-                    self.fspec_error.setText(f"Ошибка при измерении фона (start_func): {res}")
-
-            except Exception as e:
-                logging.error(f"Ошибка при установке фиксированного фона: {e}")
-                self.fspec_error.setText(f"Ошибка при установке фиксированного фона: {e}")
-            finally:
-                self.start_button.setEnabled(True)
-                logging.info("Установка фиксированного фона завершена")
-        else:
-            try:
-                res, warn = utility_functions.init_func()
-                logging.info(f"Результат init_func: res={res}, warn={warn}")
-
-                if res == 0:
-                    if os.path.exists("./Spectra/fon.spe"):
-                        if os.path.exists("./Spectra/empty_fon.spe"):
-                            os.remove("./Spectra/empty_fon.spe")
-                            logging.info("Удален старый файл empty_fon.spe")
-
-                        os.rename("./Spectra/fon.spe", "./Spectra/empty_fon.spe")
-                        logging.info("Текущий фоновый спектр сохранен как previous_fon.spe")
-
-                    # Обновляем дату в конфигурации
-                    date = datetime.today().strftime('%d.%m.%y %H:%M:%S')
-                    # Обновляем дату в окне настроек, если оно открыто
-                    if hasattr(self, 'modal_popup') and self.settings_window.isVisible():
-                        self.settings_window.last_updated.setText("Дата обновления фона:\n" + date)
-
-                    with open('config/config.json', 'r', encoding="utf-8") as file:
-                        json_data = json.load(file)
-                    json_data["fon_updated"] = date
-                    with open('config/config.json', 'w', encoding="utf-8") as f:
-                        json.dump(json_data, f, ensure_ascii=False, indent=4)
-                    logging.info("Дата обновления фона сохранена в конфигурации")
-                else:
-                    logging.error(f"Ошибка инициализации при измерении фона: {res}")
-                    self.error_out(res)
-                    self.fspec_error.setText(f"Ошибка при измерении фона (init_func): {res}")
-
-            except Exception as e:
-                logging.error(f"Ошибка при установке фиксированного фона: {e}")
-                self.fspec_error.setText(f"Ошибка при установке фиксированного фона: {e}")
-            finally:
-                self.start_button.setEnabled(True)
-                logging.info("Установка фиксированного фона завершена")
-
-    def channel_measurement_thread(self):
-        """Поток для измерения по каналам с переключением через ModBus"""
-        self.fspec_error.setText("")
-        logging.info("\n" + "="*50)
-        logging.info("ЗАПУСК ПОТОКА ИЗМЕРЕНИЯ ПО КАНАЛАМ")
-        logging.info("="*50)
-        
-        # Загружаем настройки каналов
-        channel_config = utility_functions.load_channel_config()
-        
-        # Получаем параметры
-        wait_time = channel_config["params"]["wait_time"]
-        alarm_fix = channel_config["params"]["alarm_fix"]
-        max_attempts = channel_config["params"]["attempts"]
-        background_period = channel_config["params"]["background_period"] * 60  # Переводим в секунды
-        measurements_per_channel = channel_config["params"]["measurements"]
-        plots_interval = utility_functions.plots_interval  # Интервал обновления графиков в секундах
-        
-        logging.info(f"Параметры измерения:")
-        logging.info(f"- Время ожидания переключения (tп): {wait_time} сек")
-        logging.info(f"- Фиксация аварии системы (АСПК): {'Да' if alarm_fix else 'Нет'}")
-        logging.info(f"- Количество попыток переключения (k): {max_attempts}")
-        logging.info(f"- Период измерения фона (tф): {background_period/60} мин")
-        logging.info(f"- Количество измерений на канал (n): {measurements_per_channel}")
-        logging.info(f"- Интервал обновления графиков: {plots_interval} сек")
-        
-        # Время начала для отслеживания периода фонового спектра
-        start_time = time.time()
-        # Время последнего обновления графиков
-        last_update_time = time.time()
-        
-        # Счетчик неудачных попыток переключения
-        failed_attempts = 0
-        
-        # Проверяем соединение с ModBus
-        if not utility_functions.check_modbus_connection():
-            logging.error("Нет соединения с ModBus для измерения по каналам")
-            QtWidgets.QMessageBox.warning(
-                self.parent, 
-                "Предупреждение", 
-                "Нет соединения с ModBus. Переключение каналов невозможно.",
-                QtWidgets.QMessageBox.Ok
-            )
-            self.error_out(-106)  # Код ошибки для отсутствия соединения
-            return
-            
-        # Создаем объект для работы с каналами
-        switcher = utility_functions.ChannelSwitcher()
-        
-        # Проверяем, инициализировано ли устройство
-        status = switcher.read_status()
-        if not status:
-            logging.error("Не удалось получить статус устройства")
-            self.error_out(-106)
-            return
-            
-        is_initialized = status['initialization']
-        logging.info(f"Статус инициализации устройства: {'инициализировано' if is_initialized else 'не инициализировано'}")
-        
-        if not is_initialized:
-            logging.info("\n=== ЗАПУСК ИНИЦИАЛИЗАЦИИ УСТРОЙСТВА ===")
-            
-            # Запрос на инициализацию
-            if not switcher.request_channel_switch(1):
-                logging.error("Не удалось отправить запрос на инициализацию")
-                self.error_out(-104)  # Код ошибки для неудачной инициализации
-                return
-                
-            # Мониторим процесс инициализации
-            if not switcher.monitor_initialization():
-                logging.error("Ошибка инициализации устройства")
-                self.error_out(-105)  # Код ошибки для неудачной инициализации
-                return
-                
-            logging.info("✓ Инициализация устройства успешно завершена")
-        else:
-            logging.info("✓ Устройство уже инициализировано")
-        
-        # Проверяем готовность устройства
-        if not switcher.wait_for_ready_state(timeout=10):
-            logging.error("Устройство не готово к измерениям")
-            self.error_out(-107)  # Код ошибки для неготовности устройства
-            return
-            
-        # Переключаемся на канал 0 (пустая ячейка) в начале для измерения фона
-        if utility_functions.first_start:
-            logging.info("\n=== ПЕРЕКЛЮЧЕНИЕ НА КАНАЛ 0 (ПУСТАЯ ЯЧЕЙКА) ДЛЯ НАЧАЛЬНОГО ИЗМЕРЕНИЯ ФОНА ===")
-            if not switcher.switch_to_channel(0, wait_time):
-                logging.error("Не удалось переключиться на канал 0")
-                self.error_out(-101)  # Используем код ошибки -101 для таймаута переключения
-                return
-                
-            # Измеряем фоновый спектр перед началом цикла по каналам
-            logging.info("Измерение начального фонового спектра")
-            self.set_fixed_fon()
-        else:
-            logging.info("Пропускаем начальное измерение фона (не первый запуск)")
-        
-        # Основной цикл измерения
-        logging.info("\n=== НАЧАЛО ЦИКЛА ИЗМЕРЕНИЙ ПО КАНАЛАМ ===")
-        while not utility_functions.stop_threads:
-            # Обрабатываем события Qt для обновления интерфейса
-            QCoreApplication.processEvents()
-            
-            try:
-                current_time = time.time()
-                
-                # Проверяем, не пора ли измерить фоновый спектр
-                if current_time - start_time >= background_period:
-                    logging.info(f"\n=== ПЕРИОДИЧЕСКОЕ ИЗМЕРЕНИЕ ФОНА (ПРОШЛО {background_period/60:.1f} МИН) ===")
-                    
-                    # Переключаемся на канал 0
-                    logging.info("Переключение на канал 0 для измерения фона")
-                    if not switcher.switch_to_channel(0, wait_time):
-                        logging.error("Не удалось переключиться на канал 0")
-                        if alarm_fix:
-                            failed_attempts += 1
-                            if failed_attempts >= max_attempts:
-                                logging.error(f"Превышено количество попыток переключения ({max_attempts})")
-                                self.error_out(-102)  # Используем код ошибки -102 для превышения попыток
-                                break
-                        continue
-                    else:
-                        logging.info("Измерение фонового спектра")
-                        self.set_fixed_fon()
-                        
-                        # Сбрасываем счетчик времени для фонового спектра
-                        start_time = time.time()
-                
-                # Проверяем, не пора ли обновить графики
-                if current_time - last_update_time >= plots_interval:
-                    logging.info(f"\n=== ОБНОВЛЕНИЕ ГРАФИКОВ (ПРОШЛО {plots_interval} СЕК) ===")
-                    
-                    # Выполняем измерение для обновления графиков
-                    if not self.update_trans_plot_single():
-                        logging.error("Ошибка при обновлении графиков")
-                        break
-                    
-                    # Сбрасываем счетчик времени для обновления графиков
-                    last_update_time = time.time()
-                
-                # Проходим по всем каналам
-                for channel_num in range(1, 13):  # Каналы от 1 до 12
-                    # Проверяем, активен ли канал
-                    if not channel_config.get(f"channel_{channel_num}", {}).get("active", False):
-                        logging.info(f"Канал {channel_num} ({channel_config.get(f'channel_{channel_num}', {}).get('name', f'АТ-{channel_num}')}) неактивен, пропускаем")
-                        continue
-                        
-                    # Получаем имя канала
-                    channel_name = channel_config.get(f"channel_{channel_num}", {}).get("name", f"АТ-{channel_num}")
-                    
-                    # Переключаемся на канал
-                    logging.info(f"\n=== ПЕРЕКЛЮЧЕНИЕ НА КАНАЛ {channel_num} ({channel_name}) ===")
-                    if not switcher.switch_to_channel(channel_num, wait_time):
-                        logging.error(f"Не удалось переключиться на канал {channel_num} ({channel_name})")
-                        if alarm_fix:
-                            failed_attempts += 1
-                            if failed_attempts >= max_attempts:
-                                logging.error(f"Превышено количество попыток переключения ({max_attempts})")
-                                self.error_out(-102)
-                                break
-                            continue
-                        else:
-                            # Если АСПК=нет, продолжаем измерение текущего канала
-                            logging.info("АСПК=нет, продолжаем измерение текущего канала")
-                            # Получаем текущий канал
-                            current_channel = utility_functions.get_active_channel()
-                            if current_channel >= 0:
-                                channel_num = current_channel  # Используем текущий канал
-                                channel_name = channel_config.get(f"channel_{channel_num}", {}).get("name", f"АТ-{channel_num}")
-                                logging.info(f"Используем текущий канал: {channel_num} ({channel_name})")
-                            else:
-                                logging.error("Не удалось определить текущий канал")
-                                continue
-                    
-                    # Выполняем измерения для текущего канала
-                    logging.info(f"Начало измерений для канала {channel_num} ({channel_name})")
-                    measurement = 0
-                    while measurement < measurements_per_channel:
-                        if utility_functions.stop_threads:
-                            break
-                            
-                        # Проверяем, не пора ли обновить графики
-                        current_time = time.time()
-                        if current_time - last_update_time >= plots_interval:
-                            logging.info(f"Измерение {measurement+1}/{measurements_per_channel} для канала {channel_num} ({channel_name})")
-                            
-                            if not self.update_trans_plot_single():
-                                logging.error("Ошибка при обновлении графиков")
-                                break
-                            
-                            # Сбрасываем счетчик времени для обновления графиков
-                            last_update_time = time.time()
-                            
-                            # Переходим к следующему измерению только после обновления графика
-                            measurement += 1
-                        else:
-                            # Если еще не пора обновлять графики, ждем небольшое время
-                            time.sleep(0.1)
-                    
-                    # Сбрасываем счетчик неудачных попыток после успешного измерения канала
-                    failed_attempts = 0
-                    
-                    if utility_functions.stop_threads:
-                        break
-                
-                # Проверяем сигнал остановки
-                if self.stop_event.wait(timeout=1):
-                    logging.info("Получен сигнал остановки")
-                    break
-                    
-            except Exception as e:
-                logging.error(f"Ошибка в потоке измерения каналов: {e}", exc_info=True)
-                self.error_out(-103)  # Используем код ошибки -103 для общей ошибки
-                break
-        
-        logging.info("\n=== ЗАВЕРШЕНИЕ ПОТОКА ИЗМЕРЕНИЯ ПО КАНАЛАМ ===")
-
-    def update_trans_plot_single(self):
-        """Выполняет одно измерение"""
-        logging.info("=== НАЧАЛО update_trans_plot_single() ===")
-        
-        # Обрабатываем события Qt для обновления интерфейса
-        QCoreApplication.processEvents()
-        
-        # Обновляем значения в окне настроек, если оно открыто
-        if hasattr(self, 'modal_popup') and self.settings_window.isVisible():
-            self.settings_window.res_value.setText(str(fetch_data.res))
-            self.settings_window.scans_value.setText(str(fetch_data.scans))
-            self.settings_window.cuv_value.setText(str(fetch_data.cuv_length))
-            
-        # Получаем текущий активный канал и его имя
-        current_channel = utility_functions.get_active_channel()
-        if current_channel >= 0:
-            channel_name = utility_functions.get_channel_name(current_channel)
-            # Обновляем label с информацией о текущем канале
-            self.current_channel_label.setText(f"{channel_name}")
-            logging.info(f"Текущий канал: {current_channel} ({channel_name})")
-        else:
-            self.current_channel_label.setText("Не выбран")
-            logging.info("Текущий канал не определен")
-
+    def set_running_ui(self, running):
+        """Кнопка запуска/остановки по состоянию цикла измерений"""
+        utility_functions.stop_threads = not running
+        self.start_button.setText("Остановить\nизмерение" if running else "Начать\nизмерение")
+        # Отключаем старый обработчик перед подключением нового
         try:
-            if utility_functions.first_start:
-                logging.info("Первый запуск - настройка графиков")
-                self.plot1.enableAutoRange(axis=pg.ViewBox.YAxis)
-                self.plot2.enableAutoRange(axis=pg.ViewBox.YAxis)
-                utility_functions.zoom = False
-                utility_functions.first_start = False
-                self.timer1.start()
-                logging.info("Первый запуск завершен успешно")
-
-            # Загружаем параметры из ini-файлов
-            logging.info("Загрузка параметров...")
-            utility_functions.loadParam()
-            logging.info("Параметры успешно загружены")
-
-            # Чтение фонового спектра и обновление графика 1
-            res, warn = utility_functions.init_func()
-            logging.info(f"Результат init_func: res={res}, warn={warn}")
-
-            if res != 0:
-                self.error_out(res)
-
-            logging.info("Чтение фонового спектра...")
-            x, y, y2 = utility_functions.read_fon_spe()
-            logging.info("Фоновый спектр прочитан")
-            self.plot1.update(x, y, y2)
-            logging.info("График 1 обновлен")
-
-            logging.info("Получение спектра поглощения по формуле")
-            x_values, y_values = utility_functions.getValueSpecFormula()
-
-            # # Получаем спектр поглощения
-            # logging.info("Получение спектра поглощения...")
-            # res, x_values, y_values, warn_value = utility_functions.getValueSpec()
-            # # logging.info(f"Получен спектр: res={res}, точек={len(x_values)}, предупреждение={warn_value}")
-            #
-            # logging.info("Получение спектра поглощения из файла")
-            # file_y = utility_functions.getValueSpecFile()
-
-            if os.path.exists("./Spectra/fon.spe"):
-                os.remove("./Spectra/fon.spe")
-                if os.path.exists("./Spectra/empty_fon.spe"):
-                    os.rename("./Spectra/empty_fon.spe", "./Spectra/fon.spe")
-
-            if os.path.exists("./Spectra/fon.spe"):
-                os.rename("./Spectra/fon.spe", "./Spectra/empty_fon.spe")
-            
-            # Формируем массив концентраций (пока пустой)
-            conc = []
-            
-            if len(x_values) > 0 and len(y_values) > 0:
-                # Получаем значение температуры из exequant.exe
-                try:
-                    # Проверяем, указан ли путь к exequant.exe
-                    if not utility_functions.exequant_path:
-                        logging.warning("Путь к exequant.exe не указан, пропускаем получение цетанового числа")
-                    else:
-                        logging.info("Получение цетанового числа из exequant...")
-                        # Конвертируем спектр в строку для exequant
-                        convert_res = utility_functions.spectrum_to_dat(x_values, y_values)
-
-                        if convert_res == 0:
-                            # Запускаем exequant и получаем значение T
-                            t_value = utility_functions.run_exequant()
-
-                            if t_value is not None:
-                                # Получаем смещение для параметра из конфига
-                                param_offset = 0
-                                try:
-                                    with open('config/config.json', 'r', encoding="utf-8") as file:
-                                        json_data = json.load(file)
-                                    param_offset = json_data.get("param_offset", 0)
-                                except Exception as e:
-                                    logging.error(f"Ошибка при чтении смещения параметра из конфига: {e}")
-
-                                # Применяем смещение к значению параметра
-                                adjusted_t_value = t_value + param_offset
-                                if 0 < adjusted_t_value < 100:
-                                    # Добавляем скорректированное значение T в первый параметр
-                                    conc = [adjusted_t_value]
-                                    logging.info(f"Получено цетановое число из exequant: {t_value}, с учетом смещения: {adjusted_t_value}")
-                                else:
-                                    logging.info(f"Цетановое число из exequant с учетом смещения меньше нуля или больше 100: {adjusted_t_value}")
-                except Exception as e:
-                    logging.error(f"Ошибка при получении цетанового числа из exequant: {e}")
-                    # Продолжаем измерение без обновления параметра T
-                
-                logging.info("Спектр получен, сохранение в архив...")
-                self.save_to_archive(conc, y_values)
-                logging.info("Обновление графика 2...")
-                self.plot2.update(x_values, y_values)
-                logging.info("График 2 обновлен")
-
-                # Обновляем график параметра с новыми значениями
-                logging.info("Обновление графиков параметров...")
-                self.param_plots(conc, False)
-                logging.info("Графики параметров обновлены")
-                
-                # Перезапускаем таймер
-                self.timer1.restart()
-            else:
-                self.error_out(-103)
-                return False
-                
-        except Exception as e:
-            logging.error(f"Неожиданная ошибка в update_trans_plot_single: {str(e)}", exc_info=True)
-            self.error_out(-103)  # Используем код ошибки -103 для общей ошибки
-            return False
-            
-        logging.info("=== ЗАВЕРШЕНИЕ update_trans_plot_single() ===")
-        return True
+            self.start_button.clicked.disconnect()
+        except TypeError:
+            # Игнорируем ошибку, если нет подключенных обработчиков
+            pass
+        self.start_button.clicked.connect(self.stop_thread if running else self.run_thread)
 
     def generate_warnings(self, warning):
         self.warnings_box.clear()
-        with open('config/config.json', 'r', encoding="utf-8") as file:
-            json_data = json.load(file)
+        warning_texts = config_store.config.get("warnings", {})
         warnings = str(bin(warning))
         warnings = warnings[::-1]
         for i in range(len(warnings)):
             if warnings[i] == '1':
-                self.warnings_box.addItem(str(json_data["warnings"].get(str(i))))
+                self.warnings_box.addItem(str(warning_texts.get(str(i))))
 
     def run_fix_fon_thread(self):
-        self.thread = threading.Thread(target=self.set_fixed_fon, daemon=True)
-        self.thread.start()
+        self.engine.measure_background()
 
     def error_out(self, res):
         # Защита от рекурсивного вызова
@@ -686,20 +133,19 @@ class Ui_MainWindow(object):
             
         self._in_error_out = True
         try:
-            with open('config/config.json', 'r', encoding="utf-8") as file:
-                json_data = json.load(file)
+            error_texts = config_store.config.get("errors", {})
             if res > 0:
                 res = -500
             
             # Проверяем, вызывается ли метод из потока измерения
             if threading.current_thread() == threading.main_thread():
                 # Если вызывается из основного потока, обновляем UI напрямую
-                self.fspec_error.setText("Ошибка! " + str(json_data["errors"].get(str(res))))
+                self.fspec_error.setText("Ошибка! " + str(error_texts.get(str(res))))
                 # Останавливаем поток измерения
                 self.stop_thread()
             else:
                 # Если вызывается из потока измерения, обновляем UI через QTimer
-                error_text = "Ошибка! " + str(json_data["errors"].get(str(res)))
+                error_text = "Ошибка! " + str(error_texts.get(str(res)))
                 
                 # Устанавливаем флаги остановки
                 utility_functions.stop_threads = True
@@ -731,17 +177,20 @@ class Ui_MainWindow(object):
             pass
 
     def update_param_names(self):
-        self.params_labels[0].setText(utility_functions.parameter_names[0])
+        for i, label in enumerate(self.params_labels):
+            label.setText(utility_functions.parameter_names[i])
 
     def param_plots(self, conc, build):
-        conc = [number for number in conc if utility_functions.int_max > number > -utility_functions.int_max]
+        # Индекс значения - номер слота параметра; NaN и выбросы пропускаются без сдвига слотов
+        conc = [number if utility_functions.int_max > number > -utility_functions.int_max else None
+                for number in conc]
         if build:
             layout = QGridLayout(self.scrollAreaWidgetContents)
-            self.params_labels = [None] * 1  # Увеличиваем до 16 для всех возможных параметров
             
             # Убедимся, что у нас есть хотя бы один параметр
             if len(conc) == 0:
                 conc = [0.0]  # Добавляем пустой параметр, если нет данных
+            self.params_labels = [None] * len(conc)
             
             for i in range(len(conc)):
                 self.params_labels[i] = QtWidgets.QLabel()
@@ -752,7 +201,7 @@ class Ui_MainWindow(object):
                 font = QtGui.QFont("Arial", 16)
                 param_value.setFont(font)
                 param_value.setAlignment(QtCore.Qt.AlignCenter)
-                param_value.setText("{:.2f}".format(conc[i]))
+                param_value.setText("{:.2f}".format(conc[i] or 0.0))
 
                 param_layout = QGridLayout()
 
@@ -781,6 +230,8 @@ class Ui_MainWindow(object):
             
             # Обновляем только те параметры, которые есть в conc
             for i in range(min(len(conc), len(self.param_values))):
+                if conc[i] is None:
+                    continue
                 self.param_values[i].setText("{:.2f}".format(conc[i]))
                 utility_functions.parameter[i].update(conc[i], utility_functions.params_interval)
                 utility_functions.parameter[i].show()
@@ -790,6 +241,8 @@ class Ui_MainWindow(object):
         self.settings_window.show()
 
     def open_modbus_settings(self):
+        # Модуль ModBus (pyserial, modbus_tk) загружается только при открытии окна
+        from .modbus_window import ModbusWindow
         self.modbus_window = ModbusWindow(self)
         self.modbus_window.show()
 
@@ -800,13 +253,13 @@ class Ui_MainWindow(object):
             self.fspec_error.setText("Неверный путь")
 
     def setupUi(self, MainWindow):
-        self.thread = None
-        self.timer1 = QtCore.QElapsedTimer()
         MainWindow.setObjectName("MainWindow")
         self.parent = MainWindow
         
         # Подключаемся к сигналу ошибки из utility_functions
         self.connect_error_signal()
+        # Результаты измерений из рабочих потоков отрисовываются в главном потоке
+        self.connect_result_bus()
         
         # Устанавливаем шрифт Arial для главного окна
         font = QtGui.QFont("Arial")
@@ -933,13 +386,9 @@ class Ui_MainWindow(object):
         
         # Проверяем и обновляем config.json для добавления новых кодов ошибок
         try:
-            config_path = 'config/config.json'
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding="utf-8") as file:
-                    json_data = json.load(file)
-                
+            if os.path.exists(config_store.CONFIG_PATH):
                 # Добавляем новые коды ошибок для переключения каналов, если их нет
-                errors = json_data.get("errors", {})
+                errors = config_store.config.get("errors", {})
                 new_errors = {
                     "-100": "Ошибка отправки запроса на переключение канала",
                     "-101": "Таймаут ожидания переключения канала",
@@ -948,7 +397,8 @@ class Ui_MainWindow(object):
                     "-104": "Ошибка запроса на инициализацию устройства",
                     "-105": "Ошибка процесса инициализации устройства",
                     "-106": "Нет соединения с ModBus",
-                    "-107": "Устройство не готово к измерениям"
+                    "-107": "Устройство не готово к измерениям",
+                    "-108": "Нет связи со службой измерений"
                 }
                 
                 updated = False
@@ -958,16 +408,19 @@ class Ui_MainWindow(object):
                         updated = True
                 
                 if updated:
-                    json_data["errors"] = errors
-                    with open(config_path, 'w', encoding="utf-8") as f:
-                        json.dump(json_data, f, indent=4)
+                    config_store.config.set("errors", errors)
                     logging.info("Добавлены новые коды ошибок для переключения каналов в config.json")
         except Exception as e:
             logging.error(f"Ошибка при обновлении кодов ошибок в config.json: {e}")
         
-        SettingsWindow(self).load()
-
-        self.param_plots([0], True)
+        # Загружаем только конфигурацию, не создавая окно настроек
+        json_data = load_config()
+        self.plot2.setXRange(int(json_data["limits"]["min"]), int(json_data["limits"]["max"]))
+        self.plot1.setXRange(int(json_data["limits"]["min"]), int(json_data["limits"]["max"]))
+        apply_theme(utility_functions.theme)
+
+        # По графику тренда на каждый слот параметров из param_mapping
+        self.param_plots([0.0] * quantification.parameter_count(), True)
         MainWindow.setCentralWidget(self.centralwidget)
 
         self.retranslateUi(MainWindow)
@@ -988,6 +441,43 @@ class Ui_MainWindow(object):
         # Используем QTimer для безопасного обновления UI из другого потока
         QtCore.QTimer.singleShot(0, lambda: self.fspec_error.setText(error_text))
 
+    def connect_result_bus(self):
+        """Подключает шину результатов; обработчик всегда выполняется в главном потоке"""
+        result_bus.result_bus.updated.connect(self.render_results, QtCore.Qt.QueuedConnection)
+
+    def render_results(self):
+        """Отрисовывает накопленные результаты: по одному, последнему, обновлению на представление"""
+        latest, params = result_bus.result_bus.take()
+
+        if latest.get(result_bus.VIEW_AUTORANGE):
+            self.plot1.enableAutoRange(axis=pg.ViewBox.YAxis)
+            self.plot2.enableAutoRange(axis=pg.ViewBox.YAxis)
+        if result_bus.VIEW_CHANNEL in latest:
+            self.current_channel_label.setText(latest[result_bus.VIEW_CHANNEL])
+        if result_bus.VIEW_SETTINGS in latest and hasattr(self, 'modal_popup') and self.settings_window.isVisible():
+            res, scans, cuv_length = latest[result_bus.VIEW_SETTINGS]
+            self.settings_window.res_value.setText(str(res))
+            self.settings_window.scans_value.setText(str(scans))
+            self.settings_window.cuv_value.setText(str(cuv_length))
+        # Перерисовываются только графики, для которых есть новые данные
+        if result_bus.VIEW_INTENSITY in latest:
+            self.plot1.update(*latest[result_bus.VIEW_INTENSITY])
+        if result_bus.VIEW_ABSORBANCE in latest:
+            self.plot2.update(*latest[result_bus.VIEW_ABSORBANCE])
+        for conc in params:
+            self.param_plots(conc, False)
+        if result_bus.VIEW_BACKGROUND in latest:
+            running, date = latest[result_bus.VIEW_BACKGROUND]
+            self.start_button.setEnabled(not running)
+            # Обновляем дату в окне настроек, если оно открыто
+            if date and hasattr(self, 'modal_popup') and self.settings_window.isVisible():
+                self.settings_window.last_updated.setText("Дата обновления фона:\n" + date)
+        if result_bus.VIEW_STATE in latest and latest[result_bus.VIEW_STATE] != (not utility_functions.stop_threads):
+            # Цикл остановлен или запущен не из этого окна (служба измерений)
+            self.set_running_ui(latest[result_bus.VIEW_STATE])
+        if result_bus.VIEW_ERROR in latest:
+            self.error_out(latest[result_bus.VIEW_ERROR])
+
     def refresh_plots(self):
         """Принудительно обновляет графики"""
         if hasattr(self, 'transmission') and self.transmission.scene():
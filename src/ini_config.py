@@ -0,0 +1,94 @@
+import configparser
+import logging
+import os
+import threading
+
+# ini-файлы, которые читает GAS.dll в LoadParam
+GAS_INI_PATH = r'./GAS.ini'
+DEVICE_INI_PATH = r'./Device.ini'
+FSM24_INI_PATH = r'./FSM24.ini'
+FSM_TYPES_INI_PATH = r'./FSMTypes.ini'
+INSTRUMENT_INI_FILES = (GAS_INI_PATH, DEVICE_INI_PATH, FSM24_INI_PATH, FSM_TYPES_INI_PATH)
+
+
+def file_signature(path):
+    """(mtime_ns, размер) файла или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class IniFile:
+    """Разобранный ini-файл и подпись файла, с которой он был прочитан"""
+
+    def __init__(self, path):
+        self.path = path
+        self.signature = None
+        self.parser = None
+
+    def load(self):
+        parser = configparser.ConfigParser(strict=False, interpolation=None)
+        # Ключи GAS.dll чувствительны к регистру ("Cuvette length")
+        parser.optionxform = str
+        signature = file_signature(self.path)
+        if signature is not None:
+            # Кодировка файлов прибора - cp1251; нечитаемые символы не мешают разбору
+            with open(self.path, 'r', encoding='cp1251', errors='replace') as f:
+                parser.read_file(f)
+        self.parser = parser
+        self.signature = signature
+
+    def get(self, section, key, cast=str, default=None):
+        if self.parser is None or not self.parser.has_option(section, key):
+            return default
+        value = self.parser.get(section, key).strip()
+        try:
+            return cast(value)
+        except ValueError:
+            logging.warning(f"{self.path}: некорректное значение [{section}] {key}={value!r}")
+            return default
+
+
+class IniModel:
+    """
+    ini-файлы прибора в памяти. Файлы разбираются один раз и перечитываются,
+    только если изменились их mtime или размер; version растет при каждом изменении.
+    """
+
+    def __init__(self, paths=INSTRUMENT_INI_FILES):
+        self._files = {path: IniFile(path) for path in paths}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def changed_files(self):
+        """Файлы, изменившиеся с последнего чтения (без разбора)"""
+        return [path for path, ini in self._files.items()
+                if ini.parser is None or file_signature(path) != ini.signature]
+
+    def refresh(self):
+        """Перечитывает изменившиеся файлы; возвращает список их путей"""
+        with self._lock:
+            changed = self.changed_files()
+            for path in changed:
+                self._files[path].load()
+                logging.info(f"Прочитан файл настроек прибора: {path}")
+            if changed:
+                self.version += 1
+            return changed
+
+    def file(self, path):
+        with self._lock:
+            ini = self._files[path]
+            if ini.parser is None:
+                ini.load()
+                self.version += 1
+            return ini
+
+    def get(self, path, section, key, cast=str, default=None):
+        return self.file(path).get(section, key, cast, default)
+
+
+# Общая модель ini-файлов прибора
+ini_model = IniModel()
@@ -0,0 +1,248 @@
+import ctypes
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from . import config_store
+from . import spe_reader
+
+# Путь к библиотеке спектрометра
+DLL_PATH = "./GAS.dll"
+
+# Прототипы используемых функций GAS.dll: (имя, argtypes, restype).
+# Новую функцию добавлять только с документированным прототипом: неверная сигнатура
+# при вызове через WinDLL портит стек или память, а не дает понятную ошибку
+GAS_START_PROTOTYPE = ("Start", [ctypes.POINTER(ctypes.c_int)], ctypes.c_int)
+GAS_INIT_PROTOTYPE = ("Init", [ctypes.POINTER(ctypes.c_int)], ctypes.c_int)
+GAS_LOAD_PARAM_PROTOTYPE = ("LoadParam", [], None)
+
+# Тестовые файлы, по которым синтезируются спектры в режиме симуляции
+SIM_INTERFEROGRAM_FILE = "./Tests/INT1.SPE"
+SIM_REFERENCE_FILE = "./Tests/ref.spe"
+
+# Спектральный диапазон прибора (совпадает с заголовком fon.spe)
+SIM_FIRST_X = 3699.231201
+SIM_LAST_X = 12499.777111
+SIM_NPOINTS = 4564
+
+# Полосы поглощения синтетического образца: (центр, см⁻¹; полуширина, см⁻¹; оптическая плотность)
+SIM_ABSORPTION_BANDS = [
+    (4330.0, 60.0, 0.9),
+    (5800.0, 120.0, 0.45),
+    (7180.0, 150.0, 0.12),
+    (8300.0, 180.0, 0.08),
+]
+
+# Параметры симулятора по умолчанию; переопределяются секцией "simulation_driver" в config.json
+SIM_DRIVER_DEFAULTS = {
+    "latency": 1.0,   # Время измерения спектра, с
+    "noise": 0.0005,  # Шум относительно максимума огибающей
+    "drift": 0.02,    # Амплитуда медленного дрейфа
+}
+
+
+class InstrumentDriver:
+    """Базовый интерфейс драйвера спектрометра"""
+
+    name = "base"
+
+    def start(self):
+        """Запуск и самотестирование прибора, возвращает (res, warn)"""
+        raise NotImplementedError
+
+    def init(self, background=False):
+        """Измерение спектра, возвращает (res, warn)"""
+        raise NotImplementedError
+
+    def load_param(self):
+        """Перечитывание параметров из ini-файлов"""
+        raise NotImplementedError
+
+    def get_spectrum(self):
+        """Последний измеренный спектр (header, y) или None, если он доступен только в файле"""
+        return None
+
+    def set_channel(self, channel):
+        """Уведомление о смене канала мультиплексора"""
+
+
+class GasDllDriver(InstrumentDriver):
+    """
+    Драйвер GAS.dll; прототипы функций привязываются один раз при загрузке.
+    Спектр DLL отдает только через fon.spe (get_spectrum базового класса возвращает None).
+    """
+
+    name = "GAS.dll"
+
+    def __init__(self, dll_path=DLL_PATH):
+        self.dll_path = dll_path
+        self.dll = ctypes.WinDLL(dll_path)
+        self._start = self._bind(*GAS_START_PROTOTYPE)
+        self._init = self._bind(*GAS_INIT_PROTOTYPE)
+        self._load_param = self._bind(*GAS_LOAD_PARAM_PROTOTYPE)
+        self._lock = threading.Lock()
+        logging.info(f"GAS.dll загружена: {os.path.abspath(dll_path)}")
+
+    def _bind(self, name, argtypes, restype):
+        function = getattr(self.dll, name)
+        function.argtypes = argtypes
+        function.restype = restype
+        return function
+
+    def _call_with_warning(self, function):
+        warning = ctypes.c_int(0)
+        with self._lock:
+            result = function(ctypes.byref(warning))
+        return result, warning.value
+
+    def start(self):
+        return self._call_with_warning(self._start)
+
+    def init(self, background=False):
+        # DLL измеряет то, что находится в кювете; флаг фона используется только симуляцией
+        return self._call_with_warning(self._init)
+
+    def load_param(self):
+        with self._lock:
+            self._load_param()
+
+
+class SimulatedDriver(InstrumentDriver):
+    """
+    Программная модель спектрометра без GAS.dll.
+
+    Огибающая спектра источника получается из интерферограммы Tests/INT1.SPE,
+    уровень сигнала - из амплитуды референтного сигнала Tests/ref.spe. К спектру
+    добавляются медленный дрейф, шум и полосы поглощения образца (кроме пустой ячейки).
+    """
+
+    name = "simulation"
+
+    def __init__(self, latency=1.0, noise=0.0005, drift=0.02, drift_period=600.0, scans=1, seed=None):
+        self.latency = latency
+        self.noise = noise
+        self.drift = drift
+        # Параметры, с которыми создан драйвер (для сравнения с config.json)
+        self.settings = {"latency": latency, "noise": noise, "drift": drift}
+        self.drift_period = drift_period
+        self.scans = max(1, scans)
+        self.channel = 1
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._last_spectrum = None
+
+        self.x = np.linspace(SIM_FIRST_X, SIM_LAST_X, SIM_NPOINTS, endpoint=False)
+        self.envelope = self._build_envelope()
+        self.absorbance_bands = self._build_bands()
+        logging.info(f"Симулятор спектрометра: задержка {latency} с, шум {noise}, дрейф {drift}")
+
+    def _build_envelope(self):
+        try:
+            _, interferogram = spe_reader.read_spe(SIM_INTERFEROGRAM_FILE)
+            interferogram = interferogram.astype(np.float64)
+            interferogram -= interferogram.mean()
+            magnitude = np.abs(np.fft.rfft(interferogram * np.hanning(len(interferogram))))
+            # Сглаживаем модуль спектра, чтобы получить огибающую источника без шумовых выбросов
+            window = max(1, len(magnitude) // 50)
+            magnitude = np.convolve(magnitude, np.ones(window) / window, mode='same')
+            # Берем полосу, где сосредоточена энергия, и растягиваем ее на диапазон прибора
+            significant = np.nonzero(magnitude > magnitude.max() * 0.1)[0]
+            band = magnitude[significant[0]:significant[-1] + 1]
+            envelope = np.interp(np.linspace(0, len(band) - 1, SIM_NPOINTS), np.arange(len(band)), band)
+            envelope = np.maximum(envelope / envelope.max(), 0.05)
+        except (OSError, ValueError, IndexError) as e:
+            logging.warning(f"Не удалось построить огибающую по {SIM_INTERFEROGRAM_FILE}: {e}")
+            center = (SIM_FIRST_X + SIM_LAST_X) / 2
+            envelope = np.exp(-((self.x - center) / 2500.0) ** 2)
+
+        try:
+            _, reference = spe_reader.read_spe(SIM_REFERENCE_FILE)
+            level = float(np.sqrt(2 * np.mean(reference.astype(np.float64) ** 2)))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Не удалось прочитать {SIM_REFERENCE_FILE}: {e}")
+            level = 0.5
+        # Нормируем так, чтобы максимум был близок к реальным спектрам фона (~4 отн. ед.)
+        return envelope * 8.0 * level
+
+    def _build_bands(self):
+        bands = np.zeros_like(self.x)
+        for center, width, depth in SIM_ABSORPTION_BANDS:
+            bands += depth * np.exp(-((self.x - center) / width) ** 2)
+        return bands
+
+    def set_channel(self, channel):
+        self.channel = channel
+
+    def start(self):
+        self._started_at = time.monotonic()
+        return 0, 0
+
+    def load_param(self):
+        pass
+
+    def init(self, background=False):
+        time.sleep(self.latency)
+        elapsed = time.monotonic() - self._started_at
+        drift = 1.0 + self.drift * np.sin(2 * np.pi * elapsed / self.drift_period)
+        tilt = 1.0 + 0.5 * self.drift * np.sin(2 * np.pi * elapsed / (3 * self.drift_period)) \
+            * (self.x - SIM_FIRST_X) / (SIM_LAST_X - SIM_FIRST_X)
+
+        spectrum = self.envelope * drift * tilt
+        if not background and self.channel != 0:
+            # Каждый канал - немного другой образец
+            scale = 1.0 + 0.05 * (self.channel - 1)
+            spectrum = spectrum * 10.0 ** (-scale * self.absorbance_bands)
+
+        with self._lock:
+            noise = self._rng.normal(0.0, self.noise / np.sqrt(self.scans), len(spectrum))
+        spectrum = np.clip(spectrum + noise * self.envelope.max(), 1e-6, None).astype(np.float32)
+
+        header = spe_reader.SpeHeader(first_x=SIM_FIRST_X, last_x=SIM_LAST_X, npoints=SIM_NPOINTS,
+                                      nscans=self.scans)
+        with self._lock:
+            self._last_spectrum = (header, spectrum)
+        return 0, 0
+
+    def get_spectrum(self):
+        with self._lock:
+            return self._last_spectrum
+
+
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def simulation_settings():
+    """Параметры симулятора: SIM_DRIVER_DEFAULTS с учетом секции "simulation_driver" в config.json"""
+    settings = dict(SIM_DRIVER_DEFAULTS)
+    configured = config_store.config.get("simulation_driver") or {}
+    for key in SIM_DRIVER_DEFAULTS:
+        if key not in configured:
+            continue
+        try:
+            settings[key] = max(0.0, float(configured[key]))
+        except (TypeError, ValueError):
+            logging.error(f"Некорректный параметр симулятора {key} в config.json: {configured[key]!r}")
+    return settings
+
+
+def get_driver(simulation=0):
+    """
+    Возвращает драйвер, соответствующий режиму работы; создается при первом обращении.
+    Симулятор пересоздается, если в config.json изменились его параметры.
+    """
+    global _driver
+    with _driver_lock:
+        if simulation == 1:
+            settings = simulation_settings()
+            if not isinstance(_driver, SimulatedDriver) or _driver.settings != settings:
+                channel = _driver.channel if isinstance(_driver, SimulatedDriver) else 1
+                _driver = SimulatedDriver(**settings)
+                _driver.channel = channel
+        elif not isinstance(_driver, GasDllDriver):
+            _driver = GasDllDriver()
+        return _driver
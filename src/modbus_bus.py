@@ -0,0 +1,176 @@
+import itertools
+import logging
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Приоритеты транзакций: меньше - раньше
+PRIORITY_CONTROL = 0  # запись команд (переключение канала, инициализация)
+PRIORITY_STATUS = 1   # опрос статуса из потока измерений
+PRIORITY_UI = 2       # обновление интерфейса
+
+PRIORITY_NAMES = {
+    PRIORITY_CONTROL: "control",
+    PRIORITY_STATUS: "status",
+    PRIORITY_UI: "ui",
+}
+
+# Окно для расчета пропускной способности, сек
+THROUGHPUT_WINDOW = 60.0
+# Сколько последних задержек хранить для статистики
+LATENCY_SAMPLES = 500
+
+
+def is_timeout_error(error):
+    """Таймаут ответа: modbus_tk RTU сообщает его как ответ нулевой длины"""
+    if isinstance(error, (socket.timeout, TimeoutError)):
+        return True
+    return "Response length is invalid 0" in str(error)
+
+
+def is_crc_error(error):
+    return "CRC" in str(error)
+
+
+class _Transaction:
+    __slots__ = ("slave", "function_code", "starting_address", "quantity_of_x", "output_value", "priority",
+                 "future", "queued_at")
+
+    def __init__(self, slave, function_code, starting_address, quantity_of_x, output_value, priority):
+        self.slave = slave
+        self.function_code = function_code
+        self.starting_address = starting_address
+        self.quantity_of_x = quantity_of_x
+        self.output_value = output_value
+        self.priority = priority
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class BusManager:
+    """
+    Владелец шины ModBus: все транзакции выполняются одним потоком по очереди
+    с приоритетами (команды → опрос статуса → обновление интерфейса).
+    Вызывающие получают Future; статистика обмена доступна через stats().
+    """
+
+    def __init__(self, get_master, on_result=None):
+        self._get_master = get_master
+        # Наблюдатель on_result(задержка, ошибка) - например, контроль качества связи
+        self._on_result = on_result
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.transactions = 0
+            self.errors = 0
+            self.timeouts = 0
+            self.crc_errors = 0
+            self.by_priority = {priority: 0 for priority in PRIORITY_NAMES}
+            self._completed_at = deque()
+            self._bus_latency = deque(maxlen=LATENCY_SAMPLES)
+            self._queue_wait = deque(maxlen=LATENCY_SAMPLES)
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="modbus-bus", daemon=True)
+                self._thread.start()
+
+    def submit(self, slave, function_code, starting_address, quantity_of_x=0, output_value=0,
+               priority=PRIORITY_STATUS):
+        """Ставит транзакцию в очередь; возвращает Future с ответом master.execute"""
+        transaction = _Transaction(slave, function_code, starting_address, quantity_of_x, output_value, priority)
+        self._ensure_thread()
+        self._queue.put((priority, next(self._sequence), transaction))
+        return transaction.future
+
+    def execute(self, slave, function_code, starting_address, quantity_of_x=0, output_value=0,
+                priority=PRIORITY_STATUS):
+        """Синхронный вариант submit: ждет выполнения и пробрасывает исключение"""
+        return self.submit(slave, function_code, starting_address, quantity_of_x, output_value,
+                           priority).result()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            _, _, transaction = self._queue.get()
+            if not transaction.future.set_running_or_notify_cancel():
+                continue
+
+            started_at = time.monotonic()
+            try:
+                master = self._get_master()
+                if master is None:
+                    raise ConnectionError("Нет соединения с ModBus")
+                result = master.execute(transaction.slave, transaction.function_code,
+                                        transaction.starting_address, quantity_of_x=transaction.quantity_of_x,
+                                        output_value=transaction.output_value)
+            except Exception as e:
+                self._record(transaction, started_at, e)
+                transaction.future.set_exception(e)
+            else:
+                self._record(transaction, started_at, None)
+                transaction.future.set_result(result)
+
+    def _record(self, transaction, started_at, error):
+        finished_at = time.monotonic()
+        with self._stats_lock:
+            self.transactions += 1
+            self.by_priority[transaction.priority] = self.by_priority.get(transaction.priority, 0) + 1
+            self._queue_wait.append(started_at - transaction.queued_at)
+            self._bus_latency.append(finished_at - started_at)
+            self._completed_at.append(finished_at)
+            while self._completed_at and finished_at - self._completed_at[0] > THROUGHPUT_WINDOW:
+                self._completed_at.popleft()
+            if error is not None:
+                self.errors += 1
+                if is_timeout_error(error):
+                    self.timeouts += 1
+                elif is_crc_error(error):
+                    self.crc_errors += 1
+        if self._on_result is not None:
+            try:
+                self._on_result(finished_at - started_at, error)
+            except Exception as e:
+                logging.error(f"Ошибка обработчика результата транзакции ModBus: {e}")
+
+    def stats(self):
+        """Сводка обмена: пропускная способность, доля таймаутов, задержки"""
+        with self._stats_lock:
+            latency = sorted(self._bus_latency)
+            queue_wait = sorted(self._queue_wait)
+            now = time.monotonic()
+            recent = sum(1 for finished_at in self._completed_at if now - finished_at <= THROUGHPUT_WINDOW)
+            return {
+                "transactions": self.transactions,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "crc_errors": self.crc_errors,
+                "timeout_rate": self.timeouts / self.transactions if self.transactions else 0.0,
+                "throughput": recent / THROUGHPUT_WINDOW,
+                "queue_depth": self._queue.qsize(),
+                "by_priority": {PRIORITY_NAMES.get(p, p): count for p, count in self.by_priority.items()},
+                "latency_mean": sum(latency) / len(latency) if latency else 0.0,
+                "latency_max": latency[-1] if latency else 0.0,
+                "queue_wait_max": queue_wait[-1] if queue_wait else 0.0,
+            }
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(f"Шина ModBus: транзакций {stats['transactions']}, {stats['throughput']:.2f}/с, "
+                     f"ошибок {stats['errors']}, таймаутов {stats['timeouts']} "
+                     f"({stats['timeout_rate']:.1%}), CRC {stats['crc_errors']}, "
+                     f"задержка ср. {stats['latency_mean'] * 1000:.0f} мс, макс. {stats['latency_max'] * 1000:.0f} мс, "
+                     f"очередь {stats['queue_depth']}")
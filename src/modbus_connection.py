@@ -0,0 +1,224 @@
+import logging
+import threading
+from collections import deque
+
+import serial
+from modbus_tk import modbus_rtu
+from modbus_tk import modbus_tcp
+from modbus_tk.exceptions import ModbusError
+
+from . import modbus_bus
+
+# Порт вида tcp://host:port - подключение к симулятору мультиплексора (python -m src.modbus_simulator)
+TCP_PORT_PREFIX = "tcp://"
+
+# Сколько ошибок связи подряд считаются обрывом
+FAILURE_THRESHOLD = 3
+# Паузы между попытками переподключения, сек
+RECONNECT_INITIAL_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+RECONNECT_FACTOR = 2.0
+# Сколько последних задержек хранить для перцентилей
+LATENCY_SAMPLES = 1000
+
+
+def create_master(PORT, baudrate):
+    """Создает мастер ModBus: RTU для COM-порта или TCP для адреса tcp://host:port"""
+    if PORT.startswith(TCP_PORT_PREFIX):
+        host, _, tcp_port = PORT[len(TCP_PORT_PREFIX):].rpartition(":")
+        return modbus_tcp.TcpMaster(host=host or "127.0.0.1", port=int(tcp_port))
+    return modbus_rtu.RtuMaster(
+        serial.Serial(port=PORT, baudrate=baudrate, bytesize=8, parity='N', stopbits=1, xonxoff=0)
+    )
+
+
+def is_link_error(error):
+    """Ошибка канала связи; исключение ModBus от прибора означает, что связь есть"""
+    return not isinstance(error, ModbusError)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class ConnectionManager:
+    """
+    Соединение с прибором по ModBus: открытие порта, автоматическое переподключение
+    с экспоненциальной паузой после серии ошибок связи и статистика качества канала.
+    """
+
+    def __init__(self, on_change=None, factory=create_master):
+        self.factory = factory
+        self.on_change = on_change
+        self.probe = None
+        self.master = None
+        self.connected = False
+        self.device_num = 0
+        self.port = ''
+        self.baudrate = 9600
+        self.timeout = 1
+
+        self._lock = threading.Lock()
+        self._connected_event = threading.Event()
+        self._stop_reconnect = threading.Event()
+        self._reconnect_thread = None
+
+        self.consecutive_failures = 0
+        self.reconnects = 0
+        self.link_errors = 0
+        self.timeouts = 0
+        self.crc_errors = 0
+        self.last_error = ""
+        self._latency = deque(maxlen=LATENCY_SAMPLES)
+
+    # --- Открытие и закрытие ---
+
+    def _open_master(self):
+        master = self.factory(self.port, self.baudrate)
+        master.set_timeout(self.timeout)
+        return master
+
+    def _set_state(self, master, connected):
+        with self._lock:
+            self.master = master
+            self.connected = connected
+        if connected:
+            self._connected_event.set()
+        else:
+            self._connected_event.clear()
+        if self.on_change is not None:
+            self.on_change(master if connected else None, connected)
+
+    def _close_master(self):
+        master = self.master
+        if master is not None:
+            try:
+                master.close()
+            except Exception as e:
+                logging.warning(f"Ошибка при закрытии порта ModBus: {e}")
+
+    def open(self, device_num, port, baudrate, timeout):
+        """Открывает соединение; исключение при ошибке открытия порта пробрасывается"""
+        self.close()
+        self.device_num = device_num
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.consecutive_failures = 0
+        self._set_state(self._open_master(), True)
+        logging.info(f"Соединение ModBus открыто: порт={port}, устройство={device_num}")
+
+    def close(self):
+        """Закрывает соединение и останавливает переподключение"""
+        self._stop_reconnect.set()
+        thread = self._reconnect_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self._reconnect_thread = None
+        self._close_master()
+        self._set_state(None, False)
+
+    # --- Обрыв и переподключение ---
+
+    def mark_lost(self, error):
+        """Фиксирует обрыв связи и запускает переподключение в фоне"""
+        if not self.port:
+            return
+        with self._lock:
+            if self._reconnect_thread is not None and self._reconnect_thread.is_alive():
+                return
+            self._stop_reconnect.clear()
+            # Состояние меняется в потоке переподключения: mark_lost вызывается и из потока шины
+            self._reconnect_thread = threading.Thread(target=self._reconnect_loop, args=(error,),
+                                                      name="modbus-reconnect", daemon=True)
+            self._reconnect_thread.start()
+
+    def _reconnect_loop(self, error):
+        logging.error(f"Связь с ModBus потеряна: {error}. Запуск переподключения")
+        self._close_master()
+        self._set_state(None, False)
+
+        delay = RECONNECT_INITIAL_DELAY
+        attempt = 0
+        while not self._stop_reconnect.wait(delay):
+            attempt += 1
+            master = None
+            try:
+                master = self._open_master()
+                with self._lock:
+                    self.master = master
+                if self.probe is not None:
+                    self.probe()
+            except Exception as e:
+                logging.warning(f"Переподключение ModBus, попытка {attempt}: {e}. "
+                                f"Следующая через {min(delay * RECONNECT_FACTOR, RECONNECT_MAX_DELAY):.1f} с")
+                if master is not None:
+                    try:
+                        master.close()
+                    except Exception:
+                        pass
+                with self._lock:
+                    self.master = None
+                delay = min(delay * RECONNECT_FACTOR, RECONNECT_MAX_DELAY)
+                continue
+
+            self.reconnects += 1
+            self.consecutive_failures = 0
+            self._set_state(master, True)
+            logging.info(f"Связь с ModBus восстановлена после {attempt} попыток (переподключений всего: "
+                         f"{self.reconnects})")
+            return
+
+    def wait_connected(self, timeout=None):
+        """Ждет восстановления связи; True, если соединение есть"""
+        return self._connected_event.wait(timeout)
+
+    @property
+    def reconnecting(self):
+        thread = self._reconnect_thread
+        return thread is not None and thread.is_alive()
+
+    # --- Качество канала ---
+
+    def record_transaction(self, latency, error):
+        """Вызывается шиной после каждой транзакции"""
+        if error is None or not is_link_error(error):
+            self._latency.append(latency)
+            self.consecutive_failures = 0
+            return
+
+        self.link_errors += 1
+        self.last_error = str(error)
+        if modbus_bus.is_timeout_error(error):
+            self.timeouts += 1
+        elif modbus_bus.is_crc_error(error):
+            self.crc_errors += 1
+        self.consecutive_failures += 1
+        if self.connected and self.consecutive_failures >= FAILURE_THRESHOLD:
+            self.mark_lost(error)
+
+    def health(self):
+        latency = sorted(self._latency)
+        return {
+            "connected": self.connected,
+            "reconnecting": self.reconnecting,
+            "reconnects": self.reconnects,
+            "link_errors": self.link_errors,
+            "timeouts": self.timeouts,
+            "crc_errors": self.crc_errors,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "latency_p50": percentile(latency, 0.50),
+            "latency_p95": percentile(latency, 0.95),
+            "latency_p99": percentile(latency, 0.99),
+        }
+
+    def log_health(self):
+        health = self.health()
+        logging.info(f"Канал ModBus: задержка p50 {health['latency_p50'] * 1000:.0f} мс, "
+                     f"p95 {health['latency_p95'] * 1000:.0f} мс, p99 {health['latency_p99'] * 1000:.0f} мс, "
+                     f"таймаутов {health['timeouts']}, CRC {health['crc_errors']}, "
+                     f"переподключений {health['reconnects']}")
@@ -0,0 +1,312 @@
+import argparse
+import logging
+import random
+import struct
+import threading
+import time
+
+import modbus_tk.defines as cst
+from modbus_tk import hooks
+from modbus_tk import modbus_tcp
+from modbus_tk.exceptions import ModbusInvalidRequestError
+
+from .register_snapshot import (CHANNEL_REQUEST_REGISTER, CHANNEL_CONFIRM_REGISTER, CHANNELS_COUNT_REGISTER,
+                                STATUS_REGISTER, STATUS_BITS, REGISTER_BLOCK_START, REGISTER_BLOCK_SIZE)
+
+# Адрес по умолчанию для подключения к симулятору (см. ModbusWindow)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5020
+DEFAULT_DEVICE = 1
+
+BLOCK_NAME = "multiplexer"
+
+
+def _bit(name):
+    return 1 << STATUS_BITS[name]
+
+
+class MultiplexerSimulator:
+    """
+    Программная модель мультиплексора каналов за ModBus-слейвом modbus_tk.
+
+    Повторяет поведение прибора: номера каналов в регистрах со смещением +1,
+    первый запрос после включения запускает инициализацию, переезд идет по одному
+    каналу за hop_time секунд с обновлением регистра подтверждения. Неисправности
+    задаются вероятностями или включаются вручную через inject_fault().
+
+    Запросы перехватываются хуком modbus_tk, а хуки вызываются под общей блокировкой
+    модуля, поэтому обработчик не ждет внутри хука, а симулятор лучше запускать
+    отдельным процессом (python -m src.modbus_simulator), а не в процессе программы.
+    """
+
+    def __init__(self, channels=12, hop_time=0.5, settle_time=0.3, init_time=3.0, initialized=False,
+                 positioning_fault_rate=0.0, exception_rate=0.0, timeout_rate=0.0, seed=None):
+        self.channels = channels
+        self.hop_time = hop_time
+        self.settle_time = settle_time
+        self.init_time = init_time
+        self.positioning_fault_rate = positioning_fault_rate
+        self.exception_rate = exception_rate
+        self.timeout_rate = timeout_rate
+        self._rng = random.Random(seed)
+
+        self.slave = None
+        self.server = None
+        self._requests = []
+        self._requests_lock = threading.Lock()
+        self._request_event = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._initialized = initialized
+        self._channel = 1 if initialized else -1
+        self._forced_status = 0
+
+        # Статистика для оценки пропускной способности переключений
+        self.switches = 0
+        self.hops = 0
+        self.requests_handled = 0
+        self.injected_exceptions = 0
+        self.injected_timeouts = 0
+
+    # --- Регистры ---
+
+    def attach(self, slave):
+        """Создает блок регистров 16400-16403 на слейве modbus_tk"""
+        self.slave = slave
+        slave.add_block(BLOCK_NAME, cst.HOLDING_REGISTERS, REGISTER_BLOCK_START, REGISTER_BLOCK_SIZE)
+        status = _bit('INITIALIZATION') | _bit('READY') if self._initialized else 0
+        count = self.channels if self._initialized else 0
+        self._set_registers(confirm=self._channel + 1, count=count, status=status)
+
+    def _set_registers(self, confirm=None, count=None, status=None, request=None):
+        values = self.slave.get_values(BLOCK_NAME, REGISTER_BLOCK_START, REGISTER_BLOCK_SIZE)
+        values = list(values)
+        if request is not None:
+            values[CHANNEL_REQUEST_REGISTER - REGISTER_BLOCK_START] = request
+        if confirm is not None:
+            values[CHANNEL_CONFIRM_REGISTER - REGISTER_BLOCK_START] = max(confirm, 0)
+        if count is not None:
+            values[CHANNELS_COUNT_REGISTER - REGISTER_BLOCK_START] = count
+        if status is not None:
+            values[STATUS_REGISTER - REGISTER_BLOCK_START] = status | self._forced_status
+        self.slave.set_values(BLOCK_NAME, REGISTER_BLOCK_START, values)
+
+    def _status(self):
+        return self.slave.get_values(BLOCK_NAME, STATUS_REGISTER, 1)[0]
+
+    # --- Неисправности ---
+
+    def inject_fault(self, name):
+        """Включает бит неисправности из STATUS_BITS (например, 'UPPER_SENSOR_ERROR')"""
+        self._forced_status |= _bit(name) | _bit('GENERAL_ERROR')
+        self._set_registers(status=self._status())
+        logging.info(f"Симулятор: включена неисправность {name}")
+
+    def clear_faults(self):
+        """Сброс неисправностей: прибор возвращается в состояние готовности"""
+        self._forced_status = 0
+        status = self._status() & ~sum(_bit(name) for name in STATUS_BITS if name.endswith('ERROR'))
+        if self._initialized and not status & _bit('WORKING'):
+            status |= _bit('READY')
+        self._set_registers(status=status)
+        logging.info("Симулятор: неисправности сброшены")
+
+    # --- Обработка запросов ModBus ---
+
+    def _on_handle_request(self, args):
+        slave, request_pdu = args
+        if slave is not self.slave:
+            return None
+        self.requests_handled += 1
+        function_code = request_pdu[0]
+
+        if self.timeout_rate and self._rng.random() < self.timeout_rate:
+            # Прибор «молчит»: запрос отбрасывается без ответа, и мастер сам выходит по таймауту.
+            # Ждать здесь нельзя - хук держит общую блокировку modbus_tk для всех мастеров процесса
+            self.injected_timeouts += 1
+            raise ModbusInvalidRequestError("Симулятор: запрос отброшен (имитация таймаута)")
+        if self.exception_rate and self._rng.random() < self.exception_rate:
+            self.injected_exceptions += 1
+            return struct.pack(">BB", function_code + 0x80, cst.SLAVE_DEVICE_BUSY)
+
+        if function_code == cst.WRITE_SINGLE_REGISTER:
+            address, value = struct.unpack(">HH", request_pdu[1:5])
+            if address == CHANNEL_REQUEST_REGISTER:
+                self._queue_request(value)
+        elif function_code == cst.WRITE_MULTIPLE_REGISTERS:
+            address, count = struct.unpack(">HH", request_pdu[1:5])
+            if address <= CHANNEL_REQUEST_REGISTER < address + count:
+                offset = 6 + 2 * (CHANNEL_REQUEST_REGISTER - address)
+                self._queue_request(struct.unpack(">H", request_pdu[offset:offset + 2])[0])
+        return None
+
+    def _queue_request(self, value):
+        with self._requests_lock:
+            self._requests.append(value)
+        self._request_event.set()
+
+    def _next_request(self):
+        with self._requests_lock:
+            if not self._requests:
+                self._request_event.clear()
+                return None
+            # Учитываем только последний запрос: прибор выполняет текущий
+            value = self._requests[-1]
+            self._requests.clear()
+            return value
+
+    # --- Модель движения ---
+
+    def _wait(self, seconds):
+        return not self._stop.wait(seconds)
+
+    def _run_initialization(self, target):
+        logging.info("Симулятор: инициализация")
+        self._set_registers(status=_bit('WORKING'))
+        if not self._wait(self.init_time):
+            return
+        # После поиска нулевой позиции головка встает на запрошенный канал
+        self._channel = target if 0 <= target <= self.channels else 1
+        self._initialized = True
+        self._set_registers(confirm=self._channel + 1, count=self.channels,
+                            status=_bit('INITIALIZATION') | _bit('READY'))
+        logging.info(f"Симулятор: инициализация завершена, канал {self._channel}")
+
+    def _run_switch(self, target):
+        ready = _bit('INITIALIZATION') | _bit('READY')
+        if not 0 <= target <= self.channels:
+            self._set_registers(status=ready | _bit('CHANNEL_REQUEST_ERROR'))
+            logging.info(f"Симулятор: недопустимый канал {target}")
+            return
+        if target == self._channel:
+            self._set_registers(confirm=self._channel + 1, status=ready)
+            return
+
+        self.switches += 1
+        self._set_registers(status=_bit('INITIALIZATION') | _bit('WORKING'))
+        if not self._wait(self.settle_time):
+            return
+
+        fault_at = None
+        if self.positioning_fault_rate and self._rng.random() < self.positioning_fault_rate:
+            fault_at = self._rng.randint(1, abs(target - self._channel))
+
+        step = 1 if target > self._channel else -1
+        hop = 0
+        while self._channel != target:
+            if not self._wait(self.hop_time):
+                return
+            hop += 1
+            if hop == fault_at:
+                self._set_registers(status=_bit('INITIALIZATION') | _bit('POSITIONING_TIME_ERROR')
+                                    | _bit('GENERAL_ERROR'))
+                logging.info(f"Симулятор: ошибка позиционирования у канала {self._channel}")
+                return
+            self._channel += step
+            self.hops += 1
+            self._set_registers(confirm=self._channel + 1)
+
+        if not self._wait(self.settle_time):
+            return
+        self._set_registers(status=ready)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if not self._request_event.wait(0.1):
+                continue
+            value = self._next_request()
+            if value is None:
+                continue
+            target = value - 1
+            if not self._initialized:
+                self._run_initialization(target)
+            else:
+                self._run_switch(target)
+
+    # --- Запуск ---
+
+    def start(self):
+        hooks.install_hook("modbus.Slave.handle_request", self._on_handle_request)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="multiplexer-simulator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        hooks.uninstall_hook("modbus.Slave.handle_request", self._on_handle_request)
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+
+
+def start_tcp_simulator(host=DEFAULT_HOST, port=DEFAULT_PORT, device=DEFAULT_DEVICE, **kwargs):
+    """Запускает ModBus TCP сервер с симулятором мультиплексора; возвращает MultiplexerSimulator"""
+    simulator = MultiplexerSimulator(**kwargs)
+    server = modbus_tcp.TcpServer(port=port, address=host)
+    simulator.attach(server.add_slave(device))
+    server.start()
+    simulator.server = server
+    simulator.start()
+    logging.info(f"Симулятор мультиплексора: tcp://{host}:{port}, устройство {device}")
+    return simulator
+
+
+def start_rtu_simulator(serial_port, baudrate=9600, device=DEFAULT_DEVICE, **kwargs):
+    """Симулятор на последовательном порту (например, одна сторона виртуальной пары портов)"""
+    import serial
+    from modbus_tk import modbus_rtu
+
+    simulator = MultiplexerSimulator(**kwargs)
+    server = modbus_rtu.RtuServer(serial.Serial(port=serial_port, baudrate=baudrate, bytesize=8, parity='N',
+                                                stopbits=1, xonxoff=0))
+    simulator.attach(server.add_slave(device))
+    server.start()
+    simulator.server = server
+    simulator.start()
+    logging.info(f"Симулятор мультиплексора: {serial_port} ({baudrate} бит/с), устройство {device}")
+    return simulator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Симулятор ModBus-мультиплексора каналов")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--serial", help="последовательный порт вместо TCP")
+    parser.add_argument("--baudrate", type=int, default=9600)
+    parser.add_argument("--device", type=int, default=DEFAULT_DEVICE)
+    parser.add_argument("--channels", type=int, default=12)
+    parser.add_argument("--hop-time", type=float, default=0.5, help="время переезда на соседний канал, с")
+    parser.add_argument("--settle-time", type=float, default=0.3, help="разгон/торможение, с")
+    parser.add_argument("--init-time", type=float, default=3.0)
+    parser.add_argument("--initialized", action="store_true", help="стартовать уже инициализированным")
+    parser.add_argument("--positioning-fault-rate", type=float, default=0.0)
+    parser.add_argument("--exception-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    options = dict(channels=args.channels, hop_time=args.hop_time, settle_time=args.settle_time,
+                   init_time=args.init_time, initialized=args.initialized,
+                   positioning_fault_rate=args.positioning_fault_rate, exception_rate=args.exception_rate,
+                   timeout_rate=args.timeout_rate, seed=args.seed)
+    if args.serial:
+        simulator = start_rtu_simulator(args.serial, args.baudrate, args.device, **options)
+    else:
+        simulator = start_tcp_simulator(args.host, args.port, args.device, **options)
+
+    try:
+        while True:
+            time.sleep(10)
+            logging.info(f"Симулятор: запросов {simulator.requests_handled}, переключений {simulator.switches}, "
+                         f"переездов {simulator.hops}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
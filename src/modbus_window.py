@@ -3,19 +3,21 @@ import serial
 import serial.tools.list_ports
 import modbus_tk
 import modbus_tk.defines as cst
-from modbus_tk import modbus_rtu
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QVBoxLayout, QDialog
-import json
-import os
 
+from . import config_store
+from . import device_registry
+from . import modbus_connection
+from . import modbus_simulator
 from . import utility_functions
 
+# Адрес симулятора мультиплексора (python -m src.modbus_simulator)
+SIMULATOR_PORT = f"{modbus_connection.TCP_PORT_PREFIX}{modbus_simulator.DEFAULT_HOST}:{modbus_simulator.DEFAULT_PORT}"
+
 
 def load_modbus_config():
     """Загрузка параметров Modbus из конфигурационного файла"""
-    config_path = os.path.join('config', 'config.json')
-    
     # Значения по умолчанию
     modbus_config = {
         "device_num": 1,
@@ -23,45 +25,21 @@ def load_modbus_config():
         "baudrate": "9600",
         "timeout": 1
     }
-    
-    try:
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                
-            # Если в конфиге есть секция modbus, используем её
-            if 'modbus' in config:
-                modbus_config = config['modbus']
-    except Exception as e:
-        logging.error(f"Ошибка при загрузке конфигурации Modbus: {e}")
-    
-    return modbus_config
+
+    # Если в конфиге есть секция modbus, используем её
+    return config_store.config.get("modbus", modbus_config)
 
 
 def save_modbus_config(device_num, port, baudrate, timeout):
     """Сохранение параметров Modbus в конфигурационный файл"""
-    config_path = os.path.join('config', 'config.json')
-    
     try:
-        # Загружаем текущий конфиг
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-        else:
-            config = {}
-        
         # Обновляем или создаем секцию modbus
-        config['modbus'] = {
+        config_store.config.set("modbus", {
             "device_num": device_num,
             "port": port,
             "baudrate": baudrate,
             "timeout": timeout
-        }
-        
-        # Сохраняем обновленный конфиг
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=4)
-            
+        })
         logging.info("Конфигурация Modbus успешно сохранена")
     except Exception as e:
         logging.error(f"Ошибка при сохранении конфигурации Modbus: {e}")
@@ -70,8 +48,7 @@ def save_modbus_config(device_num, port, baudrate, timeout):
 class ModbusWindow(QDialog):
     def stop_client(self):
         logging.info("Отключение Modbus клиента")
-        utility_functions.master = None
-        utility_functions.modbus_connected = False
+        utility_functions.devices.close_all()
         self.error_label.setText("")
         self.connect_button.setText("Соединение")
 
@@ -87,18 +64,19 @@ class ModbusWindow(QDialog):
             utility_functions.timeout = int(timeoutentry)
             try:
                 try:
-                    utility_functions.master = modbus_rtu.RtuMaster(
-                        serial.Serial(port=PORT, baudrate=baudrate, bytesize=8, parity='N', stopbits=1, xonxoff=0)
-                    )
-                    utility_functions.master.set_timeout(int(utility_functions.timeout))
+                    # Соединение само переподключается после обрыва связи
+                    utility_functions.devices.connect(device_registry.DEFAULT_DEVICE, utility_functions.device_num,
+                                                      PORT, baudrate, utility_functions.timeout)
                     logging.info(f"Modbus клиент подключен: устройство={utility_functions.device_num}")
-                    utility_functions.modbus_connected = True
                     self.error_label.setText("Соединение установлено")
                     self.connect_button.setText("Отключиться")
                     
                     # Сохраняем параметры в конфиг
                     save_modbus_config(device, PORT, baudrate, timeoutentry)
-                except serial.serialutil.SerialException as e:
+                    
+                    # Дополнительные приборы станции (список "devices" в config.json)
+                    utility_functions.connect_configured_devices()
+                except (serial.serialutil.SerialException, OSError, ValueError) as e:
                     utility_functions.modbus_connected = False
                     self.error_label.setText("Соединение НЕ установлено")
                     logging.error(f"Ошибка подключения к порту: {e}")
@@ -128,6 +106,8 @@ class ModbusWindow(QDialog):
         
         layout = QVBoxLayout(self)
         available_ports = [i.device for i in serial.tools.list_ports.comports()]
+        if utility_functions.simulation == 1:
+            available_ports.append(SIMULATOR_PORT)
         label1 = QtWidgets.QLabel()
         label1.setText("Адрес устройства")
         layout.addWidget(label1)
@@ -1,20 +1,17 @@
-import json
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QGridLayout, QDialog
 
-from . import utility_functions
+from . import config_store, utility_functions
 
 
 class RenameParamsWindow(QDialog):
     def save_params(self):
         for i in range(16):
             utility_functions.parameter_names[i] = self.entries[i].text()[:50]
-        with open('config/config.json', 'r', encoding="utf-8") as file:
-            json_data = json.load(file)
+        param_names = config_store.config.get("param_names", {})
         for i in range(16):
-            json_data["param_names"][str(i + 1)] = utility_functions.parameter_names[i]
-        with open('config/config.json', 'w') as f:
-            json.dump(json_data, f)
+            param_names[str(i + 1)] = utility_functions.parameter_names[i]
+        config_store.config.set("param_names", param_names)
         self.big_parent.update_param_names()
         self.close()
 
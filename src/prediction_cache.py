@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from . import config_store
+
+# Версия формата значений в кэше: при ее смене старые записи на диске не используются
+CACHE_FORMAT = 2
+
+
+def file_signature(path):
+    """(путь, размер, mtime_ns) файла или (путь, None, None), если файла нет"""
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path, None, None
+    return path, stat.st_size, stat.st_mtime_ns
+
+
+def make_key(x_values, y_values, model_path, exequant_path, region=None):
+    """
+    Ключ предсказания: хэш спектра поглощения, области .dat, файла модели и самого exequant.exe.
+    Изменение модели или замена программы (другие размер или mtime) дают новый ключ.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for values in (x_values, y_values):
+        digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        digest.update(b"|")
+    digest.update(repr((CACHE_FORMAT, region, file_signature(model_path), file_signature(exequant_path))).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Кэш результатов exequant (свойства спектра) по его содержимому: LRU в памяти и, если задан disk_dir,
+    файлы на диске (по одному JSON на ключ), которые переживают перезапуск программы.
+    """
+
+    def __init__(self, max_entries=512, disk_dir=""):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Значение для ключа или None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), 'r', encoding="utf-8") as file:
+                    value = json.load(file)["value"]
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"Поврежден файл кэша предсказаний {key}: {e}")
+            else:
+                self._remember(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Запоминает значение; неудачные расчеты (None) не кэшируются"""
+        if value is None:
+            return
+        self._remember(key, value)
+        if self.disk_dir:
+            try:
+                config_store.write_json_atomic(self._disk_path(key), {"value": value})
+            except Exception as e:
+                logging.warning(f"Ошибка записи кэша предсказаний: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Общий кэш предсказаний exequant; папка на диске задается "prediction_cache_dir" в config.json
+prediction_cache = PredictionCache()
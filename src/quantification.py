@@ -0,0 +1,291 @@
+import collections
+import itertools
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import config_store
+from . import prediction_cache
+from . import utility_functions
+
+# Сколько процессов exequant может работать одновременно
+DEFAULT_WORKERS = 2
+# Сколько запусков exequant может ждать очереди; лишние спектры сохраняются без значений параметров
+DEFAULT_MAX_PENDING = 8
+# Наибольший пакет спектров на один запуск exequant
+DEFAULT_MAX_BATCH = 64
+# Неполный пакет отправляется на расчет не позже чем через столько секунд
+BATCH_TIMEOUT = 60
+
+# Слоты параметров по умолчанию: номер слота (1-16) - свойство exequant и допустимый диапазон
+DEFAULT_PARAM_MAPPING = {"1": {"property": "Цет. число", "min": 0, "max": 100}}
+PARAM_SLOTS = 16
+
+_executor_numbers = itertools.count(1)
+
+
+def parameter_mapping():
+    """
+    Слоты параметров из "param_mapping" в config.json: [(индекс слота, настройки)] по порядку.
+    Настройки слота: property - название свойства exequant, offset - смещение (для слота 1
+    по умолчанию "param_offset" из окна настроек), min/max - допустимый диапазон значения.
+    """
+    mapping = config_store.config.get("param_mapping") or DEFAULT_PARAM_MAPPING
+    slots = []
+    for slot, settings in mapping.items():
+        try:
+            index = int(slot) - 1
+        except ValueError:
+            index = -1
+        if not 0 <= index < PARAM_SLOTS or not isinstance(settings, dict) or not settings.get("property"):
+            logging.error(f"Некорректный слот параметра в param_mapping: {slot}: {settings}")
+            continue
+        if index == 0 and "offset" not in settings:
+            settings["offset"] = config_store.config.get("param_offset", 0)
+        slots.append((index, settings))
+    return sorted(slots, key=lambda item: item[0])
+
+
+def parameter_count():
+    """Сколько слотов параметров показывать: до последнего настроенного (не меньше одного)"""
+    slots = parameter_mapping()
+    return slots[-1][0] + 1 if slots else 1
+
+
+def map_parameters(properties, slots=None):
+    """
+    Значения параметров по слотам из свойств exequant: список длиной parameter_count(),
+    NaN - нет значения (свойство не рассчитано или вне диапазона).
+    """
+    if slots is None:
+        slots = parameter_mapping()
+    conc = [float("nan")] * (slots[-1][0] + 1 if slots else 1)
+    if not properties:
+        return conc
+
+    for index, settings in slots:
+        fields = properties.get(settings["property"])
+        if fields is None:
+            logging.warning(f"exequant не вернул свойство {settings['property']} (параметр {index + 1})")
+            continue
+        value = fields["value"] + float(settings.get("offset", 0))
+        if not settings.get("min", -math.inf) < value < settings.get("max", math.inf):
+            logging.info(f"Значение {settings['property']} с учетом смещения вне диапазона: {value}")
+            continue
+        conc[index] = value
+        # Поля качества (расстояние Махаланобиса, остатки и т.п.) - в лог вместе со значением
+        quality = {name: field for name, field in fields.items() if name != "value"}
+        logging.info(f"Параметр {index + 1} ({settings['property']}): {fields['value']}, "
+                     f"с учетом смещения: {value}" + (f", качество: {quality}" if quality else ""))
+    return conc
+
+
+class QuantificationJob:
+    """Спектр поглощения на расчет и его источник: канал и момент измерения"""
+    __slots__ = ("channel", "timestamp", "x", "y", "region", "properties", "duration", "cache_key")
+
+    def __init__(self, channel, timestamp, x, y):
+        self.channel = channel
+        self.timestamp = timestamp
+        self.x = x
+        self.y = y
+        # Область волновых чисел, записываемая в .dat (None - весь спектр)
+        self.region = None
+        # Свойства спектра от exequant: {название: {"value": ..., поля качества}} или None
+        self.properties = None
+        self.duration = 0.0
+        self.cache_key = None
+
+
+class QuantificationExecutor:
+    """
+    Расчет параметров exequant.exe вне потока измерения.
+
+    Задания выполняются пулом из workers потоков, каждое - в своей временной папке со своими
+    файлами спектров, поэтому одновременные запуски не мешают друг другу. submit возвращает
+    Future; готовые задания передаются в on_result(job) строго в порядке постановки.
+
+    Уже рассчитанные спектры (тот же спектр, модель и exequant.exe) берутся из кэша
+    prediction_cache до записи файлов и запуска exequant.
+
+    Спектры с одинаковым batch_key (например, все измерения канала) собираются в пакет
+    и рассчитываются одним запуском exequant; пакет отправляется, когда меняется ключ,
+    набирается max_batch спектров, проходит batch_timeout секунд или вызывается flush.
+    """
+
+    def __init__(self, on_result, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING,
+                 max_batch=DEFAULT_MAX_BATCH, batch_timeout=BATCH_TIMEOUT, cache=None):
+        self.on_result = on_result
+        self.cache = cache if cache is not None else prediction_cache.prediction_cache
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.batch_timeout = batch_timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="exequant")
+        self._lock = threading.Lock()
+        self._order = collections.deque()
+        # Рабочая папка создается при первом расчете и удаляется в shutdown
+        self._work_dir = os.path.join(tempfile.gettempdir(), f"exequant_{os.getpid()}_{next(_executor_numbers)}")
+        # Собираемый пакет: [(задание, Future)], его ключ и таймер отправки
+        self._batch = []
+        self._batch_key = None
+        self._batch_timer = None
+        # Отправленные пакеты, расчет которых еще не закончен
+        self._running_batches = 0
+        # Готовые задания отдает один поток за раз, остальные только ставят их в очередь
+        self._delivering = False
+        self.closed = False
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cached = 0
+        self.batches = 0
+        self.max_duration = 0.0
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._order)
+
+    def submit(self, channel, timestamp, x, y, batch_key=None):
+        """Ставит спектр на расчет (batch_key=None - отдельным запуском); None, если очередь заполнена"""
+        job = QuantificationJob(channel, timestamp, x, y)
+        job.region = utility_functions.exequant_region()
+        job.cache_key = prediction_cache.make_key(x, y, utility_functions.exequant_model_path(),
+                                                  utility_functions.exequant_path, job.region)
+        job.properties = self.cache.get(job.cache_key)
+        future = Future()
+        with self._lock:
+            if job.properties is not None:
+                # Спектр уже рассчитан: результат отдается в общем порядке без запуска exequant
+                future.set_result(job)
+                self.cached += 1
+            elif self._running_batches >= self.max_pending:
+                # Собираемый пакет еще не занимает exequant и в ограничение очереди не входит
+                self.rejected += 1
+                logging.warning(f"exequant не успевает: {self._running_batches} запусков ждут расчета, "
+                                f"спектр канала {channel} сохраняется без параметров")
+                return None
+            else:
+                if self._batch and batch_key != self._batch_key:
+                    self._dispatch_batch()
+                self._batch.append((job, future))
+                self._batch_key = batch_key
+                if batch_key is None or len(self._batch) >= self.max_batch:
+                    self._dispatch_batch()
+                elif self._batch_timer is None:
+                    self._batch_timer = threading.Timer(self.batch_timeout, self.flush)
+                    self._batch_timer.daemon = True
+                    self._batch_timer.start()
+            self._order.append(future)
+            self.submitted += 1
+        if future.done():
+            # Результат из кэша отдается потоком пула: запись архива не задерживает submit
+            self._pool.submit(self._deliver, future)
+        else:
+            future.add_done_callback(self._deliver)
+        return future
+
+    def flush(self):
+        """Отправляет собираемый пакет на расчет, не дожидаясь его заполнения"""
+        with self._lock:
+            if self._batch:
+                self._dispatch_batch()
+
+    def _dispatch_batch(self):
+        batch, self._batch, self._batch_key = self._batch, [], None
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        self.batches += 1
+        self._running_batches += 1
+        self._pool.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        job_dir = None
+        started = time.monotonic()
+        try:
+            # Временную папку службы мог удалить и очиститель временных файлов
+            os.makedirs(self._work_dir, exist_ok=True)
+            job_dir = tempfile.mkdtemp(prefix="job_", dir=self._work_dir)
+            # Имена файлов уникальны: по ним exequant группирует результаты
+            paths = {}
+            for index, (job, _future) in enumerate(batch):
+                dat_file_path = os.path.join(job_dir, f"{index:03d}_ch{job.channel}.dat")
+                if utility_functions.spectrum_to_dat(job.x, job.y, dat_file_path, job.region) == 0:
+                    paths[index] = dat_file_path
+
+            if len(paths) == 1:
+                results = {path: utility_functions.run_exequant(path, work_dir=job_dir) for path in paths.values()}
+            elif paths:
+                results = utility_functions.run_exequant_batch(list(paths.values()), work_dir=job_dir)
+            else:
+                results = {}
+            duration = time.monotonic() - started
+            for index, (job, future) in enumerate(batch):
+                job.properties = results.get(paths.get(index))
+                job.duration = duration
+                self.cache.put(job.cache_key, job.properties)
+                future.set_result(job)
+        except Exception as e:
+            # Спектры пакета все равно сохраняются в архив - без значений параметров
+            logging.error(f"Ошибка при расчете параметров exequant: {e}", exc_info=True)
+            for job, future in batch:
+                if not future.done():
+                    job.properties = None
+                    job.duration = time.monotonic() - started
+                    future.set_result(job)
+        finally:
+            if job_dir is not None:
+                shutil.rmtree(job_dir, ignore_errors=True)
+            with self._lock:
+                self._running_batches -= 1
+
+    def _deliver(self, _future):
+        # Результаты отдаются по порядку: готовое задание ждет завершения предыдущих.
+        # on_result (запись архива) вызывается без блокировки, чтобы не задерживать submit
+        with self._lock:
+            if self._delivering:
+                # Текущий поток доставки заберет и это задание
+                return
+            self._delivering = True
+        while True:
+            with self._lock:
+                ready = []
+                while self._order and self._order[0].done():
+                    ready.append(self._order.popleft())
+                if not ready:
+                    self._delivering = False
+                    return
+            for future in ready:
+                job = future.result()
+                self.completed += 1
+                self.max_duration = max(self.max_duration, job.duration)
+                try:
+                    self.on_result(job)
+                except Exception as e:
+                    logging.error(f"Ошибка при обработке результата exequant: {e}", exc_info=True)
+
+    def shutdown(self, wait=True):
+        """
+        Отправляет собираемый пакет и останавливает пул. Начатые расчеты доводятся до конца
+        и попадают в архив; при wait=False они завершаются в фоне, затем удаляется рабочая папка.
+        """
+        self.flush()
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        if wait:
+            self._shutdown()
+        else:
+            threading.Thread(target=self._shutdown, name="exequant-shutdown", daemon=True).start()
+
+    def _shutdown(self):
+        self._pool.shutdown(wait=True)
+        shutil.rmtree(self._work_dir, ignore_errors=True)
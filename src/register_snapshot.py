@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import namedtuple
+
+# Регистры мультиплексора каналов (непрерывный блок 16400-16403)
+CHANNEL_REQUEST_REGISTER = 16400
+CHANNEL_CONFIRM_REGISTER = 16401
+CHANNELS_COUNT_REGISTER = 16402
+STATUS_REGISTER = 16403
+REGISTER_BLOCK_START = CHANNEL_REQUEST_REGISTER
+REGISTER_BLOCK_SIZE = 4
+
+# Битовые маски для статуса
+STATUS_BITS = {
+    'INITIALIZATION': 0,
+    'READY': 1,
+    'WORKING': 2,
+    'GENERAL_ERROR': 3,
+    'UPPER_SENSOR_ERROR': 4,
+    'LOWER_SENSOR_ERROR': 5,
+    'CELL_SENSOR_ERROR': 6,
+    'POSITIONING_TIME_ERROR': 7,
+    'CHANNEL_REQUEST_ERROR': 8,
+    'UPPER_SENSOR': 13,
+    'LOWER_SENSOR': 14,
+    'CELL_SENSOR': 15
+}
+
+
+def _status_bit(name):
+    mask = 1 << STATUS_BITS[name]
+    return property(lambda self: bool(self.raw_value & mask))
+
+
+class RegisterSnapshot(namedtuple('RegisterSnapshot',
+                                  ['requested_register', 'confirm_register', 'channels_count', 'raw_value',
+                                   'timestamp'])):
+    """Неизменяемый снимок регистров 16400-16403 с декодированными битами статуса"""
+    __slots__ = ()
+
+    @classmethod
+    def from_registers(cls, registers, timestamp=None):
+        requested, confirm, count, status = registers[:REGISTER_BLOCK_SIZE]
+        return cls(requested, confirm, count, status, time.monotonic() if timestamp is None else timestamp)
+
+    @property
+    def requested_channel(self):
+        # Номер канала хранится в регистрах со смещением +1
+        return self.requested_register - 1
+
+    @property
+    def active_channel(self):
+        return self.confirm_register - 1
+
+    @property
+    def binary(self):
+        return bin(self.raw_value)
+
+    @property
+    def age(self):
+        return time.monotonic() - self.timestamp
+
+    initialization = _status_bit('INITIALIZATION')
+    ready = _status_bit('READY')
+    working = _status_bit('WORKING')
+    general_error = _status_bit('GENERAL_ERROR')
+    upper_sensor_error = _status_bit('UPPER_SENSOR_ERROR')
+    lower_sensor_error = _status_bit('LOWER_SENSOR_ERROR')
+    cell_sensor_error = _status_bit('CELL_SENSOR_ERROR')
+    positioning_time_error = _status_bit('POSITIONING_TIME_ERROR')
+    channel_request_error = _status_bit('CHANNEL_REQUEST_ERROR')
+    upper_sensor = _status_bit('UPPER_SENSOR')
+    lower_sensor = _status_bit('LOWER_SENSOR')
+    cell_sensor = _status_bit('CELL_SENSOR')
+
+
+class RegisterSnapshotService:
+    """
+    Читает блок 16400-16403 одной транзакцией и раздает снимок всем потребителям,
+    пока он не старше max_age секунд. Одновременные запросы ждут одно общее чтение.
+    """
+
+    def __init__(self, read_block, max_age=0.25):
+        self._read_block = read_block
+        self.max_age = max_age
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.transactions = 0
+        self.shared_reads = 0
+
+    def read(self, max_age=None, **read_options):
+        """Возвращает свежий снимок; при ошибке чтения пробрасывает исключение"""
+        if max_age is None:
+            max_age = self.max_age
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.age <= max_age:
+                self.shared_reads += 1
+                return snapshot
+            registers = self._read_block(REGISTER_BLOCK_START, REGISTER_BLOCK_SIZE, **read_options)
+            self.transactions += 1
+            self._snapshot = RegisterSnapshot.from_registers(registers)
+            return self._snapshot
+
+    def invalidate(self):
+        """Сбрасывает снимок (после записи в регистры)"""
+        with self._lock:
+            self._snapshot = None
@@ -0,0 +1,104 @@
+import logging
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Представления, которые обновляются результатами измерений
+VIEW_INTENSITY = "intensity"      # (x, спектр, фон) - график 1
+VIEW_ABSORBANCE = "absorbance"    # (x, D) - график 2
+VIEW_CHANNEL = "channel"          # текст метки текущего канала
+VIEW_SETTINGS = "settings"        # (res, scans, cuv_length) для открытого окна настроек
+VIEW_AUTORANGE = "autorange"      # сброс масштаба графиков при первом запуске
+VIEW_BACKGROUND = "background"    # (идет измерение фона, дата обновления фона или None)
+VIEW_STATE = "state"              # цикл измерений запущен (True/False)
+VIEW_ERROR = "error"              # код ошибки, остановившей цикл измерений
+VIEW_PARAMS = "params"            # значения параметров (только для подписчиков add_listener)
+
+
+class ResultBus(QObject):
+    """
+    Передача результатов из рабочих потоков в GUI через сигнал Qt.
+
+    Рабочий поток публикует данные по представлениям; из пачки обновлений одного
+    представления GUI отрисует только последнее. Сигнал updated отправляется один раз,
+    пока GUI не забрал накопленное, и обрабатывается в главном потоке (QueuedConnection).
+    Значения параметров не объединяются: каждое попадает на график тренда.
+    Если к сигналу никто не подключен (служба daemon.py без окна), данные получают
+    только подписчики add_listener и в шине не накапливаются.
+    """
+    updated = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._params = []
+        self._pending = False
+        self._listeners = []
+        self.published = 0
+        self.coalesced = 0
+        self.deliveries = 0
+
+    def add_listener(self, listener):
+        """listener(представление, данные) вызывается в потоке публикации - например, служба daemon.py"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify_listeners(self, view, data):
+        for listener in list(self._listeners):
+            try:
+                listener(view, data)
+            except Exception as e:
+                logging.error(f"Ошибка подписчика шины результатов: {e}")
+
+    def _has_receivers(self):
+        return self.receivers(self.updated) > 0
+
+    def publish(self, view, data):
+        self._notify_listeners(view, data)
+        if not self._has_receivers():
+            return
+        with self._lock:
+            self.published += 1
+            if view in self._latest:
+                self.coalesced += 1
+            self._latest[view] = data
+            notify = self._mark_pending()
+        if notify:
+            self.updated.emit()
+
+    def publish_params(self, conc):
+        self._notify_listeners(VIEW_PARAMS, list(conc))
+        if not self._has_receivers():
+            return
+        with self._lock:
+            self.published += 1
+            self._params.append(list(conc))
+            notify = self._mark_pending()
+        if notify:
+            self.updated.emit()
+
+    def _mark_pending(self):
+        if self._pending:
+            return False
+        self._pending = True
+        return True
+
+    def take(self):
+        """Забирает накопленные обновления: ({представление: данные}, [значения параметров])"""
+        with self._lock:
+            latest, params = self._latest, self._params
+            self._latest, self._params = {}, []
+            self._pending = False
+            self.deliveries += 1
+        return latest, params
+
+    def clear(self):
+        self.take()
+
+
+# Глобальная шина результатов (создается в главном потоке вместе с GUI)
+result_bus = ResultBus()
@@ -1,10 +1,48 @@
-import json
 import configparser
 from pathlib import Path
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QVBoxLayout, QGridLayout, QHBoxLayout, QDialog, QFileDialog
 
-from . import utility_functions, fetch_data
+from . import config_store, prediction_cache, utility_functions, fetch_data
+
+# Имя темы, примененной к приложению последней
+_applied_theme = None
+
+
+def apply_theme(theme):
+    """Применяет QSS-тему к приложению, если она еще не применена"""
+    global _applied_theme
+    if theme == _applied_theme:
+        return
+    QtWidgets.QApplication.instance().setStyleSheet(Path(f'resources/themes/{theme}.qss').read_text())
+    _applied_theme = theme
+
+
+def load_config():
+    """Загружает config/config.json в глобальные параметры без создания виджетов"""
+    json_data = config_store.config.snapshot()
+    try:
+        if int(json_data["simulation"]) == 1:
+            utility_functions.simulation = 1
+        else:
+            utility_functions.simulation = 0
+    except (ValueError, KeyError):
+        # В случае ошибки используем значение по умолчанию
+        utility_functions.simulation = 0
+    utility_functions.method_path = json_data["method_path"]
+    
+    # Загрузка пути к exequant.exe
+    utility_functions.exequant_path = json_data.get("exequant_path", "")
+    # Папка кэша предсказаний exequant на диске; пусто - кэш только в памяти
+    prediction_cache.prediction_cache.disk_dir = json_data.get("prediction_cache_dir", "")
+    
+    utility_functions.plots_interval = int(json_data["plots_period"][0:2])
+    utility_functions.params_interval = json_data["params_period"]
+    for i in range(16):
+        utility_functions.parameter_names[i] = json_data["param_names"][str(i + 1)]
+    utility_functions.days_threshold = int(json_data["days_threshold"])
+    utility_functions.theme = json_data["theme"]
+    return json_data
 
 
 class SettingsWindow(QDialog):
@@ -71,60 +109,37 @@ class SettingsWindow(QDialog):
             except ValueError:
                 pass
                 
-        with open('config/config.json', 'r', encoding="utf-8") as file:
-            json_data = json.load(file)
-        json_data["simulation"] = str(utility_functions.simulation)
-        json_data["method_path"] = utility_functions.method_path
-        json_data["exequant_path"] = utility_functions.exequant_path
-        json_data["params_period"] = self.combo2.currentText()
-        json_data["plots_period"] = self.combo1.currentText()
-        json_data["days_threshold"] = utility_functions.days_threshold
-        json_data["limits"]["min"] = min_val
-        json_data["limits"]["max"] = max_val
-        json_data["theme"] = utility_functions.theme
-        json_data["cuv_correction"] = cuv_correction
-        json_data["param_offset"] = param_offset
-        with open('config/config.json', 'w') as f:
-            json.dump(json_data, f)
+        limits = config_store.config.get("limits", {})
+        limits["min"] = min_val
+        limits["max"] = max_val
+        config_store.config.update({
+            "simulation": str(utility_functions.simulation),
+            "method_path": utility_functions.method_path,
+            "exequant_path": utility_functions.exequant_path,
+            "params_period": self.combo2.currentText(),
+            "plots_period": self.combo1.currentText(),
+            "days_threshold": utility_functions.days_threshold,
+            "limits": limits,
+            "theme": utility_functions.theme,
+            "cuv_correction": cuv_correction,
+            "param_offset": param_offset,
+        })
 
     def load(self):
-        with open('config/config.json', 'r', encoding="utf-8") as file:
-            json_data = json.load(file)
-        try:
-            if int(json_data["simulation"]) == 1:
-                self.rb_on.setChecked(True)
-                utility_functions.simulation = 1
-            else:
-                self.rb_off.setChecked(True)
-                utility_functions.simulation = 0
-        except (ValueError, KeyError):
-            # В случае ошибки используем значение по умолчанию
-            self.rb_off.setChecked(True)
-            utility_functions.simulation = 0
-        self.path1_label.setText(json_data["method_path"])
-        utility_functions.method_path = json_data["method_path"]
-        
-        # Загрузка пути к exequant.exe
-        if "exequant_path" in json_data:
-            self.exequant_path_label.setText(json_data["exequant_path"])
-            utility_functions.exequant_path = json_data["exequant_path"]
+        json_data = load_config()
+        if utility_functions.simulation == 1:
+            self.rb_on.setChecked(True)
         else:
-            self.exequant_path_label.setText("")
-            utility_functions.exequant_path = ""
-        
+            self.rb_off.setChecked(True)
+        self.path1_label.setText(utility_functions.method_path)
+        self.exequant_path_label.setText(utility_functions.exequant_path)
         self.combo1.setCurrentText(json_data["plots_period"])
-        utility_functions.plots_interval = int(json_data["plots_period"][0:2])
         self.combo2.setCurrentText(json_data["params_period"])
-        utility_functions.params_interval = json_data["params_period"]
-        for i in range(16):
-            utility_functions.parameter_names[i] = json_data["param_names"][str(i + 1)]
-        utility_functions.days_threshold = int(json_data["days_threshold"])
         self.save_entry.setText(str(utility_functions.days_threshold))
         self.min_entry.setText(json_data["limits"]["min"])
         self.max_entry.setText(json_data["limits"]["max"])
         self.parent.plot2.setXRange(int(json_data["limits"]["min"]), int(json_data["limits"]["max"]))
         self.parent.plot1.setXRange(int(json_data["limits"]["min"]), int(json_data["limits"]["max"]))
-        utility_functions.theme = json_data["theme"]
         
         # Загрузка поправки на толщину кюветы
         if "cuv_correction" in json_data:
@@ -134,7 +149,7 @@ class SettingsWindow(QDialog):
         if "param_offset" in json_data:
             self.param_offset_entry.setText(str(json_data["param_offset"]))
             
-        QtWidgets.QApplication.instance().setStyleSheet(Path(f'resources/themes/{utility_functions.theme}.qss').read_text())
+        apply_theme(utility_functions.theme)
 
     def modbus_settings(self):
         from .modbus_window import ModbusWindow
@@ -152,13 +167,11 @@ class SettingsWindow(QDialog):
         self.channel_params_window.show()
 
     def change_theme(self):
-        app = QtWidgets.QApplication.instance()
         if utility_functions.theme == "light":
-            app.setStyleSheet(Path('resources/themes/brand.qss').read_text())
             utility_functions.theme = "brand"
         else:
-            app.setStyleSheet(Path('resources/themes/light.qss').read_text())
             utility_functions.theme = "light"
+        apply_theme(utility_functions.theme)
 
     def __init__(self, parent):
         super().__init__()
@@ -278,9 +291,7 @@ class SettingsWindow(QDialog):
         
         self.last_updated = QtWidgets.QLabel()
         self.last_updated.setAlignment(QtCore.Qt.AlignRight)
-        with open('config/config.json', 'r', encoding="utf-8") as file:
-            json_data = json.load(file)
-        self.last_updated.setText(json_data["fon_updated"])
+        self.last_updated.setText(config_store.config.get("fon_updated", ""))
         fon_date_layout.addWidget(self.last_updated)
         layout.addLayout(fon_date_layout)
         
@@ -0,0 +1,146 @@
+import mmap
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Маркер начала двоичных данных в SPE-файле
+YDATA_TAG = b"##$YDATA"
+END_TAG = b"##END="
+
+# Соответствие формата данных из строки ##$YDATA типу numpy
+YDATA_DTYPES = {
+    "SINGLE": np.dtype("<f4"),
+    "DOUBLE": np.dtype("<f8"),
+}
+
+# Кодировка заголовка (файлы пишутся программой под Windows)
+HEADER_ENCODING = "cp1251"
+
+
+@dataclass(frozen=True)
+class SpeHeader:
+    """Заголовок SPE-файла, разобранный из строк ##KEY=VALUE"""
+    first_x: float
+    last_x: float
+    npoints: int
+    resolution: float = 0.0
+    nscans: int = 0
+    apodization: int = 0
+    zpd: float = 0.0
+    date: str = ""
+    time: str = ""
+    ydata_format: str = "SINGLE"
+    data_offset: int = 0
+    fields: dict = field(default_factory=dict, compare=False, repr=False)
+
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_int(value, default=0):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_spe_header(buffer):
+    """Разбирает заголовок SPE из буфера и возвращает SpeHeader со смещением данных"""
+    tag_pos = buffer.find(YDATA_TAG)
+    if tag_pos == -1:
+        raise ValueError("В SPE-файле не найден маркер ##$YDATA")
+    line_end = buffer.find(b"\n", tag_pos)
+    if line_end == -1:
+        raise ValueError("SPE-файл обрывается на строке ##$YDATA")
+
+    fields = {}
+    for raw_line in bytes(buffer[:line_end]).split(b"\n"):
+        line = raw_line.strip().decode(HEADER_ENCODING, errors="replace")
+        if not line.startswith("##") or "=" not in line:
+            continue
+        key, value = line[2:].split("=", 1)
+        fields[key.strip().upper()] = value.strip()
+
+    ydata = fields.get("$YDATA", "SINGLE")
+    ydata_format = ydata.split("(", 1)[0].strip().upper() or "SINGLE"
+    if ydata_format not in YDATA_DTYPES:
+        raise ValueError(f"Неподдерживаемый формат данных SPE: {ydata}")
+
+    data_offset = line_end + 1
+    npoints = _to_int(fields.get("NPOINTS"), -1)
+    if npoints < 0:
+        # NPOINTS отсутствует - определяем по положению ##END=
+        data_end = buffer.rfind(END_TAG)
+        if data_end == -1:
+            data_end = len(buffer)
+        payload = bytes(buffer[data_offset:data_end]).rstrip(b"\r\n")
+        npoints = len(payload) // YDATA_DTYPES[ydata_format].itemsize
+
+    return SpeHeader(
+        first_x=_to_float(fields.get("FIRSTX")),
+        last_x=_to_float(fields.get("LASTX")),
+        npoints=npoints,
+        resolution=_to_float(fields.get("RESOLUTION")),
+        nscans=_to_int(fields.get("NSCANS")),
+        apodization=_to_int(fields.get("APODIZATION")),
+        zpd=_to_float(fields.get("ZPD")),
+        date=fields.get("DATE", ""),
+        time=fields.get("TIME", ""),
+        ydata_format=ydata_format,
+        data_offset=data_offset,
+        fields=fields,
+    )
+
+
+def parse_spe_bytes(buffer):
+    """Возвращает (заголовок, массив Y) без копирования данных из буфера"""
+    header = parse_spe_header(buffer)
+    dtype = YDATA_DTYPES[header.ydata_format]
+    available = (len(buffer) - header.data_offset) // dtype.itemsize
+    if header.npoints > available:
+        raise ValueError(f"SPE-файл усечен: ожидалось {header.npoints} точек, доступно {available}")
+    y_values = np.frombuffer(buffer, dtype=dtype, count=header.npoints, offset=header.data_offset)
+    return header, y_values
+
+
+def read_spe(spe_file, use_mmap=False):
+    """Читает SPE-файл за одно обращение к диску и возвращает (заголовок, массив Y)"""
+    with open(spe_file, 'rb') as file:
+        if use_mmap:
+            # Отображение в память для больших файлов: массив ссылается на страницы файла
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = file.read()
+    return parse_spe_bytes(buffer)
+
+
+def write_spe(spe_file, header, y_values):
+    """Атомарно записывает спектр в SPE-файл (временный файл + os.replace)"""
+    dtype = YDATA_DTYPES.get(header.ydata_format, YDATA_DTYPES["SINGLE"])
+    y_values = np.asarray(y_values, dtype=dtype)
+
+    fields = dict(header.fields) or {"$FORMAT": "SPbI-1"}
+    ydata = fields.pop("$YDATA", f"{header.ydata_format}(Y..Y)")
+    fields["FIRSTX"] = f"{header.first_x:.6f}"
+    fields["LASTX"] = f"{header.last_x:.6f}"
+    fields["NPOINTS"] = str(len(y_values))
+
+    lines = [f"##{key}={value}" for key, value in fields.items()]
+    lines.append(f"##$YDATA={ydata}")
+    header_bytes = ("\r\n".join(lines) + "\r\n").encode(HEADER_ENCODING, errors="replace")
+
+    temp_file = f"{spe_file}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, 'wb') as file:
+            file.write(header_bytes)
+            file.write(y_values.tobytes())
+            file.write(b"\r\n" + END_TAG + b"\r\n")
+        os.replace(temp_file, spe_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
@@ -0,0 +1,42 @@
+import numpy as np
+
+
+def wavenumber_axis(first_x, last_x, npoints):
+    """Строит ось волновых чисел по FIRSTX/LASTX с шагом (LASTX - FIRSTX) / NPOINTS"""
+    if npoints <= 0:
+        return np.empty(0, dtype=np.float64)
+    step = (last_x - first_x) / npoints
+    return first_x + np.arange(npoints, dtype=np.float64) * step
+
+
+def log10_abs(values):
+    """Возвращает log10(|values|) в float64; нули дают -inf без предупреждений"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.log10(np.abs(np.asarray(values, dtype=np.float64)))
+
+
+def absorbance(sample, reference, cuv_length, cuv_correction=0.0, log_reference=None):
+    """
+    Спектр поглощения по формуле D = -(log10(|Isam/Iref|) * L) / (L + dL)
+
+    Точки с нулевым опорным сигналом (и точки за пределами спектра образца)
+    маскируются и получают значение 0. log_reference позволяет передать заранее
+    посчитанный log10(|Iref|), чтобы не пересчитывать его для каждого образца.
+    """
+    reference = np.asarray(reference)
+    sample = np.asarray(sample)
+    count = min(len(reference), len(sample))
+    output = np.zeros(len(reference), dtype=np.float64)
+    if count == 0:
+        return output
+
+    if log_reference is None:
+        log_reference = log10_abs(reference[:count])
+    else:
+        log_reference = log_reference[:count]
+
+    valid = reference[:count] != 0
+    scale = -cuv_length / (cuv_length + cuv_correction)
+    with np.errstate(invalid='ignore'):
+        np.multiply(log10_abs(sample[:count]) - log_reference, scale, out=output[:count], where=valid)
+    return output
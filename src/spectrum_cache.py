@@ -0,0 +1,88 @@
+import os
+import threading
+from collections import OrderedDict
+
+from . import spe_reader
+from . import spectral_math
+
+
+class Spectrum:
+    """Спектр в памяти: заголовок, ось X и производные величины, зависящие только от него"""
+
+    def __init__(self, path, header, y_values):
+        self.path = path
+        self.header = header
+        self.y = y_values
+        self.x = spectral_math.wavenumber_axis(header.first_x, header.last_x, len(y_values))
+        self.x.setflags(write=False)
+        self._log_abs = None
+        self._lock = threading.Lock()
+
+    @property
+    def log_abs(self):
+        """log10(|Y|) - используется как log10(Iref) при расчете поглощения"""
+        if self._log_abs is None:
+            with self._lock:
+                if self._log_abs is None:
+                    log_abs = spectral_math.log10_abs(self.y)
+                    log_abs.setflags(write=False)
+                    self._log_abs = log_abs
+        return self._log_abs
+
+
+class SpectrumCache:
+    """LRU-кэш спектров с ключом (путь, размер, mtime_ns)"""
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns
+
+    def get(self, path):
+        """Возвращает Spectrum для файла, перечитывая его только при изменении"""
+        key = self.make_key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        header, y_values = spe_reader.read_spe(path)
+        entry = Spectrum(key[0], header, y_values)
+
+        with self._lock:
+            # Устаревшие версии того же файла больше не понадобятся
+            for stale_key in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[stale_key]
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, path=None):
+        """Сбрасывает кэш целиком или только для указанного файла"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            path = os.path.abspath(path)
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+
+
+# Общий кэш для опорного (фонового) и измеренного спектров
+spectrum_cache = SpectrumCache()
+
+
+def load_spectrum(path):
+    return spectrum_cache.get(path)
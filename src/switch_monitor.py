@@ -0,0 +1,238 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+# Состояния переключения канала
+STATE_REQUESTED = "requested"
+STATE_TRAVELLING = "travelling"
+STATE_ARRIVED = "arrived"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+
+# Интервалы опроса статуса, сек
+FAST_POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 1.0
+BACKOFF_FACTOR = 1.5
+# За сколько секунд до ожидаемого прибытия переходить на частый опрос
+ARRIVAL_MARGIN = 0.5
+
+
+class AdaptivePoller:
+    """Интервал опроса: начинается с fast и растет в factor раз до maximum"""
+
+    def __init__(self, fast=FAST_POLL_INTERVAL, maximum=MAX_POLL_INTERVAL, factor=BACKOFF_FACTOR):
+        self.fast = fast
+        self.maximum = maximum
+        self.factor = factor
+        self.interval = fast
+
+    def reset(self):
+        self.interval = self.fast
+
+    def next_interval(self):
+        interval = self.interval
+        self.interval = min(self.interval * self.factor, self.maximum)
+        return interval
+
+
+class HopHistory:
+    """
+    Измеренные длительности переключений. Для известной пары каналов используется
+    скользящее среднее, для остальных - линейная модель: задержка + время на шаг * расстояние.
+    """
+
+    def __init__(self, alpha=0.3, max_samples=64):
+        self.alpha = alpha
+        self.max_samples = max_samples
+        self._pairs = {}
+        self._samples = []
+        self._lock = threading.Lock()
+
+    def record(self, from_channel, to_channel, duration):
+        key = (from_channel, to_channel)
+        with self._lock:
+            previous = self._pairs.get(key)
+            self._pairs[key] = duration if previous is None else previous + self.alpha * (duration - previous)
+            self._samples.append((abs(to_channel - from_channel), duration))
+            del self._samples[:-self.max_samples]
+        logging.info(f"Переключение {from_channel} → {to_channel} заняло {duration:.2f} с")
+
+    def _linear_model(self):
+        distances = [distance for distance, _ in self._samples]
+        if len(set(distances)) < 2:
+            if not self._samples:
+                return None
+            # Одно расстояние - считаем время пропорциональным числу шагов
+            mean_distance = sum(distances) / len(distances)
+            mean_duration = sum(duration for _, duration in self._samples) / len(self._samples)
+            return 0.0, mean_duration / max(mean_distance, 1)
+
+        count = len(self._samples)
+        mean_x = sum(distances) / count
+        mean_y = sum(duration for _, duration in self._samples) / count
+        variance = sum((x - mean_x) ** 2 for x in distances)
+        covariance = sum((x - mean_x) * (y - mean_y) for x, y in self._samples)
+        per_hop = max(covariance / variance, 0.0)
+        return max(mean_y - per_hop * mean_x, 0.0), per_hop
+
+    def expected(self, from_channel, to_channel):
+        """Ожидаемая длительность переключения в секундах или None, если данных нет"""
+        if from_channel == to_channel:
+            return 0.0
+        with self._lock:
+            duration = self._pairs.get((from_channel, to_channel))
+            if duration is not None:
+                return duration
+            model = self._linear_model()
+        if model is None:
+            return None
+        overhead, per_hop = model
+        return overhead + per_hop * abs(to_channel - from_channel)
+
+    def clear(self):
+        with self._lock:
+            self._pairs.clear()
+            self._samples.clear()
+
+
+# Общая история для всех переключателей каналов
+hop_history = HopHistory()
+
+
+class SwitchMonitor:
+    """
+    Конечный автомат контроля переключения канала:
+    requested → travelling → arrived / failed.
+
+    Сразу после запроса и около ожидаемого момента прибытия статус опрашивается часто,
+    во время движения - с растущим интервалом. Ошибка чтения не приводит к холостому
+    циклу: следующий опрос откладывается.
+    """
+
+    def __init__(self, read_status, history=None, fast_interval=FAST_POLL_INTERVAL,
+                 max_interval=MAX_POLL_INTERVAL, arrival_margin=ARRIVAL_MARGIN):
+        self.read_status = read_status
+        self.history = hop_history if history is None else history
+        self.fast_interval = fast_interval
+        self.max_interval = max_interval
+        self.arrival_margin = arrival_margin
+        self.state = None
+        self.polls = 0
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _set_state(self, state):
+        self.state = state
+        logging.info(f"Состояние переключения: {state}")
+
+    def _next_interval(self, poller, elapsed, expected):
+        if self.state == STATE_REQUESTED:
+            return self.fast_interval
+        if expected is None:
+            return poller.next_interval()
+        remaining = expected - elapsed
+        if remaining > self.arrival_margin:
+            # Головка еще далеко - спим почти до ожидаемого прибытия
+            return min(remaining - self.arrival_margin, self.max_interval)
+        if remaining > -self.arrival_margin:
+            return self.fast_interval
+        # Прибытие задерживается - постепенно реже
+        return poller.next_interval()
+
+    def run(self, from_channel, target_channel, timeout=60, on_channel_change=None):
+        """Ожидает прибытия на target_channel; возвращает (успех, сообщение)"""
+        start_time = time.monotonic()
+        expected = self.history.expected(from_channel, target_channel)
+        if expected is not None:
+            logging.info(f"Ожидаемое время переключения: {expected:.2f} с")
+
+        poller = AdaptivePoller(self.fast_interval, self.max_interval)
+        failure_poller = AdaptivePoller(self.fast_interval, self.max_interval)
+        last_channel = from_channel
+        self._set_state(STATE_REQUESTED)
+
+        while not self._cancel.is_set():
+            elapsed = time.monotonic() - start_time
+            if elapsed >= timeout:
+                break
+
+            status = self.read_status()
+            self.polls += 1
+            if status is None:
+                self._cancel.wait(failure_poller.next_interval())
+                continue
+            failure_poller.reset()
+
+            if status.general_error:
+                self._set_state(STATE_FAILED)
+                return False, "Обнаружена ошибка во время переключения"
+
+            channel = status.active_channel
+            if channel != last_channel:
+                logging.info(f"✓ Переключение: канал {last_channel} → канал {channel}")
+                last_channel = channel
+                if on_channel_change is not None:
+                    on_channel_change(channel)
+
+            if self.state == STATE_REQUESTED and status.working and not status.ready:
+                logging.info("✓ Переключение началось")
+                self._set_state(STATE_TRAVELLING)
+                poller.reset()
+
+            # Короткое перемещение могло завершиться между двумя опросами
+            if status.ready and not status.working and (self.state == STATE_TRAVELLING or channel == target_channel):
+                if channel != target_channel:
+                    self._set_state(STATE_FAILED)
+                    return False, (f"Переключение завершено, но канал не соответствует ожидаемому: "
+                                   f"{channel} != {target_channel}")
+                self._set_state(STATE_ARRIVED)
+                self.history.record(from_channel, target_channel, time.monotonic() - start_time)
+                return True, ""
+
+            self._cancel.wait(self._next_interval(poller, elapsed, expected))
+
+        if self._cancel.is_set():
+            self._set_state(STATE_CANCELLED)
+            return False, "Переключение отменено"
+        started = self.state != STATE_REQUESTED
+        self._set_state(STATE_FAILED)
+        if not started:
+            return False, "Переключение не началось в ожидаемое время"
+        return False, f"Переключение не завершилось в течение {timeout} секунд"
+
+    def start(self, from_channel, target_channel, timeout=60, callback=None, on_channel_change=None):
+        """Запускает контроль в отдельном потоке; возвращает Future с результатом (успех, сообщение)"""
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+
+        def worker():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self.run(from_channel, target_channel, timeout, on_channel_change))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=worker, name=f"switch-monitor-{target_channel}", daemon=True).start()
+        return future
+
+
+def poll_until(read_status, predicate, timeout, fast_interval=FAST_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+    """
+    Опрашивает статус, пока predicate(status) не вернет True или False;
+    None означает продолжать. Возвращает результат predicate или None по таймауту.
+    """
+    start_time = time.monotonic()
+    poller = AdaptivePoller(fast_interval, max_interval)
+    while time.monotonic() - start_time < timeout:
+        status = read_status()
+        if status is not None:
+            result = predicate(status)
+            if result is not None:
+                return result
+        time.sleep(poller.next_interval())
+    return None
@@ -1,23 +1,27 @@
-import ctypes
 import logging
-import csv
-import glob
-from pathlib import Path
 import os
-import serial
-import modbus_tk
-import modbus_tk.defines as cst
-from modbus_tk import modbus_rtu
-from datetime import datetime
-import numpy as np
 import json
 import time
 import subprocess
-import math
+import threading
+from concurrent.futures import Future
+import numpy as np
 from PyQt5.QtCore import QObject, pyqtSignal
 
 # Глобальные переменные
+from src import config_store
 from src import fetch_data
+from src import ini_config
+from src import instrument
+from src import device_registry
+from src import modbus_bus
+from src import modbus_connection
+from src import spectral_math
+from src import spectrum_cache
+from src import switch_monitor
+# Константы для работы с каналами
+from src.register_snapshot import (CHANNEL_REQUEST_REGISTER, CHANNEL_CONFIRM_REGISTER, CHANNELS_COUNT_REGISTER,
+                                   STATUS_REGISTER, STATUS_BITS)
 
 first_start = True
 int_max = 100000
@@ -36,6 +40,8 @@ device_num = 0
 port = ''
 timeout = 0
 zoom = True
+# Версия ini-файлов прибора, с которой последний раз вызывался LoadParam
+_loaded_ini_version = None
 
 master = None
 
@@ -63,14 +69,11 @@ def send_error_to_gui(error_text):
 def load_simulation_from_config():
     global simulation
     try:
-        if os.path.exists('config/config.json'):
-            with open('config/config.json', 'r', encoding="utf-8") as file:
-                json_data = json.load(file)
-
-            # Загружаем параметр simulation и приводим к int
-            if "simulation" in json_data:
-                simulation = int(json_data["simulation"])
-                logging.info(f"Загружен параметр simulation: {simulation}")
+        # Загружаем параметр simulation и приводим к int
+        value = config_store.config.get("simulation")
+        if value is not None:
+            simulation = int(value)
+            logging.info(f"Загружен параметр simulation: {simulation}")
     except Exception as e:
         send_error_to_gui(f"Ошибка при загрузке параметра simulation: {e}")
         # В случае ошибки используем значение по умолчанию
@@ -79,12 +82,6 @@ def load_simulation_from_config():
     return simulation
 
 
-# Константы для работы с каналами
-CHANNEL_REQUEST_REGISTER = 16400
-CHANNEL_CONFIRM_REGISTER = 16401
-CHANNELS_COUNT_REGISTER = 16402
-STATUS_REGISTER = 16403
-
 # Биты статуса
 STATUS_INITIALIZED = 0
 STATUS_READY = 1
@@ -92,97 +89,94 @@ STATUS_WORKING = 2
 STATUS_ERROR = 3
 STATUS_CHANNEL_ERROR = 8
 
-# Битовые маски для статуса
-STATUS_BITS = {
-    'INITIALIZATION': 0,
-    'READY': 1,
-    'WORKING': 2,
-    'GENERAL_ERROR': 3,
-    'UPPER_SENSOR_ERROR': 4,
-    'LOWER_SENSOR_ERROR': 5,
-    'CELL_SENSOR_ERROR': 6,
-    'POSITIONING_TIME_ERROR': 7,
-    'CHANNEL_REQUEST_ERROR': 8,
-    'UPPER_SENSOR': 13,
-    'LOWER_SENSOR': 14,
-    'CELL_SENSOR': 15
-}
-
-# GAS.dll functions below
-dll_path = "./GAS.dll"
-my_dll = ctypes.WinDLL(dll_path)
 
 # Путь к exequant.exe
 exequant_path = ""
 
 
 class ChannelSwitcher:
-    def __init__(self):
+    def __init__(self, device=None):
+        # Без явного прибора работаем с прибором из окна настроек ModBus
+        self.device = device if device is not None else main_device
         self.is_initialized = False
         self.current_channel = None
         self.max_channels = 12
+        # Спектрометр стоит за основным мультиплексором
+        self.notify_instrument = self.device.name == device_registry.DEFAULT_DEVICE
 
-    def read_status(self):
-        global master, device_num
-
-        if not modbus_connected or master is None:
+    def read_status(self, max_age=None):
+        if not self.device.connected:
             logging.error("Нет соединения с ModBus для чтения статуса")
             return None
 
         try:
-            status = master.execute(device_num, cst.READ_HOLDING_REGISTERS, STATUS_REGISTER, 1)[0]
-
-            status_info = {
-                'raw_value': status,
-                'binary': bin(status),
-                'initialization': bool(status & (1 << STATUS_BITS['INITIALIZATION'])),
-                'ready': bool(status & (1 << STATUS_BITS['READY'])),
-                'working': bool(status & (1 << STATUS_BITS['WORKING'])),
-                'general_error': bool(status & (1 << STATUS_BITS['GENERAL_ERROR'])),
-                'upper_sensor_error': bool(status & (1 << STATUS_BITS['UPPER_SENSOR_ERROR'])),
-                'lower_sensor_error': bool(status & (1 << STATUS_BITS['LOWER_SENSOR_ERROR'])),
-                'cell_sensor_error': bool(status & (1 << STATUS_BITS['CELL_SENSOR_ERROR'])),
-                'positioning_time_error': bool(status & (1 << STATUS_BITS['POSITIONING_TIME_ERROR'])),
-                'channel_request_error': bool(status & (1 << STATUS_BITS['CHANNEL_REQUEST_ERROR'])),
-                'upper_sensor': bool(status & (1 << STATUS_BITS['UPPER_SENSOR'])),
-                'lower_sensor': bool(status & (1 << STATUS_BITS['LOWER_SENSOR'])),
-                'cell_sensor': bool(status & (1 << STATUS_BITS['CELL_SENSOR']))
-            }
-
-            logging.info(f"Статус устройства: {status_info['binary']} ({status_info['raw_value']})")
-            return status_info
+            status = self.device.registers.read(max_age)
+            logging.debug(f"Статус устройства: {status.binary} ({status.raw_value})")
+            return status
 
         except Exception as e:
             send_error_to_gui(f"Ошибка при чтении статуса: {e}")
             return None
 
+    def read_fresh_status(self):
+        # Для контроля переключения нужен снимок не старше интервала частого опроса
+        return self.read_status(max_age=switch_monitor.FAST_POLL_INTERVAL / 2)
+
     def wait_for_ready_state(self, timeout=60):
         logging.info(f"Ожидание готовности устройства (таймаут: {timeout} сек)...")
-        start_time = time.time()
 
-        while time.time() - start_time < timeout:
-            status = self.read_status()
-            if status and status['ready'] and not status['working']:
-                logging.info("Устройство готово к работе")
+        def check(status):
+            if status.ready and not status.working:
                 return True
-            elif status and status['general_error']:
-                send_error_to_gui("Обнаружена ошибка устройства")
+            if status.general_error:
                 return False
+            return None
 
-            time.sleep(1)
+        result = switch_monitor.poll_until(self.read_fresh_status, check, timeout)
+        if result:
+            logging.info("Устройство готово к работе")
+            return True
+        if result is False:
+            send_error_to_gui("Обнаружена ошибка устройства")
+            return False
 
         send_error_to_gui(f"Таймаут ожидания готовности устройства ({timeout} сек)")
         return False
 
-    def request_channel_switch(self, target_channel):
-        global master, device_num
+    def get_active_channel(self, priority=modbus_bus.PRIORITY_STATUS):
+        if not self.device.connected:
+            send_error_to_gui("Нет соединения с ModBus для получения активного канала")
+            return -1
+
+        try:
+            # Канал возвращается со смещением +1
+            channel = self.device.registers.read(priority=priority).active_channel
+            logging.info(f"Текущий активный канал: {channel}")
+            return channel
+        except Exception as e:
+            send_error_to_gui(f"Ошибка при получении активного канала: {e}")
+            return -1
+
+    def get_channels_count(self):
+        if not self.device.connected:
+            send_error_to_gui("Нет соединения с ModBus для получения количества каналов")
+            return -1
+
+        try:
+            count = self.device.registers.read().channels_count
+            logging.info(f"Количество доступных каналов: {count}")
+            return count
+        except Exception as e:
+            send_error_to_gui(f"Ошибка при получении количества каналов: {e}")
+            return -1
 
+    def request_channel_switch(self, target_channel):
         if target_channel < 0 or target_channel > self.max_channels:
             send_error_to_gui(
                 f"Недопустимый номер канала: {target_channel}. Допустимый диапазон: 0-{self.max_channels}")
             return False
 
-        if not modbus_connected or master is None:
+        if not self.device.connected:
             send_error_to_gui("Нет соединения с ModBus для переключения канала")
             return False
 
@@ -191,7 +185,7 @@ class ChannelSwitcher:
             register_value = target_channel + 1
             logging.info(f"Запрос переключения на канал {target_channel} (значение регистра: {register_value})")
 
-            master.execute(device_num, cst.WRITE_SINGLE_REGISTER, CHANNEL_REQUEST_REGISTER, output_value=register_value)
+            self.device.write_register(CHANNEL_REQUEST_REGISTER, register_value)
             logging.info(f"Запрос на переключение отправлен")
             return True
 
@@ -201,10 +195,9 @@ class ChannelSwitcher:
 
     def monitor_channel_switching(self, target_channel, timeout=60):
         logging.info(f"=== НАЧАЛО ПЕРЕКЛЮЧЕНИЯ НА КАНАЛ {target_channel} ===")
-        start_time = time.time()
 
         # Определяем направление движения
-        current = get_active_channel()
+        current = self.get_active_channel()
         if current == -1:
             return False
 
@@ -218,63 +211,19 @@ class ChannelSwitcher:
             logging.info(f"Уже находимся на канале {target_channel}")
             return True
 
-        # Ожидание начала работы
-        logging.info("Ожидание деактивации бита 'Готов' и активации бита 'В работе'...")
-        while time.time() - start_time < timeout:
-            status = self.read_status()
-            if status and not status['ready'] and status['working']:
-                logging.info("✓ Переключение началось")
-                break
-            time.sleep(0.5)
-        else:
-            send_error_to_gui("Переключение не началось в ожидаемое время")
+        monitor = switch_monitor.SwitchMonitor(self.read_fresh_status)
+        success, message = monitor.run(current, target_channel, timeout)
+        if not success:
+            send_error_to_gui(message)
             return False
 
-        # Мониторинг процесса переключения
-        logging.info("Мониторинг процесса переключения...")
-        last_channel = current
-
-        while time.time() - start_time < timeout:
-            status = self.read_status()
-            if not status:
-                continue
-
-            # Проверяем текущий канал
-            current_channel = get_active_channel()
-            if current_channel != -1 and current_channel != last_channel:
-                logging.info(f"✓ Переключение: канал {last_channel} → канал {current_channel}")
-                last_channel = current_channel
-
-                if current_channel == target_channel:
-                    logging.info(f"✓ Достигнут целевой канал {target_channel}")
-                    break
-
-            # Проверяем ошибки
-            if status['general_error']:
-                send_error_to_gui("Обнаружена ошибка во время переключения")
-                return False
-
-            time.sleep(1)
-
-        # Ожидание завершения переключения
-        logging.info("Ожидание завершения переключения...")
-        while time.time() - start_time < timeout:
-            status = self.read_status()
-            if status and status['ready'] and not status['working']:
-                final_channel = get_active_channel()
-                if final_channel == target_channel:
-                    logging.info("✓ Переключение завершено успешно!")
-                    self.current_channel = final_channel
-                    return True
-                else:
-                    logging.error(
-                        f"Переключение завершено, но канал не соответствует ожидаемому: {final_channel} != {target_channel}")
-                    return False
-
-            time.sleep(0.5)
-
-        send_error_to_gui(f"Переключение не завершилось в течение {timeout} секунд")
-        return False
+        logging.info("✓ Переключение завершено успешно!")
+        self.current_channel = target_channel
+        if self.notify_instrument:
+            driver = get_instrument()
+            if driver is not None:
+                driver.set_channel(target_channel)
+        return True
 
     def switch_to_channel(self, target_channel, wait_time=30):
         logging.info(f"\n{'=' * 50}")
@@ -293,49 +242,81 @@ class ChannelSwitcher:
         # Мониторим переключение канала
         return self.monitor_channel_switching(target_channel, timeout=wait_time)
 
+    def switch_to_channel_async(self, target_channel, wait_time=30, callback=None):
+        """Переключение канала в отдельном потоке; возвращает Future с результатом True/False"""
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+
+        def worker():
+            try:
+                future.set_result(self.switch_to_channel(target_channel, wait_time))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=worker, name=f"channel-switch-{target_channel}", daemon=True).start()
+        return future
+
     def monitor_initialization(self, timeout=120):
         logging.info("=== НАЧАЛО МОНИТОРИНГА ИНИЦИАЛИЗАЦИИ ===")
-        start_time = time.time()
 
         # Ожидание завершения инициализации
         logging.info("Ожидание завершения инициализации...")
 
-        while time.time() - start_time < timeout:
-            status = self.read_status()
-            if not status:
-                continue
-
+        def check(status):
             # Проверяем биты статуса для определения завершения инициализации
-            if status['initialization'] and status['ready'] and not status['working']:
-                logging.info("✓ Инициализация завершена успешно!")
+            if status.initialization and status.ready and not status.working:
+                return True
+            return None
 
-                # Проверяем количество найденных каналов
-                count = get_channels_count()
-                if count > 0:
-                    logging.info(f"✓ Найдено каналов: {count}")
+        # Инициализация длится десятки секунд - опрашиваем не чаще раза в секунду в конце
+        if switch_monitor.poll_until(self.read_fresh_status, check, timeout):
+            logging.info("✓ Инициализация завершена успешно!")
 
-                # Проверяем текущий канал после инициализации
-                current_channel = get_active_channel()
-                logging.info(f"Текущий канал после инициализации: {current_channel}")
+            # Проверяем количество найденных каналов
+            count = self.get_channels_count()
+            if count > 0:
+                logging.info(f"✓ Найдено каналов: {count}")
 
-                self.is_initialized = True
-                return True
+            # Проверяем текущий канал после инициализации
+            current_channel = self.get_active_channel()
+            logging.info(f"Текущий канал после инициализации: {current_channel}")
 
-            time.sleep(0.5)
+            self.is_initialized = True
+            return True
 
         send_error_to_gui(f"Инициализация не завершилась в течение {timeout} секунд")
         return False
 
 
+def _on_main_device_change(new_master, connected):
+    global master, modbus_connected, device_num
+    master = new_master
+    modbus_connected = connected
+    device_num = main_device.device_num
+
+
+# Реестр приборов ModBus; у каждого свой переключатель каналов и своя очередь транзакций линии
+devices = device_registry.DeviceRegistry(switcher_factory=ChannelSwitcher)
+
+# Прибор из окна настроек ModBus; глобальные master/modbus_connected отражают его состояние
+main_device = devices.device(device_registry.DEFAULT_DEVICE)
+main_device.add_listener(_on_main_device_change)
+
 # Глобальный объект для работы с каналами
-channel_switcher = ChannelSwitcher()
+channel_switcher = main_device.switcher
+
 
+def connect_configured_devices():
+    """Подключает дополнительные приборы из списка "devices" в config.json"""
+    return devices.connect_from_config(config_store.config.get("devices", []))
 
-def check_modbus_connection():
+
+def check_modbus_connection(priority=modbus_bus.PRIORITY_STATUS):
     global modbus_connected, master, device_num, simulation
 
-    # Если включен режим симуляции, считаем что соединение есть
-    if simulation == 1:
+    # В режиме симуляции без подключенного симулятора мультиплексора считаем, что соединение есть
+    if simulation == 1 and not modbus_connected:
         logging.info("Режим симуляции активен, проверка ModBus пропущена")
         return True
 
@@ -344,13 +325,14 @@ def check_modbus_connection():
         return False
 
     try:
-        # Пытаемся прочитать статусный регистр
-        status = master.execute(device_num, cst.READ_HOLDING_REGISTERS, STATUS_REGISTER, 1)[0]
-        logging.info(f"ModBus соединение активно, статус устройства: {bin(status)}")
+        # Проверка связи - всегда свежее чтение блока регистров
+        status = main_device.registers.read(max_age=0, priority=priority)
+        logging.info(f"ModBus соединение активно, статус устройства: {status.binary}")
         return True
     except Exception as e:
         send_error_to_gui(f"Ошибка соединения ModBus: {e}")
-        modbus_connected = False
+        if modbus_connection.is_link_error(e):
+            main_device.mark_lost(e)
         return False
 
 
@@ -359,44 +341,19 @@ def switch_to_channel(channel_number):
     return channel_switcher.switch_to_channel(channel_number)
 
 
-def get_active_channel():
-    global master, device_num, simulation
+def get_active_channel(priority=modbus_bus.PRIORITY_STATUS):
+    global simulation
 
-    # В режиме симуляции возвращаем канал 1
-    if simulation == 1:
+    # В режиме симуляции без симулятора мультиплексора возвращаем канал 1
+    if simulation == 1 and not modbus_connected:
         logging.info("Режим симуляции активен, возвращаем канал 1")
         return 1
 
-    if not modbus_connected or master is None:
-        error_msg = "Нет соединения с ModBus для получения активного канала"
-        send_error_to_gui(error_msg)
-        return -1
-
-    try:
-        # Канал возвращается со смещением +1
-        channel = master.execute(device_num, cst.READ_HOLDING_REGISTERS, CHANNEL_CONFIRM_REGISTER, 1)[0] - 1
-        logging.info(f"Текущий активный канал: {channel}")
-        return channel
-    except Exception as e:
-        error_msg = f"Ошибка при получении активного канала: {e}"
-        send_error_to_gui(error_msg)
-        return -1
+    return channel_switcher.get_active_channel(priority)
 
 
 def get_channels_count():
-    global master, device_num
-
-    if not modbus_connected or master is None:
-        send_error_to_gui("Нет соединения с ModBus для получения количества каналов")
-        return -1
-
-    try:
-        count = master.execute(device_num, cst.READ_HOLDING_REGISTERS, CHANNELS_COUNT_REGISTER, 1)[0]
-        logging.info(f"Количество доступных каналов: {count}")
-        return count
-    except Exception as e:
-        send_error_to_gui(f"Ошибка при получении количества каналов: {e}")
-        return -1
+    return channel_switcher.get_channels_count()
 
 
 def get_status():
@@ -407,7 +364,7 @@ def get_status():
         return -1
 
     try:
-        status = master.execute(device_num, cst.READ_HOLDING_REGISTERS, STATUS_REGISTER, 1)[0]
+        status = main_device.registers.read().raw_value
         logging.info(f"Статус устройства: {bin(status)}")
         return status
     except Exception as e:
@@ -454,7 +411,10 @@ def load_channel_config():
             "alarm_fix": False,  # Фиксация аварии системы (АСПК)
             "attempts": 3,  # Количество попыток переключения (k)
             "background_period": 60,  # Период измерения фонового спектра (tф)
-            "measurements": 5  # Количество измерений канала (n)
+            "measurements": 5,  # Количество измерений канала (n)
+            "acquisition_interval": 0,  # Интервал между измерениями канала, сек (0 - без паузы)
+            "scheduler": "sequential",  # Порядок обхода каналов (sequential/serpentine)
+            "quant_batch": "spectrum"  # Пакет расчета exequant (spectrum/channel/cycle)
         }
     }
 
@@ -466,18 +426,12 @@ def load_channel_config():
         }
 
     # Пытаемся загрузить существующие настройки
-    try:
-        if os.path.exists('config/channel_config.json'):
-            with open('config/channel_config.json', 'r', encoding="utf-8") as file:
-                saved_config = json.load(file)
-                # Обновляем конфигурацию загруженными значениями
-                for key, value in saved_config.items():
-                    if key in config:
-                        config[key].update(value)
-                    else:
-                        config[key] = value
-    except Exception as e:
-        send_error_to_gui(f"Ошибка при загрузке настроек каналов: {e}")
+    # Настройки берутся из памяти; файл перечитывается, только если его изменили извне
+    for key, value in config_store.channel_config.snapshot().items():
+        if key in config:
+            config[key].update(value)
+        else:
+            config[key] = value
 
     return config
 
@@ -491,73 +445,51 @@ def get_channel_name(channel_num):
 
 
 def read_fon_spe(spe_file="./Spectra/fon.spe"):
-    binary_data = b""
-    with open(spe_file, 'rb') as file:
-        data = file.readlines()
-        for line in data[37:-1]:
-            binary_data += line
-        x_first = float(data[33].decode("utf-8")[data[33].decode("utf-8").find("=") + 1:])
-        x_last = float(data[34].decode("utf-8")[data[34].decode("utf-8").find("=") + 1:])
-    with open("./Spectra/values_bin.txt", "wb") as newFile:
-        newFile.write(binary_data)
-    arr = np.fromfile("./Spectra/values_bin.txt", dtype=np.single)
-    x_values = []
+    current = spectrum_cache.load_spectrum(spe_file)
 
     # Используем файл previous_fon.spe вместо поиска в директории Original
-    binary_data = b""
     previous_fon_file = "./Spectra/empty_fon.spe"
 
     if not os.path.exists(previous_fon_file):
         send_error_to_gui("Файл empty_fon.spe не найден")
         return [], [], []
 
-    with open(previous_fon_file, 'rb') as file:
-        data = file.readlines()
-        for line in data[37:-1]:
-            binary_data += line
-    with open("./Spectra/values_bin.txt", "wb") as newFile:
-        newFile.write(binary_data)
+    # Фон меняется раз в background_period минут и почти всегда берется из кэша
+    background = spectrum_cache.load_spectrum(previous_fon_file)
+    return current.x, current.y, background.y
 
-    second_arr = np.fromfile("./Spectra/values_bin.txt", dtype=np.single)
-    for i in range(len(arr)):
-        x_values.append(x_first + (i * ((x_last - x_first) / len(arr))))
-    return x_values, arr, second_arr
+
+def get_instrument():
+    """Драйвер спектрометра для текущего режима (GAS.dll или симуляция)"""
+    try:
+        return instrument.get_driver(simulation)
+    except Exception as e:
+        send_error_to_gui(f"Ошибка загрузки драйвера спектрометра: {str(e)}")
+        return None
 
 
 def start_func():
-    if my_dll is None:
-        error_msg = "DLL не загружена, невозможно выполнить функцию Start"
-        send_error_to_gui(error_msg)
-        return -1, 0
-        
+    driver = get_instrument()
+    if driver is None:
+        return -500, 0
+
     try:
-        start_function = my_dll.Start
-        start_function.argtypes = [ctypes.POINTER(ctypes.c_int)]
-        start_function.restypes = [ctypes.c_int]
-        warning = (ctypes.c_int * 1)()
-        result = start_function(warning)
-        return result, warning[0]
+        return driver.start()
     except Exception as e:
-        error_msg = f"Ошибка при вызове функции Start из DLL: {str(e)}"
+        error_msg = f"Ошибка при вызове функции Start ({driver.name}): {str(e)}"
         send_error_to_gui(error_msg)
         return -1, 0
 
 
-def init_func():
-    if my_dll is None:
-        error_msg = "DLL не загружена, невозможно выполнить функцию Init"
-        send_error_to_gui(error_msg)
-        return -1, 0
-        
+def init_func(background=False):
+    driver = get_instrument()
+    if driver is None:
+        return -500, 0
+
     try:
-        init_function = my_dll.Init
-        init_function.argtypes = [ctypes.POINTER(ctypes.c_int)]
-        init_function.restypes = [ctypes.c_int]
-        warning = (ctypes.c_int * 1)()
-        result = init_function(warning)
-        return result, warning[0]
+        return driver.init(background=background)
     except Exception as e:
-        error_msg = f"Ошибка при вызове функции Init из DLL: {str(e)}"
+        error_msg = f"Ошибка при вызове функции Init ({driver.name}): {str(e)}"
         send_error_to_gui(error_msg)
         return -1, 0
 
@@ -588,8 +520,7 @@ def initialize_device():
     try:
         # Для начала инициализации отправляем запрос на переключение на канал 1
         # В документации указано, что при первом запросе на переключение начинается инициализация
-        master.execute(device_num, cst.WRITE_SINGLE_REGISTER, CHANNEL_REQUEST_REGISTER,
-                       output_value=2)  # Канал 1 + смещение 1
+        main_device.write_register(CHANNEL_REQUEST_REGISTER, 2)  # Канал 1 + смещение 1
         logging.info("✓ Запрос на инициализацию отправлен")
         return True
     except Exception as e:
@@ -597,110 +528,245 @@ def initialize_device():
         return False
 
 
-def spectrum_to_dat(x_values, y_values):
-    count_value = len(y_values)
+# Последняя точка .dat: модель exequant ожидает спектр до этого волнового числа
+DAT_TAIL_WAVENUMBER = 12501.55
 
-    if exequant_path:
-        exequant_dir = os.path.dirname(exequant_path)
 
-        # Определяем путь к файлу 1.dat
-        dat_file_path = os.path.join(exequant_dir, "input.dat")
+def exequant_region():
+    """Область волновых чисел, которую использует модель ("exequant_region" в config.json) или None"""
+    region = config_store.config.get("exequant_region")
+    if not region:
+        return None
+    try:
+        return float(region[0]), float(region[1])
+    except (TypeError, ValueError, IndexError):
+        logging.error(f"Некорректная область exequant_region в config.json: {region}")
+        return None
 
-        try:
-            with open(dat_file_path, 'w') as dat_file:
-                for i in range(count_value):
-                    dat_file.write(f"{x_values[i]:.6E}\t{y_values[i]:.7E}\n")
-                dat_file.write(f"{12501.55:.6E}\t{y_values[count_value - 1]:.7E}\n")
 
-            logging.info(f"Файл input.dat успешно создан по пути: {dat_file_path}")
-            return 0
-        except Exception as e:
-            logging.error(f"Ошибка при записи файла input.dat: {e}")
-    else:
-        logging.error("Путь к exequant не задан, невозможно создать файл input.dat")
-
-    return -1
+def format_dat(x_values, y_values, region=None):
+    """
+    Текст .dat для exequant: две колонки (волновое число, поглощение) и хвостовая точка
+    DAT_TAIL_WAVENUMBER со значением последней точки. region=(min, max) оставляет только
+    точки, которые использует модель. Форматирование - одной операцией для всех строк.
+    """
+    x_values = np.asarray(x_values, dtype=np.float64)
+    y_values = np.asarray(y_values, dtype=np.float64)
+    tail_y = y_values[-1]
+    tail = [DAT_TAIL_WAVENUMBER, tail_y]
+    if region is not None:
+        low, high = min(region), max(region)
+        mask = (x_values >= low) & (x_values <= high)
+        x_values, y_values = x_values[mask], y_values[mask]
+        if not low <= DAT_TAIL_WAVENUMBER <= high:
+            tail = []
+
+    data = np.empty((len(x_values), 2))
+    data[:, 0] = x_values
+    data[:, 1] = y_values
+    values = data.ravel().tolist() + tail
+    return ("%.6E\t%.7E\n" * (len(values) // 2)) % tuple(values)
+
+
+def spectrum_to_dat(x_values, y_values, dat_file_path=None, region=None):
+    """
+    Записывает спектр в .dat для exequant. Файл пишется под временным именем и переименовывается,
+    поэтому exequant никогда не видит недописанный файл. 0 или -1 при ошибке.
+    """
+    if dat_file_path is None:
+        if not exequant_path:
+            logging.error("Путь к exequant не задан, невозможно создать файл input.dat")
+            return -1
+        # Определяем путь к файлу input.dat
+        dat_file_path = os.path.join(os.path.dirname(exequant_path), "input.dat")
+
+    temp_file = f"{dat_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        text = format_dat(x_values, y_values, region)
+        with open(temp_file, 'w') as dat_file:
+            dat_file.write(text)
+        os.replace(temp_file, dat_file_path)
 
+        logging.info(f"Файл {os.path.basename(dat_file_path)} успешно создан по пути: {dat_file_path}")
+        return 0
+    except Exception as e:
+        logging.error(f"Ошибка при записи файла {os.path.basename(dat_file_path)}: {e}")
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
 
-def run_exequant():
-    print(exequant_path)
-    exequant_dir = os.path.dirname(exequant_path)
-    input_spectrum_path = os.path.join(exequant_dir, "input.dat")
-    model = os.path.join(exequant_dir, "1.mmq")
+    return -1
 
-    if not exequant_path:
-        logging.error("Путь к exequant.exe не указан")
-        return None
 
-    if not os.path.exists(exequant_path):
-        logging.error(f"Файл exequant.exe не найден по указанному пути: {exequant_path}")
-        return None
+def exequant_model_path():
+    """Файл модели exequant (лежит рядом с exequant.exe)"""
+    return os.path.join(os.path.dirname(exequant_path), "1.mmq")
 
-    if not os.path.exists(input_spectrum_path):
-        logging.error(f"Файл спектра .dat не найден: {input_spectrum_path}")
-        return None
 
+def _execute_exequant(input_paths, work_dir, timeout):
+    """
+    Запускает exequant.exe для списка файлов спектров. Возвращает (разобранный JSON вывода или None,
+    stderr, если exequant завершился с ненулевым кодом, иначе None) - отказ самой программы
+    отличается от таймаута и ошибок разбора вывода.
+    """
+    model = exequant_model_path()
     try:
-        # Формируем команду
-        cmd = f'"{exequant_path}" --model {model} --input "{input_spectrum_path}" --only_print'
+        # Аргументы передаются списком: пути с пробелами не требуют кавычек
+        cmd = [exequant_path, "--model", model, "--input", *input_paths, "--only_print"]
 
         # Запускаем процесс с контролем ошибок
         try:
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=30)
+            result = subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True, timeout=timeout)
         except subprocess.TimeoutExpired:
-            logging.error("Превышено время ожидания выполнения exequant.exe (30 секунд)")
-            return None
-        except subprocess.SubprocessError as e:
+            logging.error(f"Превышено время ожидания выполнения exequant.exe ({timeout} секунд)")
+            return None, None
+        except (OSError, subprocess.SubprocessError) as e:
             logging.error(f"Ошибка при запуске процесса exequant.exe: {str(e)}")
-            return None
+            return None, None
 
         # Проверяем код возврата
         if result.returncode != 0:
             logging.error(f"Ошибка выполнения exequant.exe, код возврата: {result.returncode}")
             logging.error(f"Сообщение об ошибке: {result.stderr}")
-            return None
+            return None, result.stderr or ""
 
         # Проверяем наличие вывода
         if not result.stdout:
             logging.error("Пустой вывод от exequant.exe")
-            return None
+            return None, None
 
         try:
             # Парсим JSON из вывода
-            result_json = json.loads(result.stdout)
-
-            # Проверяем новую структуру JSON
-            if "input.dat" not in result_json or "Цет. число" not in result_json["input.dat"] or "value" not in \
-                    result_json["input.dat"]["Цет. число"]:
-                logging.error(f"Неверная структура JSON от exequant.exe: {result.stdout}")
-                return None
-
-            # Извлекаем значение параметра "Цет. число"
-            value = result_json["input.dat"]["Цет. число"]["value"]
-
-            return value
+            return json.loads(result.stdout), None
         except json.JSONDecodeError as e:
             logging.error(f"Ошибка при разборе JSON от exequant.exe: {e}")
             logging.error(f"Полученный вывод: {result.stdout}")
-            return None
+            return None, None
     except Exception as e:
         logging.error(f"Ошибка при запуске exequant.exe: {e}")
+        return None, None
+
+
+def _exequant_properties(result_json, input_path):
+    """
+    Все свойства файла спектра из вывода exequant (результаты сгруппированы по имени файла):
+    {название: {"value": значение, поля качества...}} или None.
+    """
+    input_name = os.path.basename(input_path)
+    file_result = result_json.get(input_name)
+    if not isinstance(file_result, dict):
+        logging.error(f"Неверная структура JSON от exequant.exe для {input_name}: {result_json}")
+        return None
+
+    properties = {}
+    for name, fields in file_result.items():
+        if not isinstance(fields, dict) or "value" not in fields:
+            continue
+        try:
+            value = float(fields["value"])
+        except (TypeError, ValueError):
+            logging.warning(f"Нечисловое значение свойства {name} от exequant.exe: {fields['value']!r}")
+            continue
+        properties[name] = dict(fields, value=value)
+    if not properties:
+        logging.error(f"В выводе exequant.exe для {input_name} нет значений свойств: {file_result}")
         return None
+    return properties
 
 
-def loadParam():
-    if my_dll is None:
-        error_msg = "DLL не загружена, невозможно выполнить функцию LoadParam"
-        send_error_to_gui(error_msg)
+def _check_exequant(input_paths):
+    if not exequant_path:
+        logging.error("Путь к exequant.exe не указан")
         return False
-        
+
+    if not os.path.exists(exequant_path):
+        logging.error(f"Файл exequant.exe не найден по указанному пути: {exequant_path}")
+        return False
+
+    for input_spectrum_path in input_paths:
+        if not os.path.exists(input_spectrum_path):
+            logging.error(f"Файл спектра .dat не найден: {input_spectrum_path}")
+            return False
+    return True
+
+
+def run_exequant(input_spectrum_path=None, work_dir=None, timeout=30):
+    """
+    Запускает exequant.exe для файла спектра и возвращает его свойства (см. _exequant_properties) или None.
+    Процесс запускается без оболочки; work_dir - рабочая папка процесса.
+    """
+    if input_spectrum_path is None:
+        input_spectrum_path = os.path.join(os.path.dirname(exequant_path), "input.dat")
+    if not _check_exequant([input_spectrum_path]):
+        return None
+
+    result_json, _ = _execute_exequant([input_spectrum_path], work_dir, timeout)
+    if result_json is None:
+        return None
+    return _exequant_properties(result_json, input_spectrum_path)
+
+
+# False, если установленная версия exequant.exe не принимает несколько файлов за запуск
+exequant_batch_supported = True
+
+
+def run_exequant_batch(input_paths, work_dir=None, timeout=30):
+    """
+    Рассчитывает несколько спектров одним запуском exequant.exe (модель загружается один раз).
+    Имена файлов должны быть уникальны. Возвращает {путь: свойства или None};
+    если пакетный запуск не удался, спектры рассчитываются по одному.
+    """
+    global exequant_batch_supported
+    if not _check_exequant(input_paths):
+        return {path: None for path in input_paths}
+
+    batch_stderr = None
+    if exequant_batch_supported:
+        # Время ожидания - на каждый спектр пакета
+        result_json, batch_stderr = _execute_exequant(input_paths, work_dir, timeout * len(input_paths))
+        if result_json is not None:
+            return {path: _exequant_properties(result_json, path) for path in input_paths}
+        logging.warning(f"Пакетный расчет exequant ({len(input_paths)} спектров) не удался, расчет по одному")
+
+    values = {path: run_exequant(path, work_dir, timeout) for path in input_paths}
+    # Пакеты отключаются, только если exequant отказался от нескольких --input (ненулевой код),
+    # а каждый файл по отдельности рассчитался; таймаут или один плохой спектр - не причина
+    if batch_stderr is not None and all(value is not None for value in values.values()):
+        exequant_batch_supported = False
+        logging.warning(f"exequant.exe не поддерживает расчет нескольких файлов за запуск, пакеты отключены. "
+                        f"Сообщение exequant: {batch_stderr.strip() or '(пусто)'}")
+    return values
+
+
+def get_spectrum_buffer():
+    """
+    Забирает последний измеренный спектр напрямую из памяти драйвера.
+
+    Возвращает (header, y) или None, если драйвер отдает спектр только через fon.spe.
+    """
+    driver = get_instrument()
+    if driver is None:
+        return None
+
     try:
-        load_param_function = my_dll.LoadParam
-        load_param_function.argtypes = []
-        load_param_function.restype = None
+        return driver.get_spectrum()
+    except Exception as e:
+        send_error_to_gui(f"Ошибка при получении спектра ({driver.name}): {str(e)}")
+        return None
 
+
+def get_cuv_correction():
+    """Поправка на толщину кюветы (dL) из конфига"""
+    return config_store.config.get("cuv_correction", 0)
+
+
+def loadParam():
+    driver = get_instrument()
+    if driver is None:
+        return False
+
+    try:
         logging.info("Вызов LoadParam для загрузки параметров из ini-файлов")
-        load_param_function()
+        driver.load_param()
         logging.info("Параметры успешно загружены из ini-файлов")
         return True
     except Exception as e:
@@ -708,58 +774,43 @@ def loadParam():
         return False
 
 
+def load_param_if_changed():
+    """
+    Вызывает LoadParam, только если ini-файлы прибора изменились с прошлого вызова
+    (или он еще не вызывался), и обновляет параметры GAS.ini в fetch_data.
+    """
+    global _loaded_ini_version
+    changed = ini_config.ini_model.refresh()
+    if _loaded_ini_version == ini_config.ini_model.version:
+        return True
+
+    if changed:
+        logging.info(f"Изменены файлы настроек прибора: {', '.join(changed)}")
+    fetch_data.load()
+    if not loadParam():
+        return False
+    _loaded_ini_version = ini_config.ini_model.version
+    return True
+
+
 def getValueSpecFormula():
-    binary_data = b""
-    with open("./Spectra/empty_fon.spe", 'rb') as file:
-        data = file.readlines()
-        for line in data[37:-1]:
-            binary_data += line
-        x_first = float(data[33].decode("utf-8")[data[33].decode("utf-8").find("=") + 1:])
-        x_last = float(data[34].decode("utf-8")[data[34].decode("utf-8").find("=") + 1:])
-    with open("./Spectra/values_bin.txt", "wb") as newFile:
-        newFile.write(binary_data)
-    arr = np.fromfile("./Spectra/values_bin.txt", dtype=np.single)
-    x_values = []
+    background = spectrum_cache.load_spectrum("./Spectra/empty_fon.spe")
 
     latest_original_file = "./Spectra/fon.spe"
-    binary_data = b""
-    with open(latest_original_file, 'rb') as file:
-        data = file.readlines()
-        for line in data[37:-1]:
-            binary_data += line
-    with open("./Spectra/values_bin.txt", "wb") as newFile:
-        newFile.write(binary_data)
-
-    second_arr = np.fromfile("./Spectra/values_bin.txt", dtype=np.single)
+    sample = spectrum_cache.load_spectrum(latest_original_file)
 
-    # Создаем массив x_values
-    for i in range(len(arr)):
-        x_values.append(x_first + (i * ((x_last - x_first) / len(arr))))
+    # Ось X и log10(Iref) берутся из кэша фонового спектра
+    x_values = background.x
 
     # Расчет третьего списка по формуле D=-(log(Isam/Iref)*L)/(L+dL)
     # Константы
     L = fetch_data.cuv_length
     
     # Загружаем поправку на толщину кюветы из конфига
-    try:
-        with open('config/config.json', 'r', encoding="utf-8") as file:
-            json_data = json.load(file)
-        dL = json_data.get("cuv_correction", 0)
-    except Exception as e:
-        logging.error(f"Ошибка при загрузке поправки на толщину кюветы: {e}")
-        dL = 0
-
-    # Создаем выходной массив
-    output_arr = []
-
-    # Применяем формулу для каждого элемента
-    for i in range(len(arr)):
-        if i < len(second_arr) and arr[i] != 0:  # Проверка деления на ноль
-            # Формула: D=-(log(Isam/Iref)*L)/(L+dL)
-            D = -(np.log10(abs(second_arr[i] / arr[i])) * L) / (L + dL)
-            output_arr.append(D)
-        else:
-            output_arr.append(0)  # Если данные некорректны, добавляем 0
+    dL = get_cuv_correction()
+
+    # Формула применяется ко всему массиву; точки с нулевым фоном дают 0
+    output_arr = spectral_math.absorbance(sample.y, background.y, L, dL, log_reference=background.log_abs)
 
     logging.info(f"Рассчитан массив поглощения из {len(output_arr)} элементов")
 